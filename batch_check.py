@@ -0,0 +1,76 @@
+"""
+Pemeriksaan sitasi massal tanpa UI (headless).
+
+Contoh:
+    python batch_check.py --citations sitasi.jsonl --source tesis.pdf --source buku.docx > hasil.jsonl
+    python batch_check.py --citations sitasi.csv --source sumber.pdf --mode paragraph --method tfidf --top-k 5
+    python batch_check.py --citations sitasi.jsonl --source book_en.pdf --citation-lang ID --source-lang EN \
+        --embedding-model paraphrase-multilingual-MiniLM-L12-v2   # tanpa translasi
+
+File sitasi: JSONL/CSV dengan kolom "text" (dan "id" opsional) atau teks biasa satu sitasi per baris.
+Hasil ditulis sebagai JSONL (satu baris per sitasi) begitu selesai dihitung.
+"""
+import argparse
+import json
+import sys
+import time
+
+from utils.batch_utils import check_citations_batch, load_citations, load_sources
+
+
+def translate_citations(citations, citation_lang, source_lang, use_local=False):
+    """Terjemahkan teks sitasi ke bahasa sumber bila bahasanya berbeda (satu batch, lewat cache terjemahan)."""
+    if citation_lang == source_lang:
+        return citations
+    from utils.translation_utils import translate_texts
+    translated = translate_texts([c["text"] for c in citations], citation_lang, source_lang, use_local=use_local)
+    return [dict(c, original_text=c["text"], text=text) for c, text in zip(citations, translated)]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Cek banyak sitasi sekaligus terhadap file sumber PDF/DOCX.")
+    parser.add_argument("--citations", required=True, help="File sitasi (.jsonl, .csv atau .txt).")
+    parser.add_argument("--source", action="append", required=True, help="File sumber PDF/DOCX (boleh berulang).")
+    parser.add_argument("--mode", choices=["sentence", "paragraph"], default="sentence")
+    parser.add_argument("--method", choices=["semantic", "tfidf", "minhash"], default="semantic")
+    parser.add_argument("--threshold", type=float, default=0.6)
+    parser.add_argument("--top-k", type=int, default=None, help="Batasi jumlah hasil per sitasi.")
+    parser.add_argument("--citation-lang", choices=["ID", "EN"], default="ID")
+    parser.add_argument("--source-lang", choices=["ID", "EN"], default=None, help="Default: sama dengan bahasa sitasi.")
+    parser.add_argument("--use-local", action="store_true", help="Gunakan model terjemahan lokal (MarianMT).")
+    parser.add_argument(
+        "--embedding-model", default=None,
+        help="Model Sentence-BERT (default: CITARA_EMBEDDING_MODEL). Model multilingual melewati translasi pada metode semantic."
+    )
+    parser.add_argument("--output", default="-", help="File output JSONL (default: stdout).")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    from utils.semantic_utils import is_multilingual_model
+    from utils.text_segmentation import ensure_punkt
+    ensure_punkt()
+    citations = load_citations(args.citations)
+    if not (args.method == "semantic" and is_multilingual_model(args.embedding_model)):
+        citations = translate_citations(citations, args.citation_lang, args.source_lang or args.citation_lang, args.use_local)
+    sources = load_sources(args.source, unit_mode=args.mode)
+
+    out = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+    try:
+        count = 0
+        for result in check_citations_batch(
+            citations, sources, unit_mode=args.mode, method=args.method,
+            similarity_threshold=args.threshold, top_k=args.top_k, embedding_model=args.embedding_model
+        ):
+            out.write(json.dumps(result, ensure_ascii=False) + "\n")
+            out.flush()
+            count += 1
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    elapsed = time.perf_counter() - start
+    print(f"{count} sitasi diperiksa dalam {elapsed:.2f} detik ({count / max(elapsed, 1e-9):.1f} sitasi/detik).", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1 @@
+# (biarkan kosong)
@@ -0,0 +1,103 @@
+"""
+Benchmark recall/latency index ANN (IVF) terhadap pencarian brute-force.
+
+Contoh:
+    python -m benchmarks.bench_ann --units 200000 --queries 200 --k 10
+    python -m benchmarks.bench_ann --pdf "sample_file/Foundations of Large Language Models.pdf"
+
+Tanpa --pdf, embedding dibuat sintetis (cluster acak berdimensi 384, sama
+seperti paraphrase-MiniLM-L6-v2) sehingga benchmark tidak butuh unduhan model.
+"""
+import argparse
+import json
+import time
+
+import numpy as np
+
+from utils.ann_index import IVFIndex, exact_search
+
+
+def synthetic_embeddings(n_units, dim=384, n_clusters=512, noise=2.0, seed=0):
+    """Embedding sintetis berkelompok yang meniru sebaran embedding kalimat."""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((n_clusters, dim)).astype(np.float32)
+    labels = rng.integers(0, n_clusters, n_units)
+    vectors = centers[labels] + noise * rng.standard_normal((n_units, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def pdf_embeddings(pdf_path):
+    """Embedding kalimat asli dari PDF (butuh model Sentence-BERT)."""
+    from utils.pdf_utils import extract_text_by_page
+    from utils.semantic_utils import encode_texts, get_semantic_model
+    from utils.similarity_utils import _collect_units, robust_sentence_splitter
+    _, units = _collect_units(extract_text_by_page(pdf_path), robust_sentence_splitter, None)
+    return encode_texts(units, get_semantic_model())
+
+
+def run_benchmark(vectors, queries=None, n_queries=200, k=10, n_lists=None, probes=(1, 2, 4, 8, 16, 32), seed=1):
+    """
+    Bandingkan IVF dengan brute-force. Jika queries None, query diambil dari
+    unit acak yang diberi sedikit noise (parafrase ringan dari kalimat sumber).
+    """
+    if queries is None:
+        rng = np.random.default_rng(seed)
+        query_ids = rng.choice(vectors.shape[0], min(n_queries, vectors.shape[0]), replace=False)
+        queries = vectors[query_ids] + 0.05 * rng.standard_normal((len(query_ids), vectors.shape[1])).astype(np.float32)
+
+    start = time.perf_counter()
+    exact = [set(exact_search(vectors, q, k)[0].tolist()) for q in queries]
+    exact_ms = (time.perf_counter() - start) * 1000 / len(queries)
+
+    start = time.perf_counter()
+    index = IVFIndex(n_lists=n_lists).build(vectors)
+    build_s = time.perf_counter() - start
+
+    report = {
+        "units": int(vectors.shape[0]),
+        "dim": int(vectors.shape[1]),
+        "k": k,
+        "n_lists": len(index._lists),
+        "build_seconds": round(build_s, 3),
+        "exact_ms_per_query": round(exact_ms, 3),
+        "ivf": [],
+    }
+    for n_probe in probes:
+        if n_probe > len(index._lists):
+            break
+        start = time.perf_counter()
+        found = [set(index.search(q, k, n_probe=n_probe)[0].tolist()) for q in queries]
+        ivf_ms = (time.perf_counter() - start) * 1000 / len(queries)
+        recall = np.mean([len(f & e) / max(1, len(e)) for f, e in zip(found, exact)])
+        report["ivf"].append({
+            "n_probe": n_probe,
+            "recall_at_k": round(float(recall), 4),
+            "ms_per_query": round(ivf_ms, 3),
+            "speedup": round(exact_ms / ivf_ms, 2) if ivf_ms else None,
+        })
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark recall/latency IVF vs brute-force.")
+    parser.add_argument("--units", type=int, default=200000, help="Jumlah unit sintetis.")
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--n-lists", type=int, default=None)
+    parser.add_argument("--noise", type=float, default=2.0, help="Sebaran data sintetis (makin besar makin sulit).")
+    parser.add_argument("--pdf", default=None, help="Gunakan embedding kalimat dari PDF ini.")
+    args = parser.parse_args()
+    queries = None
+    if args.pdf:
+        vectors = pdf_embeddings(args.pdf)
+    else:
+        # Query sintetis diambil dari distribusi yang sama tetapi bukan anggota index
+        vectors = synthetic_embeddings(args.units + args.queries, dim=args.dim, noise=args.noise)
+        vectors, queries = vectors[:args.units], vectors[args.units:]
+    report = run_benchmark(vectors, queries=queries, n_queries=args.queries, k=args.k, n_lists=args.n_lists)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""
+Benchmark jalur lintas bahasa: terjemahan sitasi + model monolingual
+(paraphrase-MiniLM-L6-v2) dibandingkan dengan model multilingual tanpa translasi.
+
+Sitasi berbahasa Indonesia dibuat dengan menerjemahkan kalimat sumber berbahasa
+Inggris (MarianMT EN->ID), sehingga kalimat asal setiap sitasi diketahui. Untuk
+kedua jalur dilaporkan latensi per sitasi (translasi + encode + pencarian),
+recall@1 terhadap kalimat asal, tumpang tindih top-k antar jalur dan selisih skor
+kalimat asal.
+
+Contoh:
+    python -m benchmarks.bench_multilingual
+    python -m benchmarks.bench_multilingual --pdf "sample_file/Foundations of Large Language Models.pdf" --citations 100
+    python -m benchmarks.bench_multilingual --multilingual-model distiluse-base-multilingual-cased-v2
+
+Butuh model Sentence-BERT (monolingual dan multilingual) serta MarianMT di cache HuggingFace.
+"""
+import argparse
+import json
+import os
+import random
+import time
+
+import numpy as np
+
+DEFAULT_PDF = os.path.join("sample_file", "Foundations of Large Language Models.pdf")
+
+
+def _search(unit_vectors, query_vectors, k):
+    """Top-k (indeks, skor) cosine untuk setiap query (vektor sudah dinormalisasi)."""
+    scores = query_vectors @ unit_vectors.T
+    k = min(k, unit_vectors.shape[0])
+    top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    order = np.argsort(-np.take_along_axis(scores, top, axis=1), axis=1)
+    return np.take_along_axis(top, order, axis=1), scores
+
+
+def _encode(texts, model):
+    from utils.semantic_utils import encode_texts
+    vectors = np.asarray(encode_texts(texts, model), dtype=np.float32)
+    return vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+
+
+def _run_pipeline(units, citations, targets, model, translate=None, k=10):
+    """Satu jalur: encode unit sumber, lalu per sitasi (terjemahkan bila perlu) encode dan cari top-k."""
+    start = time.perf_counter()
+    unit_vectors = _encode(units, model)
+    index_s = time.perf_counter() - start
+
+    translate_s = 0.0
+    start = time.perf_counter()
+    if translate is not None:
+        citations = translate(citations)
+        translate_s = time.perf_counter() - start
+    query_vectors = _encode(citations, model)
+    top, scores = _search(unit_vectors, query_vectors, k)
+    query_s = time.perf_counter() - start
+
+    rows = np.arange(len(targets))
+    return {
+        "index_seconds": round(index_s, 3),
+        "translate_ms_per_citation": round(translate_s * 1000 / len(citations), 3),
+        "ms_per_citation": round(query_s * 1000 / len(citations), 3),
+        "recall_at_1": round(float(np.mean(top[:, 0] == targets)), 4),
+        f"recall_at_{top.shape[1]}": round(float(np.mean((top == targets[:, None]).any(axis=1))), 4),
+        "_top": top,
+        "_target_scores": scores[rows, targets],
+    }
+
+
+def compare_pipelines(units, citations, targets, translate, mono_model, multi_model, k=10):
+    """
+    Bandingkan jalur translasi+monolingual dengan jalur multilingual langsung.
+    units: kalimat sumber; citations: sitasi berbahasa lain; targets: indeks unit asal tiap sitasi;
+    translate: callable(list sitasi) -> list terjemahan ke bahasa sumber.
+    """
+    targets = np.asarray(targets)
+    translated = _run_pipeline(units, citations, targets, mono_model, translate=translate, k=k)
+    multilingual = _run_pipeline(units, citations, targets, multi_model, k=k)
+    top_a, top_b = translated.pop("_top"), multilingual.pop("_top")
+    overlap = np.mean([len(set(a) & set(b)) / top_a.shape[1] for a, b in zip(top_a.tolist(), top_b.tolist())])
+    score_a, score_b = translated.pop("_target_scores"), multilingual.pop("_target_scores")
+    return {
+        "units": len(units),
+        "citations": len(citations),
+        "k": int(top_a.shape[1]),
+        "translate_mono": translated,
+        "multilingual": multilingual,
+        "topk_overlap": round(float(overlap), 4),
+        "top1_agreement": round(float(np.mean(top_a[:, 0] == top_b[:, 0])), 4),
+        "target_score_mean_abs_diff": round(float(np.mean(np.abs(score_a - score_b))), 4),
+        "speedup": round(translated["ms_per_citation"] / multilingual["ms_per_citation"], 2)
+        if multilingual["ms_per_citation"] else None,
+    }
+
+
+def source_units(pdf_path=None, min_words=8):
+    """Kalimat sumber berbahasa Inggris dari PDF (minimal min_words kata)."""
+    from utils.pdf_utils import extract_text_by_page
+    from utils.similarity_utils import _collect_units, robust_sentence_splitter
+    _, units = _collect_units(extract_text_by_page(pdf_path), robust_sentence_splitter, None)
+    return [unit for unit in units if len(unit.split()) >= min_words]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark translasi+monolingual vs embedding multilingual.")
+    parser.add_argument("--pdf", default=DEFAULT_PDF, help="PDF sumber berbahasa Inggris.")
+    parser.add_argument("--units", type=int, default=2000, help="Jumlah maksimum kalimat sumber.")
+    parser.add_argument("--citations", type=int, default=50, help="Jumlah sitasi ID yang dibuat dari kalimat sumber.")
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--multilingual-model", default=None, help="Default: CITARA_MULTILINGUAL_MODEL.")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    from utils.semantic_utils import MULTILINGUAL_MODEL_NAME, SEMANTIC_MODEL_NAME, get_semantic_model
+    from utils.translation_utils import LOCAL_MODEL_EN_ID, LOCAL_MODEL_ID_EN, translate_texts_local
+
+    units = source_units(args.pdf)[:args.units]
+    rng = random.Random(args.seed)
+    targets = rng.sample(range(len(units)), min(args.citations, len(units)))
+    citations = translate_texts_local([units[i] for i in targets], LOCAL_MODEL_EN_ID)
+    report = compare_pipelines(
+        units, citations, targets,
+        translate=lambda texts: translate_texts_local(texts, LOCAL_MODEL_ID_EN),
+        mono_model=get_semantic_model(SEMANTIC_MODEL_NAME),
+        multi_model=get_semantic_model(args.multilingual_model or MULTILINGUAL_MODEL_NAME),
+        k=args.k,
+    )
+    report["source"] = args.pdf
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,275 @@
+"""
+Benchmark jalur utama Citara: ekstraksi PDF/DOCX, splitter, pencocokan
+(TF-IDF/semantic, kalimat/paragraf/lintas unit) dan terjemahan lokal.
+
+Dokumen uji dibuat sintetis secara lokal (fitz/python-docx) dengan ukuran yang
+dapat diatur, sehingga hasil dapat diulang tanpa file sampel. Setiap tahap
+dilaporkan dalam detik (terbaik dari --repeat, tanpa tracing), throughput dan puncak
+memori Python (tracemalloc, pada pass terpisah), lalu dibandingkan dengan baseline
+JSON bila diberikan.
+
+Contoh:
+    python -m benchmarks.bench_pipeline --pages 100
+    python -m benchmarks.bench_pipeline --baseline benchmarks/baseline.json
+    python -m benchmarks.bench_pipeline --save-baseline benchmarks/baseline.json
+    python -m benchmarks.bench_pipeline --skip-models   # tanpa Sentence-BERT/MarianMT
+    python -m benchmarks.bench_pipeline --backends torch,int8,onnx   # bandingkan backend embedding
+    python -m benchmarks.bench_pipeline --encode-batch-sizes 16,32,64,128   # setel ukuran batch encode
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+_WORDS = (
+    "model bahasa data korpus pelatihan evaluasi jaringan saraf representasi kalimat makna "
+    "konteks parameter akurasi metode hasil analisis penelitian teks dokumen sitasi sumber "
+    "language model training corpus evaluation attention transformer embedding semantic "
+    "retrieval similarity citation source paragraph sentence token vocabulary inference"
+).split()
+
+
+def synthetic_paragraphs(n_paragraphs, sentences_per_paragraph=5, seed=0):
+    """Paragraf acak deterministik dari kosakata campuran ID/EN."""
+    rng = random.Random(seed)
+    paragraphs = []
+    for _ in range(n_paragraphs):
+        sentences = []
+        for _ in range(sentences_per_paragraph):
+            words = rng.choices(_WORDS, k=rng.randint(8, 18))
+            sentences.append(" ".join(words).capitalize() + ".")
+        paragraphs.append(" ".join(sentences))
+    return paragraphs
+
+
+def make_synthetic_pdf(path, pages=50, paragraphs_per_page=4, seed=0):
+    """Buat PDF sintetis dengan beberapa paragraf per halaman."""
+    import fitz
+    paragraphs = synthetic_paragraphs(pages * paragraphs_per_page, seed=seed)
+    doc = fitz.open()
+    for n in range(pages):
+        page = doc.new_page()
+        text = "\n\n".join(paragraphs[n * paragraphs_per_page:(n + 1) * paragraphs_per_page])
+        page.insert_textbox(fitz.Rect(50, 50, page.rect.width - 50, page.rect.height - 50), text, fontsize=9)
+    doc.save(path)
+    doc.close()
+    return path
+
+
+def make_synthetic_docx(path, paragraphs=200, seed=0):
+    """Buat DOCX sintetis berisi paragraf acak."""
+    from docx import Document
+    doc = Document()
+    for paragraph in synthetic_paragraphs(paragraphs, seed=seed):
+        doc.add_paragraph(paragraph)
+    doc.save(path)
+    return path
+
+
+def measure(fn, repeat=3, setup=None):
+    """
+    Jalankan fn beberapa kali (setup dipanggil sebelum tiap ulangan, di luar pengukuran).
+    Waktu diukur tanpa tracemalloc (tracing memperlambat alokasi); puncak memori diukur
+    pada satu pass terpisah dengan tracemalloc aktif.
+    Returns: (hasil terakhir, detik terbaik, puncak memori MB).
+    """
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    if setup:
+        setup()
+    tracemalloc.start()
+    try:
+        fn()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return result, best, peak / (1024 * 1024)
+
+
+def _stage(report, name, fn, work, unit, repeat, setup=None):
+    """Ukur satu tahap; work = banyak item yang diproses (untuk throughput)."""
+    try:
+        result, seconds, peak_mb = measure(fn, repeat, setup)
+    except Exception as e:  # model/berkas tidak tersedia: laporkan, jangan gagalkan seluruh suite
+        report[name] = {"skipped": f"{type(e).__name__}: {e}"}
+        return None
+    count = work(result) if callable(work) else work
+    report[name] = {
+        "seconds": round(seconds, 4),
+        "throughput": round(count / seconds, 1) if seconds else None,
+        "unit": unit,
+        "peak_mb": round(peak_mb, 2),
+    }
+    return result
+
+
+def run_suite(pages=50, docx_paragraphs=200, repeat=3, skip_models=False, workdir=None, backends=("torch",), encode_batch_sizes=()):
+    """
+    Jalankan seluruh benchmark. Returns: dict laporan (meta + per tahap).
+    Untuk tiap backend embedding di backends diukur throughput encode kalimat
+    ("encode[<backend>]"); backend selain torch juga dicek paritas skornya terhadap fp32.
+    encode_batch_sizes: ukuran batch encode yang dibandingkan ("encode[batch=<n>]").
+    Tahap encode juga melaporkan tokens_per_second.
+    """
+    from utils.docx_utils import extract_docx_chunks, extract_text_from_docx
+    from utils.pdf_utils import extract_paragraphs_by_page, extract_text_by_page
+    from utils.similarity_utils import find_crossunit_matches, find_paragraph_matches, find_sentence_matches
+    from utils.text_segmentation import clear_segmentation_cache, paragraph_splitter, robust_sentence_splitter
+
+    if workdir is None:
+        # Direktori kerja sementara dihapus setelah suite selesai
+        with tempfile.TemporaryDirectory(prefix="citara-bench-") as tmp_dir:
+            return run_suite(pages, docx_paragraphs, repeat, skip_models, tmp_dir, backends, encode_batch_sizes)
+    pdf_path = make_synthetic_pdf(os.path.join(workdir, "bench.pdf"), pages=pages)
+    docx_path = make_synthetic_docx(os.path.join(workdir, "bench.docx"), paragraphs=docx_paragraphs)
+    citation = synthetic_paragraphs(1, sentences_per_paragraph=2, seed=pages)[0]
+
+    stages = {}
+    pages_text = _stage(stages, "extract_text_by_page", lambda: extract_text_by_page(pdf_path), pages, "halaman/s", repeat)
+    pages_paragraphs = _stage(stages, "extract_paragraphs_by_page", lambda: extract_paragraphs_by_page(pdf_path), pages, "halaman/s", repeat)
+    _stage(stages, "extract_text_from_docx", lambda: extract_text_from_docx(docx_path), docx_paragraphs, "paragraf/s", repeat)
+    _stage(stages, "extract_docx_chunks", lambda: extract_docx_chunks(docx_path), docx_paragraphs, "paragraf/s", repeat)
+    if not pages_text:
+        return {"meta": _meta(pages, docx_paragraphs, repeat), "stages": stages}
+
+    # Splitter dipanggil langsung (bukan lewat cache segmentasi) agar yang diukur adalah pemecahannya
+    count_units = lambda result: sum(len(units) for units in result)
+    sentences = _stage(stages, "robust_sentence_splitter",
+                       lambda: [robust_sentence_splitter(t) for t in pages_text.values()], count_units, "kalimat/s", repeat)
+    _stage(stages, "paragraph_splitter",
+           lambda: [paragraph_splitter(t) for t in pages_paragraphs.values()], count_units, "paragraf/s", repeat)
+    n_sentences = sum(len(s) for s in sentences or [])
+    n_paragraphs = sum(len(paragraph_splitter(t)) for t in pages_paragraphs.values())
+
+    # Pencocokan diukur "dingin": cache segmentasi dikosongkan sebelum tiap ulangan
+    methods = ["tfidf", "minhash"] if skip_models else ["tfidf", "minhash", "semantic"]
+    for method in methods:
+        _stage(stages, f"find_sentence_matches[{method}]",
+               lambda: find_sentence_matches(citation, pages_text, 0.3, method), n_sentences, "kalimat/s", repeat,
+               clear_segmentation_cache)
+        _stage(stages, f"find_paragraph_matches[{method}]",
+               lambda: find_paragraph_matches(citation, pages_paragraphs, 0.3, method), n_paragraphs, "paragraf/s", repeat,
+               clear_segmentation_cache)
+        _stage(stages, f"find_crossunit_matches[{method}]",
+               lambda: find_crossunit_matches(citation, pages_paragraphs, 0.3, method, window_size=[2, 3]),
+               n_paragraphs, "paragraf/s", repeat, clear_segmentation_cache)
+
+    # Lookup LSH saja atas index yang sudah dibangun (biaya per sitasi setelah index di-cache)
+    from utils.minhash_utils import MinHashIndex
+    sentence_units = [unit for page_units in sentences or [] for unit in page_units]
+    if sentence_units:
+        minhash_index = MinHashIndex(sentence_units)
+        minhash_index.query(citation, 0.3)
+        _stage(stages, "minhash_query", lambda: minhash_index.query(citation, 0.3), n_sentences, "kalimat/s", repeat)
+
+    report = {"meta": _meta(pages, docx_paragraphs, repeat), "stages": stages}
+    if not skip_models:
+        from utils.semantic_utils import check_backend_parity, encode_texts, get_semantic_model
+        units = sentence_units
+        queries = [citation] + units[::max(1, len(units) // 20)][:20]
+
+        def encode_stage(name, backend, batch_size=None):
+            encode_stats = {}
+            _stage(stages, name,
+                   lambda: encode_texts(units, get_semantic_model(backend=backend), batch_size=batch_size, stats=encode_stats),
+                   len(units), "kalimat/s", repeat, lambda: (encode_stats.clear(), get_semantic_model(backend=backend)))
+            if "seconds" in stages[name] and encode_stats.get("seconds"):
+                stages[name]["tokens_per_second"] = round(encode_stats["tokens"] / encode_stats["seconds"], 1)
+                stages[name]["padding_ratio"] = round(encode_stats["padded_tokens"] / encode_stats["tokens"], 3)
+
+        for backend in backends:
+            encode_stage(f"encode[{backend}]", backend)
+            if backend != "torch" and "seconds" in stages[f"encode[{backend}]"]:
+                report.setdefault("parity", {})[backend] = check_backend_parity(units, queries, backend)
+        for batch_size in encode_batch_sizes:
+            encode_stage(f"encode[batch={batch_size}]", backends[0] if backends else "torch", batch_size)
+
+        from utils.translation_utils import LOCAL_MODEL_ID_EN, translate_texts_local
+        text = " ".join(synthetic_paragraphs(4, seed=1))
+        _stage(stages, "translate_local[ID-EN]",
+               lambda: translate_texts_local(text.split(". "), LOCAL_MODEL_ID_EN), len(text), "karakter/s", repeat)
+    return report
+
+
+def _meta(pages, docx_paragraphs, repeat):
+    return {
+        "pages": pages,
+        "docx_paragraphs": docx_paragraphs,
+        "repeat": repeat,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def compare_to_baseline(report, baseline, tolerance=0.2, min_delta=0.01):
+    """
+    Bandingkan waktu tiap tahap dengan baseline. Tahap dianggap regresi jika lebih lambat
+    dari tolerance relatif dan selisihnya lebih dari min_delta detik (tahap yang sangat
+    singkat terlalu berisik untuk dibandingkan secara relatif saja).
+    Returns: list dict {"stage", "seconds", "baseline", "ratio", "regression"} untuk tahap yang ada di keduanya.
+    """
+    rows = []
+    for name, current in report["stages"].items():
+        previous = baseline.get("stages", {}).get(name)
+        if not previous or "seconds" not in current or "seconds" not in previous:
+            continue
+        ratio = current["seconds"] / previous["seconds"] if previous["seconds"] else float("inf")
+        rows.append({
+            "stage": name,
+            "seconds": current["seconds"],
+            "baseline": previous["seconds"],
+            "ratio": round(ratio, 3),
+            "regression": ratio > 1 + tolerance and current["seconds"] - previous["seconds"] > min_delta,
+        })
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark ekstraksi, splitter, pencocokan dan terjemahan.")
+    parser.add_argument("--pages", type=int, default=50, help="Jumlah halaman PDF sintetis.")
+    parser.add_argument("--docx-paragraphs", type=int, default=200, help="Jumlah paragraf DOCX sintetis.")
+    parser.add_argument("--repeat", type=int, default=3, help="Ulangan per tahap (diambil waktu terbaik).")
+    parser.add_argument("--skip-models", action="store_true", help="Lewati tahap yang butuh Sentence-BERT/MarianMT.")
+    parser.add_argument("--backends", default="torch",
+                        help="Backend embedding yang dibandingkan, dipisah koma (torch,int8,onnx).")
+    parser.add_argument("--encode-batch-sizes", default="",
+                        help="Ukuran batch encode yang dibandingkan, dipisah koma (misal 16,32,64,128).")
+    parser.add_argument("--baseline", default=None, help="File JSON baseline untuk perbandingan.")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Batas perlambatan relatif sebelum dianggap regresi.")
+    parser.add_argument("--min-delta", type=float, default=0.01, help="Selisih minimum (detik) agar dianggap regresi.")
+    parser.add_argument("--save-baseline", default=None, help="Simpan hasil sebagai baseline JSON baru.")
+    parser.add_argument("--fail-on-regression", action="store_true", help="Exit code 1 jika ada regresi.")
+    args = parser.parse_args(argv)
+
+    report = run_suite(args.pages, args.docx_paragraphs, args.repeat, args.skip_models,
+                       backends=[b.strip() for b in args.backends.split(",") if b.strip()],
+                       encode_batch_sizes=[int(n) for n in args.encode_batch_sizes.split(",") if n.strip()])
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            report["comparison"] = compare_to_baseline(report, json.load(f), args.tolerance, args.min_delta)
+    print(json.dumps(report, indent=2))
+    if args.save_baseline:
+        with open(args.save_baseline, "w", encoding="utf-8") as f:
+            json.dump({"meta": report["meta"], "stages": report["stages"]}, f, indent=2)
+    regressions = [row["stage"] for row in report.get("comparison", []) if row["regression"]]
+    if regressions:
+        print(f"Regresi (> {args.tolerance:.0%} lebih lambat): {', '.join(regressions)}", file=sys.stderr)
+        if args.fail_on_regression:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,165 @@
+"""
+Load test layanan HTTP Citara (serve.py): latensi p50/p99 dan request/detik untuk /match.
+
+Tanpa --url, service dijalankan di proses yang sama (port bebas) dengan PDF sintetis,
+sehingga hasil dapat diulang di satu mesin CPU. Sitasi diambil dari kalimat sumber itu
+sendiri sehingga setiap request menghasilkan kecocokan.
+
+Contoh:
+    python -m benchmarks.load_test --requests 500 --concurrency 16
+    python -m benchmarks.load_test --method tfidf --concurrency 1,4,16,32
+    python -m benchmarks.load_test --url http://127.0.0.1:8765 --pdf sumber.pdf
+    python -m benchmarks.load_test --max-batch 1   # bandingkan tanpa micro-batching
+"""
+import argparse
+import base64
+import concurrent.futures
+import http.client
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+import urllib.parse
+
+import numpy as np
+
+
+class _Client:
+    """Klien JSON kecil dengan satu koneksi keep-alive per thread."""
+
+    def __init__(self, url):
+        parsed = urllib.parse.urlparse(url)
+        self.host, self.port = parsed.hostname, parsed.port or 80
+        self._local = threading.local()
+
+    def request(self, method, path, payload=None):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = http.client.HTTPConnection(self.host, self.port, timeout=300)
+        body = json.dumps(payload).encode("utf-8") if payload is not None else None
+        try:
+            conn.request(method, path, body=body, headers={"Content-Type": "application/json"})
+            response = conn.getresponse()
+            data = response.read()
+        except (http.client.HTTPException, OSError):
+            conn.close()
+            self._local.conn = None
+            raise
+        if response.getheader("Connection", "").lower() == "close":
+            conn.close()
+            self._local.conn = None
+        return response.status, data
+
+
+def sample_citations(pdf_path, n, unit_mode="sentence", min_words=6, seed=0):
+    """Ambil n kalimat/paragraf sumber secara acak sebagai sitasi uji."""
+    from utils.similarity_utils import _collect_units
+    from utils.source_library import extract_source_pages
+    from utils.text_segmentation import get_splitter
+    pages_text, _ = extract_source_pages(pdf_path, os.path.basename(pdf_path), unit_mode)
+    _, units = _collect_units(pages_text, get_splitter(unit_mode), None)
+    units = [unit for unit in units if len(unit.split()) >= min_words] or units
+    rng = random.Random(seed)
+    return [rng.choice(units) for _ in range(n)]
+
+
+def run_load(client, source_id, citations, concurrency, method="semantic", mode="sentence", threshold=0.6, top_k=5):
+    """Kirim semua sitasi ke /match dengan `concurrency` thread. Returns: laporan latensi/throughput."""
+    latencies, statuses, batch_sizes = [], {}, []
+    lock = threading.Lock()
+
+    def one(citation):
+        payload = {"citation": citation, "source_id": source_id, "mode": mode, "method": method,
+                   "threshold": threshold, "top_k": top_k}
+        start = time.perf_counter()
+        try:
+            status, data = client.request("POST", "/match", payload)
+        except (http.client.HTTPException, OSError):
+            status, data = "connection_error", b""
+        elapsed = time.perf_counter() - start
+        with lock:
+            statuses[str(status)] = statuses.get(str(status), 0) + 1
+            if status == 200:
+                latencies.append(elapsed)
+                batch_sizes.append(json.loads(data)["batch_size"])
+
+    start = time.perf_counter()
+    with concurrent.futures.ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(one, citations))
+    seconds = time.perf_counter() - start
+    ms = np.asarray(latencies) * 1000
+    return {
+        "concurrency": concurrency,
+        "requests": len(citations),
+        "ok": len(latencies),
+        "statuses": statuses,
+        "seconds": round(seconds, 3),
+        "requests_per_second": round(len(latencies) / seconds, 2) if seconds else None,
+        "p50_ms": round(float(np.percentile(ms, 50)), 2) if len(ms) else None,
+        "p90_ms": round(float(np.percentile(ms, 90)), 2) if len(ms) else None,
+        "p99_ms": round(float(np.percentile(ms, 99)), 2) if len(ms) else None,
+        "mean_batch": round(float(np.mean(batch_sizes)), 2) if batch_sizes else None,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load test /match layanan HTTP Citara.")
+    parser.add_argument("--url", default=None, help="URL service yang sudah berjalan (default: jalankan di proses ini).")
+    parser.add_argument("--pdf", default=None, help="PDF sumber (default: PDF sintetis).")
+    parser.add_argument("--pages", type=int, default=50, help="Jumlah halaman PDF sintetis.")
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--concurrency", default="1,8,32", help="Daftar jumlah klien bersamaan, dipisah koma.")
+    parser.add_argument("--method", choices=["semantic", "tfidf", "minhash"], default="semantic")
+    parser.add_argument("--mode", choices=["sentence", "paragraph"], default="sentence")
+    parser.add_argument("--threshold", type=float, default=0.6)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--max-batch", type=int, default=None, help="Untuk service di proses ini.")
+    parser.add_argument("--batch-wait-ms", type=float, default=None, help="Untuk service di proses ini.")
+    parser.add_argument("--queue-size", type=int, default=None, help="Untuk service di proses ini.")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        pdf_path = args.pdf
+        if pdf_path is None:
+            from benchmarks.bench_pipeline import make_synthetic_pdf
+            pdf_path = os.path.join(workdir, "sumber.pdf")
+            make_synthetic_pdf(pdf_path, pages=args.pages)
+
+        server = None
+        url = args.url
+        if url is None:
+            from utils.match_service import MatchService, make_server
+            service = MatchService(max_batch=args.max_batch, max_wait_ms=args.batch_wait_ms, queue_size=args.queue_size)
+            if args.method == "semantic":
+                service.warmup()
+            server = make_server(service, port=0)
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+            url = "http://%s:%d" % server.server_address[:2]
+
+        try:
+            client = _Client(url)
+            with open(pdf_path, "rb") as f:
+                data = base64.b64encode(f.read()).decode("ascii")
+            status, body = client.request("POST", "/extract", {"name": os.path.basename(pdf_path), "data": data, "mode": args.mode})
+            if status != 200:
+                raise SystemExit(f"/extract gagal ({status}): {body.decode('utf-8', 'replace')}")
+            source_id = json.loads(body)["source_id"]
+            citations = sample_citations(pdf_path, args.requests, args.mode)
+            # Satu putaran pemanasan: embedding unit sumber masuk cache sebelum pengukuran
+            run_load(client, source_id, citations[:4], 1, args.method, args.mode, args.threshold, args.top_k)
+            report = {"url": url, "method": args.method, "mode": args.mode, "source": pdf_path, "runs": []}
+            for concurrency in [int(c) for c in args.concurrency.split(",") if c.strip()]:
+                report["runs"].append(run_load(client, source_id, citations, concurrency, args.method, args.mode, args.threshold, args.top_k))
+            status, body = client.request("GET", "/health")
+            report["server"] = json.loads(body) if status == 200 else None
+        finally:
+            if server is not None:
+                server.shutdown()
+                server.server_close()
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,29 +1,36 @@
-import tempfile
-import os
-from utils.pdf_utils import is_valid_pdf
+from utils.pdf_utils import open_pdf_checked, load_pdf
 
-def process_pdf(uploaded_pdf):
-    """Simpan file PDF upload ke file sementara dan kembalikan path-nya."""
-    with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp_pdf:
-        tmp_pdf.write(uploaded_pdf.read())
-        return tmp_pdf.name
+def open_uploaded_pdf(uploaded_pdf, max_size_mb=20, max_pages=500):
+    """
+    Buka PDF upload langsung dari buffer memori (memoryview, tanpa salinan dan tanpa file
+    sementara) dan validasi sekali. Handle yang dikembalikan dipakai bersama untuk
+    ekstraksi dan highlight. Returns: (doc, "") atau (None, pesan_error).
+    """
+    try:
+        return open_pdf_checked(uploaded_pdf.getbuffer(), max_size_mb=max_size_mb, max_pages=max_pages)
+    except Exception as e:
+        return None, f"Terjadi error saat validasi PDF: {e}."
 
-def validate_pdf(pdf_path, max_size_mb=20, max_pages=500):
-    """Validasi ukuran dan jumlah halaman PDF."""
-    file_size = os.path.getsize(pdf_path) / (1024 * 1024)
-    if file_size > max_size_mb:
-        return False, f"Ukuran file PDF terlalu besar ({file_size:.1f} MB). Maksimal {max_size_mb} MB."
+def validate_pdf(pdf_source, max_size_mb=20, max_pages=500):
+    """Validasi ukuran dan jumlah halaman PDF (path atau buffer memori)."""
     try:
-        import PyPDF2
-        with open(pdf_path, "rb") as f:
-            reader = PyPDF2.PdfReader(f)
-            num_pages = len(reader.pages)
-            if num_pages > max_pages:
-                return False, f"Jumlah halaman PDF terlalu banyak ({num_pages}). Maksimal {max_pages} halaman."
-        if not is_valid_pdf(pdf_path):
-            return False, "File PDF tidak valid atau corrupt (berdasarkan pemeriksaan utils.pdf_utils)."
-    except PyPDF2.errors.PdfReadError as e:
-        return False, f"File PDF tidak dapat dibaca atau corrupt (PyPDF2 error: {e})."
+        doc, msg = open_pdf_checked(pdf_source, max_size_mb=max_size_mb, max_pages=max_pages)
     except Exception as e:
         return False, f"Terjadi error saat validasi PDF: {e}."
+    if doc is None:
+        return False, msg
+    doc.close()
     return True, ""
+
+def load_and_validate_pdf(pdf_source, mode, max_size_mb=20, max_pages=500, doc=None):
+    """
+    Validasi, hitung halaman dan ekstrak PDF dalam satu kali buka file.
+    pdf_source: path atau buffer memori; doc: handle yang sudah divalidasi (tidak dibuka ulang).
+    mode: "Paragraf" untuk paragraf per halaman, selain itu teks per halaman.
+    Returns: (pages_text, pesan_error); pages_text None jika tidak valid.
+    """
+    kind = "paragraphs" if mode == "Paragraf" else "text"
+    try:
+        return load_pdf(pdf_source, kind=kind, max_size_mb=max_size_mb, max_pages=max_pages, doc=doc)
+    except Exception as e:
+        return None, f"Terjadi error saat validasi PDF: {e}."
@@ -1,12 +1,105 @@
-from ui import sidebar_settings, show_matches
-from handlers import process_pdf, validate_pdf
+from ui import sidebar_settings, show_matches, show_matches_live, show_performance_panel, show_job_status, show_highlight_export
+from handlers import open_uploaded_pdf, load_and_validate_pdf
 import streamlit as st
-from utils.translation_utils import translate_text_from_ID_to_EN, translate_text_from_EN_to_ID
-from utils.pdf_utils import extract_text_by_page
-from utils.similarity_utils import find_sentence_matches, find_paragraph_matches, find_crossunit_matches
-from utils.docx_utils import extract_text_from_docx
+from utils.check_pipeline import iter_match_batches, run_citation_check, skips_translation, translate_citation
+from utils.job_queue import get_job_manager
+from utils.docx_utils import extract_docx_chunks
+from utils.pdf_utils import highlight_matches_in_pdf
+from utils.embedding_cache import compute_file_hash
+from utils.semantic_utils import (
+    EMBEDDING_BACKEND, EMBEDDING_MODEL, embedding_model_id, is_multilingual_model, warmup_semantic_model,
+)
+from utils.source_library import SourceLibrary
+from utils.match_results import MatchResults
+from utils.profiling import profile_session, span
+from utils.text_segmentation import ensure_punkt
 import os
 
+@st.cache_resource(show_spinner="Memuat model semantic...")
+def load_semantic_model(model_name, backend="torch"):
+    """Muat dan warm-up model semantic sekali per proses server Streamlit (per model dan backend)."""
+    return warmup_semantic_model(model_name, backend=backend)
+
+@st.cache_resource(show_spinner="Menyiapkan tokenizer kalimat...")
+def load_sentence_tokenizer():
+    """Cek/unduh data punkt NLTK sekali per proses (fallback ke pemisah regex jika gagal)."""
+    return ensure_punkt()
+
+def show_job_summary(summary):
+    """Catatan hasil job latar belakang: sitasi yang dipakai, statistik dua tahap, berhenti lebih awal, atau error."""
+    if summary.get("error"):
+        st.error(summary["error"])
+        return
+    st.info(f"**Sitasi yang digunakan untuk pencocokan:** {summary['citation_for_compare']}\n\n{summary['translation_info']}")
+    stats = summary.get("stats") or {}
+    if "lexical_examined" in stats:
+        st.caption(
+            f"Dua tahap: TF-IDF memeriksa {stats['lexical_examined']} unit, "
+            f"Sentence-BERT memeriksa {stats['semantic_examined']} kandidat "
+            f"({stats['semantic_encoded']} di-encode)."
+        )
+    if "lsh_candidates" in stats:
+        st.caption(f"MinHash/LSH: {stats['lsh_candidates']} kandidat dari {stats['units_total']} unit diperiksa.")
+    if summary.get("stopped_early"):
+        st.info("Pemrosesan dihentikan lebih awal: sudah ditemukan cukup hasil dengan kemiripan sangat tinggi.")
+
+def get_source_pdf(uploaded_source, file_hash):
+    """
+    Handle PDF sumber milik sesi ini, dibuka sekali dari buffer upload (tanpa file sementara)
+    dan dipakai bersama untuk validasi, ekstraksi dan highlight. Handle lama ditutup
+    ketika file sumber berganti. Returns: (doc, pesan_error).
+    """
+    cached = st.session_state.get("source_pdf")
+    if cached is not None and cached[0] == file_hash:
+        return cached[1], ""
+    if cached is not None:
+        cached[1].close()
+        del st.session_state["source_pdf"]
+    doc, msg = open_uploaded_pdf(uploaded_source)
+    if doc is not None:
+        st.session_state["source_pdf"] = (file_hash, doc)
+    return doc, msg
+
+def get_source_library(unit_mode, embedding_model, embedding_backend):
+    """Ambil pustaka sumber milik sesi ini untuk unit_mode serta model dan backend embedding sesi (dibuat bila belum ada)."""
+    libraries = st.session_state.setdefault("source_libraries", {})
+    key = (unit_mode, embedding_model_id(embedding_model, embedding_backend))
+    if key not in libraries:
+        libraries[key] = SourceLibrary(unit_mode=unit_mode, embedding_model=embedding_model, embedding_backend=embedding_backend)
+    return libraries[key]
+
+def run_library_check(citation_text, uploaded_sources, citation_lang_code, source_lang_code, use_local, threshold, mode, sort_option, embedding_model, embedding_backend):
+    """
+    Samakan pustaka sesi dengan file yang sedang diunggah (dokumen baru diindeks inkremental,
+    dokumen yang sudah dihapus dari uploader dikeluarkan) lalu cek sitasi terhadap seluruh pustaka.
+    """
+    unit_mode = "paragraph" if mode == "Paragraf" else "sentence"
+    library = get_source_library(unit_mode, embedding_model, embedding_backend)
+    file_hashes = [compute_file_hash(uploaded.getbuffer()) for uploaded in uploaded_sources]
+    for file_hash in set(library.documents) - set(file_hashes):
+        library.remove_document(file_hash)
+    progress_text = "Mengindeks dokumen pustaka..."
+    progress_bar = st.progress(0, text=progress_text)
+    for i, (uploaded, file_hash) in enumerate(zip(uploaded_sources, file_hashes)):
+        try:
+            library.add_document(uploaded.getbuffer(), uploaded.name, file_hash=file_hash)
+        except Exception as e:
+            st.error(f"Gagal menambahkan {uploaded.name} ke pustaka: {e}")
+        progress_bar.progress((i + 1) / len(uploaded_sources), text=f"{progress_text} ({i + 1}/{len(uploaded_sources)} dokumen)")
+    progress_bar.empty()
+    st.caption(f"Pustaka sumber: {len(library)} dokumen, {len(library.units)} unit ({mode.lower()}).")
+    try:
+        citation_for_compare, translation_info = translate_citation(
+            citation_text, citation_lang_code, source_lang_code, use_local, multilingual=is_multilingual_model(embedding_model)
+        )
+    except Exception as e:
+        st.error(f"Error dalam menerjemahkan sitasi: {e}")
+        st.stop()
+    st.info(f"**Sitasi yang digunakan untuk pencocokan:** {citation_for_compare}\n\n{translation_info}")
+    matches = library.search(citation_for_compare, similarity_threshold=threshold)
+    st.session_state["match_results"] = (MatchResults.from_tuples(matches), f"{mode} (pustaka {len(library)} dokumen)", "Semantic")
+    st.session_state["match_page_labels"] = library.page_labels()
+
 def run_app():
     st.set_page_config(page_title="Citara", layout="wide", page_icon="assets/logo-c.PNG")
 
@@ -20,8 +113,85 @@ def run_app():
             help="Aktifkan fitur ini untuk mendeteksi sitasi yang merupakan rangkuman/gabungan dari beberapa kalimat atau paragraf di sumber (sliding window). Cocok untuk sitasi berupa kesimpulan atau parafrase lintas bagian dokumen."
         )
         if crossunit_mode:
-            window_size = st.slider("Ukuran Window Gabungan (unit)", 2, 6, 3)
+            window_range = st.slider(
+                "Ukuran Window Gabungan (unit)", 2, 6, (3, 3),
+                help="Pilih rentang ukuran window; semua ukuran dalam rentang dicek dalam satu kali proses."
+            )
+            window_size = list(range(window_range[0], window_range[1] + 1))
             unit_mode = st.radio("Unit Gabungan", ["Kalimat", "Paragraf"], index=0)
+        library_mode = st.checkbox(
+            "Mode Pustaka Sumber (multi-dokumen)",
+            value=False,
+            key="library_mode",
+            help="Unggah beberapa PDF/DOCX sekaligus. Setiap dokumen diindeks sekali dan sitasi dicek terhadap seluruh pustaka dalam satu query (metode Semantic)."
+        )
+        if library_mode and st.button("Kosongkan Pustaka"):
+            st.session_state.pop("source_libraries", None)
+        if method == "Semantic":
+            with st.expander("Dua Tahap (Prefilter Leksikal)"):
+                two_stage = st.checkbox(
+                    "Aktifkan prefilter TF-IDF",
+                    value=False,
+                    help="TF-IDF memilih top-N kandidat terlebih dahulu, lalu hanya kandidat tersebut yang diskor ulang dengan Sentence-BERT. Jauh lebih cepat untuk sumber panjang (mode Kalimat/Paragraf)."
+                )
+                rerank_top_n = st.number_input("Jumlah kandidat (N)", 10, 5000, 200, step=10, disabled=not two_stage)
+                rerank_margin = st.slider(
+                    "Margin pengaman recall", 0.0, 0.3, 0.05, 0.01, disabled=not two_stage,
+                    help="Unit dengan skor TF-IDF dalam margin ini dari kandidat ke-N ikut diskor ulang."
+                )
+        show_performance = st.checkbox(
+            "Tampilkan Panel Performa",
+            value=False,
+            help="Ukur waktu tiap tahap (ekstraksi, terjemahan, encode, pencocokan, render) beserta jumlah unit dan cache hit rate."
+        )
+        with st.expander("Hasil Bertahap"):
+            live_top_n = st.number_input("Jumlah hasil sementara yang ditampilkan", 1, 100, 10)
+            early_stop = st.checkbox(
+                "Hentikan lebih awal",
+                value=False,
+                help="Hentikan pemrosesan begitu sudah ditemukan sejumlah hasil dengan kemiripan sangat tinggi."
+            )
+            stop_after = st.number_input("Berhenti setelah K hasil", 1, 100, 3, disabled=not early_stop)
+            stop_score = st.slider("dengan kemiripan minimal", 0.5, 1.0, 0.9, 0.01, disabled=not early_stop)
+            if method == "TF-IDF":
+                st.caption("TF-IDF di-fit atas seluruh sumber sebelum hasil pertama muncul; hasil bertahap hanya mempercepat tampilan, bukan segmentasi dan fit.")
+        background_jobs = st.checkbox(
+            "Proses di Latar Belakang",
+            value=os.getenv("CITARA_BACKGROUND_JOBS", "1") == "1",
+            disabled=library_mode,
+            help="Pemeriksaan dijalankan sebagai job di worker terpisah: interaksi widget tidak memulai ulang proses, progres dapat dipantau dan job dapat dibatalkan. Nonaktifkan untuk melihat hasil sementara secara langsung."
+        )
+        background_jobs = background_jobs and not library_mode
+
+    check_options = {
+        "mode": mode,
+        "method": method,
+        "threshold": threshold,
+        "crossunit": crossunit_mode,
+        "window_size": window_size if crossunit_mode else None,
+        "unit_mode": unit_mode if crossunit_mode else None,
+        "two_stage": method == "Semantic" and two_stage,
+        "rerank_top_n": rerank_top_n if method == "Semantic" else None,
+        "rerank_margin": rerank_margin if method == "Semantic" else None,
+        "stop_after": stop_after if early_stop else None,
+        "stop_score": stop_score,
+        # Model dan backend pilihan sesi ini (bukan global proses): dipakai untuk model dan key cache embedding
+        "embedding_model": st.session_state.get("embedding_model", EMBEDDING_MODEL),
+        "embedding_backend": st.session_state.get("embedding_backend", EMBEDDING_BACKEND),
+    }
+
+    # Warm-up saat startup (nonaktifkan dengan CITARA_WARMUP=0): punkt dipakai semua metode,
+    # model semantic hanya jika dibutuhkan; job latar belakang memuat model di worker
+    warmup = os.getenv("CITARA_WARMUP", "1") == "1"
+    if warmup:
+        load_sentence_tokenizer()
+    if (method == "Semantic" or library_mode) and not background_jobs and warmup:
+        try:
+            load_semantic_model(check_options["embedding_model"], check_options["embedding_backend"])
+        except ImportError as e:
+            st.sidebar.warning(f"Backend {check_options['embedding_backend']} tidak tersedia ({e}); memakai PyTorch fp32.")
+            check_options["embedding_backend"] = "torch"
+            load_semantic_model(check_options["embedding_model"], "torch")
 
     # --- MAIN LAYOUT ---
     st.markdown("""
@@ -134,7 +304,7 @@ def run_app():
         </style>
         """, unsafe_allow_html=True)
         source_lang = st.selectbox("Bahasa Sumber", list(lang_options.keys()), index=0, key="pdf_source_lang")
-        uploaded_source = st.file_uploader("Pilih file sumber (PDF atau Word)", type=["pdf", "docx"])
+        uploaded_source = st.file_uploader("Pilih file sumber (PDF atau Word)", type=["pdf", "docx"], accept_multiple_files=library_mode)
         process = st.button("Proses", use_container_width=True, key="btn-proses")
         st.markdown("""
         <style>
@@ -157,96 +327,161 @@ def run_app():
         </style>
         """, unsafe_allow_html=True)
 
-    if process:
-        if not citation_text.strip():
-            st.warning("Masukkan teks sitasi!")
-        elif not uploaded_source:
-            st.warning("Pilih file sumber (PDF/Word)!")
-        else:
-            with st.spinner("Menerjemahkan dan memproses..."):
-                file_ext = os.path.splitext(uploaded_source.name)[1].lower()
-                if file_ext == ".pdf":
-                    source_path = process_pdf(uploaded_source)
-                    valid, msg = validate_pdf(source_path)
-                    if not valid:
-                        st.error(msg)
-                        os.unlink(source_path)
-                        st.stop()
-                    if mode == "Paragraf":
-                        from utils.pdf_utils import extract_paragraphs_by_page
-                        pages_text = extract_paragraphs_by_page(source_path)  # dict {halaman: [paragraf, ...]}
+    # Profiling per tahap hanya aktif jika panel performa dinyalakan (tanpa overhead jika tidak)
+    with profile_session("pemeriksaan", enabled=show_performance and process) as perf:
+        if perf is not None:
+            st.session_state["perf_session"] = perf
+        if process:
+            # Hasil lama dibuang; halaman hasil kembali ke 1; job yang masih berjalan dibatalkan
+            st.session_state.pop("match_results", None)
+            st.session_state.pop("match_result_page", None)
+            st.session_state.pop("job_summary", None)
+            st.session_state.pop("match_source", None)
+            st.session_state.pop("match_page_labels", None)
+            st.session_state.pop("match_citation", None)
+            st.session_state.pop("highlight_pdf", None)
+            previous_job = st.session_state.pop("active_job", None)
+            if previous_job is not None:
+                try:
+                    get_job_manager().cancel(previous_job[0])
+                except KeyError:
+                    pass
+            if not citation_text.strip():
+                st.warning("Masukkan teks sitasi!")
+            elif not uploaded_source:
+                st.warning("Pilih file sumber (PDF/Word)!")
+            elif library_mode:
+                with st.spinner("Mengindeks pustaka dan memproses..."), span("library_check", documents=len(uploaded_source)):
+                    run_library_check(
+                        citation_text, uploaded_source, lang_options[citation_lang], lang_options[source_lang],
+                        use_local, threshold, mode, sort_option,
+                        check_options["embedding_model"], check_options["embedding_backend"]
+                    )
+            elif background_jobs:
+                if uploaded_source.name.lower().endswith(".pdf"):
+                    st.session_state["match_source"] = compute_file_hash(uploaded_source.getbuffer())
+                options = dict(check_options, use_local=use_local, profile=show_performance)
+                job_id = get_job_manager().submit(
+                    run_citation_check, bytes(uploaded_source.getbuffer()), uploaded_source.name, citation_text,
+                    lang_options[citation_lang], lang_options[source_lang], options
+                )
+                st.session_state["active_job"] = (job_id, method)
+            else:
+                with st.spinner("Menerjemahkan dan memproses..."):
+                    file_ext = os.path.splitext(uploaded_source.name)[1].lower()
+                    with span("hash"):
+                        file_hash = compute_file_hash(uploaded_source.getbuffer())
+                    if file_ext == ".pdf":
+                        with span("open_pdf", bytes=uploaded_source.size):
+                            pdf_doc, msg = get_source_pdf(uploaded_source, file_hash)
+                        if pdf_doc is None:
+                            st.error(msg)
+                            st.stop()
+                        with span("validate_extract", mode=mode) as stage:
+                            pages_text, msg = load_and_validate_pdf(uploaded_source.getbuffer(), mode, doc=pdf_doc)
+                            stage.set(pages=len(pages_text or {}))
+                        if pages_text is None:
+                            st.error(msg)
+                            st.stop()
+                        source_key = (file_hash, "pdf-paragraphs" if mode == "Paragraf" else "pdf-text")
+                        st.session_state["match_source"] = file_hash
+                        if not pages_text:
+                            st.error("Tidak dapat mengekstrak teks dari file PDF.")
+                            st.stop()
+                    elif file_ext == ".docx":
+                        # Chunk per section/judul berukuran terbatas; label lokasi dipakai saat menampilkan hasil
+                        page_labels = {}
+                        try:
+                            with span("docx_extract") as stage:
+                                pages_text = extract_docx_chunks(uploaded_source, page_labels=page_labels)
+                                stage.set(pages=len(pages_text))
+                            source_key = (file_hash, "docx-blocks")
+                        except Exception as e:
+                            st.error(f"Gagal membaca file Word: {e}")
+                            st.stop()
+                        if not pages_text:
+                            st.error("Tidak dapat mengekstrak teks dari file Word.")
+                            st.stop()
+                        st.session_state["match_page_labels"] = page_labels
                     else:
-                        pages_text = extract_text_by_page(source_path)
-                    if not pages_text:
-                        st.error("Tidak dapat mengekstrak teks dari file PDF.")
-                        os.unlink(source_path)
-                        st.stop()
-                elif file_ext == ".docx":
-                    try:
-                        text = extract_text_from_docx(uploaded_source)
-                        pages_text = {1: text}
-                        source_path = None
-                    except Exception as e:
-                        st.error(f"Gagal membaca file Word: {e}")
+                        st.error("Format file sumber tidak didukung. Hanya PDF dan Word (.docx).")
                         st.stop()
-                else:
-                    st.error("Format file sumber tidak didukung. Hanya PDF dan Word (.docx).")
-                    st.stop()
-
-                citation_for_compare = citation_text
-                translation_info = ""
-                citation_lang_code = lang_options[citation_lang]
-                source_lang_code = lang_options[source_lang]
-                if citation_lang_code != source_lang_code:
+
                     try:
-                        if citation_lang_code == "ID" and source_lang_code == "EN":
-                            citation_for_compare = translate_text_from_ID_to_EN(citation_text, use_local=use_local)
-                            translation_info = f"(Sitasi diterjemahkan dari Bahasa Indonesia ke Bahasa Inggris)"
-                        elif citation_lang_code == "EN" and source_lang_code == "ID":
-                            citation_for_compare = translate_text_from_EN_to_ID(citation_text, use_local=use_local)
-                            translation_info = f"(Sitasi diterjemahkan dari Bahasa Inggris ke Bahasa Indonesia)"
+                        with span("translate", local=use_local):
+                            citation_for_compare, translation_info = translate_citation(
+                                citation_text, lang_options[citation_lang], lang_options[source_lang], use_local,
+                                multilingual=skips_translation(check_options)
+                            )
                     except Exception as e:
                         st.error(f"Error dalam menerjemahkan sitasi: {e}")
-                        if file_ext == ".pdf" and source_path:
-                            os.unlink(source_path)
                         st.stop()
-                else:
-                    translation_info = "(Tidak perlu translasi, bahasa sama)"
 
-                st.info(f"**Sitasi yang digunakan untuk pencocokan:** {citation_for_compare}\n\n{translation_info}")
+                    st.info(f"**Sitasi yang digunakan untuk pencocokan:** {citation_for_compare}\n\n{translation_info}")
 
-                if len(pages_text) > 100:
-                    st.warning("File sumber ini cukup besar, proses bisa memakan waktu lebih lama dari biasanya.")
+                    if len(pages_text) > 100:
+                        st.warning("File sumber ini cukup besar, proses bisa memakan waktu lebih lama dari biasanya.")
 
-                progress_text = "Memproses kemiripan..."
-                progress_bar = st.progress(0, text=progress_text)
-                def progress_callback(val, maxval):
-                    progress_bar.progress(val / maxval, text=f"{progress_text} ({val}/{maxval} halaman)")
+                    progress_text = "Memproses kemiripan..."
+                    progress_bar = st.progress(0, text=progress_text)
+                    def progress_callback(val, maxval):
+                        progress_bar.progress(val / maxval, text=f"{progress_text} ({val}/{maxval} halaman)")
 
-                if mode == "Paragraf":
-                    matches = find_paragraph_matches(
-                        citation_for_compare, pages_text, similarity_threshold=threshold,
-                        method=method.lower(), progress_callback=progress_callback
-                    )
-                    tipe_cek = "Paragraf"
-                elif 'crossunit_mode' in locals() and crossunit_mode:
-                    matches = find_crossunit_matches(
-                        citation_for_compare, pages_text, similarity_threshold=threshold,
-                        method=method.lower(), progress_callback=progress_callback,
-                        window_size=window_size, unit_mode="sentence" if unit_mode=="Kalimat" else "paragraph"
+                    stage_stats = {}
+                    match_batches, tipe_cek = iter_match_batches(
+                        citation_for_compare, pages_text, check_options,
+                        progress_callback=progress_callback, source_key=source_key, stats=stage_stats
                     )
-                    tipe_cek = f"Gabungan {window_size} {unit_mode.lower()}"
-                else:
-                    matches = find_sentence_matches(
-                        citation_for_compare, pages_text, similarity_threshold=threshold,
-                        method=method.lower(), progress_callback=progress_callback
+                    with span("match", method=method, mode=tipe_cek) as stage:
+                        matches, stopped_early = show_matches_live(
+                            match_batches, top_n=live_top_n,
+                            stop_after=stop_after if early_stop else None, stop_score=stop_score,
+                            page_labels=st.session_state.get("match_page_labels")
+                        )
+                        stage.set(matches=len(matches))
+                    progress_bar.empty()
+
+                    if "lexical_examined" in stage_stats:
+                        st.caption(
+                            f"Dua tahap: TF-IDF memeriksa {stage_stats['lexical_examined']} unit, "
+                            f"Sentence-BERT memeriksa {stage_stats['semantic_examined']} kandidat "
+                            f"({stage_stats['semantic_encoded']} di-encode)."
+                        )
+                    if "lsh_candidates" in stage_stats:
+                        st.caption(f"MinHash/LSH: {stage_stats['lsh_candidates']} kandidat dari {stage_stats['units_total']} unit diperiksa.")
+                    if stopped_early:
+                        st.info(f"Pemrosesan dihentikan lebih awal: sudah ditemukan {stop_after} hasil dengan kemiripan ≥ {stop_score:.2f}.")
+                    st.session_state["match_results"] = (matches, tipe_cek, method)
+                    st.session_state["match_citation"] = citation_for_compare
+
+        # Job latar belakang: rerun (termasuk setelah interaksi widget) menyambung kembali ke job yang sama
+        if "active_job" in st.session_state:
+            show_job_status(get_job_manager())
+        if "job_summary" in st.session_state:
+            show_job_summary(st.session_state["job_summary"])
+
+        # Hasil disimpan di session agar pindah halaman hasil/urutan tidak memproses ulang
+        if "match_results" in st.session_state:
+            matches, tipe_cek, method_label = st.session_state["match_results"]
+            with span("render", matches=len(matches)):
+                show_matches(
+                    matches, tipe_cek, method_label, sort_option,
+                    page_labels=st.session_state.get("match_page_labels"),
+                    citation_text=st.session_state.get("match_citation")
+                )
+            # Ekspor highlight hanya untuk sumber PDF yang masih sama dengan file di uploader
+            match_source = st.session_state.get("match_source")
+            if matches and match_source and uploaded_source and not library_mode \
+                    and compute_file_hash(uploaded_source.getbuffer()) == match_source:
+                pdf_doc, _ = get_source_pdf(uploaded_source, match_source)
+                if pdf_doc is not None:
+                    show_highlight_export(
+                        lambda quick_save: highlight_matches_in_pdf(None, matches, doc=pdf_doc, quick_save=quick_save),
+                        uploaded_source.name, source_key=match_source
                     )
-                    tipe_cek = "Kalimat"
-                progress_bar.empty()
 
-                if file_ext == ".pdf" and source_path:
-                    os.unlink(source_path)
-                show_matches(matches, tipe_cek, method, sort_option)
+    if show_performance and "perf_session" in st.session_state:
+        show_performance_panel(st.session_state["perf_session"])
 
 if __name__ == "__main__":
     run_app()
\ No newline at end of file
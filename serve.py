@@ -0,0 +1,55 @@
+"""
+Layanan HTTP lokal Citara (headless) untuk sistem lain, misal portal pengumpulan tesis atau plugin LMS.
+
+Contoh:
+    python serve.py --port 8765
+    python serve.py --max-batch 64 --batch-wait-ms 10 --queue-size 256
+
+Endpoint (JSON, file dikirim sebagai base64):
+    POST /extract    {"name": "buku.pdf", "data": "<base64>", "mode": "sentence"}  -> {"source_id", "pages", ...}
+    POST /translate  {"text", "citation_lang": "ID", "source_lang": "EN", "use_local": false}
+    POST /match      {"citation", "source_id", "mode", "method": "semantic", "threshold": 0.6, "top_k": 5}
+    POST /highlight  {"source_id", "matches": [{"page", "text", "score"}]}  -> application/pdf
+    GET  /health     status, model, statistik micro-batching
+
+Request match yang datang bersamaan digabung (micro-batching) sehingga sitasi di-encode
+dalam satu panggilan; antrian penuh atau terlalu banyak request aktif dijawab 503 + Retry-After.
+"""
+import argparse
+import logging
+
+from utils.match_service import MatchService, make_server
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Layanan HTTP pencocokan sitasi Citara.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--max-batch", type=int, default=None, help="Maks. sitasi per batch encode (default: CITARA_SERVICE_MAX_BATCH).")
+    parser.add_argument("--batch-wait-ms", type=float, default=None, help="Waktu tunggu pengumpulan batch (default: CITARA_SERVICE_BATCH_WAIT_MS).")
+    parser.add_argument("--queue-size", type=int, default=None, help="Panjang antrian match sebelum menolak dengan 503.")
+    parser.add_argument("--max-inflight", type=int, default=None, help="Maks. request aktif sebelum menolak dengan 503.")
+    parser.add_argument("--max-concurrency", type=int, default=None, help="Maks. ekstraksi/terjemahan/highlight bersamaan.")
+    parser.add_argument("--no-warmup", action="store_true", help="Jangan muat model semantic saat start.")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    service = MatchService(
+        max_batch=args.max_batch, max_wait_ms=args.batch_wait_ms, queue_size=args.queue_size,
+        max_inflight=args.max_inflight, max_concurrency=args.max_concurrency
+    )
+    if not args.no_warmup:
+        logging.info("Memuat model semantic...")
+        service.warmup()
+    server = make_server(service, args.host, args.port)
+    logging.info("Citara service berjalan di http://%s:%d", *server.server_address[:2])
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,57 @@
 import unittest
 from utils.translation_utils import translate_text_from_ID_to_EN, translate_text_from_EN_to_ID
-from utils.pdf_utils import extract_text_by_page, is_valid_pdf
+from utils.pdf_utils import extract_text_by_page, extract_paragraphs_by_page, is_valid_pdf, load_pdf
 from utils.semantic_utils import compute_semantic_similarity
-from utils.similarity_utils import find_sentence_matches, find_paragraph_matches
+from utils.similarity_utils import find_sentence_matches, find_paragraph_matches, compute_tfidf_similarity_corpus, iter_sentence_matches, iter_crossunit_matches, find_crossunit_matches
 from utils.docx_utils import extract_text_from_docx, extract_paragraphs_from_docx, extract_text_by_section
+from utils.semantic_utils import compute_semantic_similarity_cached, get_semantic_model, unload_semantic_model, get_semantic_model_stats, check_backend_parity, embedding_model_id, quantize_model_int8, resolve_embedding_backend
+from utils.ann_index import IVFIndex, UnitIndex, exact_search
+from utils.source_library import SourceLibrary, extract_source_pages
+from utils.batch_utils import check_citations_batch, load_citations
+from unittest import mock
+import io
+from utils.embedding_cache import EmbeddingCache, compute_file_hash, make_cache_key
 import os
+import tempfile
+import time
+import numpy as np
+
+class HashingEncoder:
+    """Encoder bag-of-words deterministik pengganti Sentence-BERT untuk test tanpa unduhan model."""
+
+    def __init__(self, dim=64):
+        self.dim = dim
+        self.encoded_texts = 0
+
+    def encode(self, texts, **kwargs):
+        if isinstance(texts, str):
+            texts = [texts]
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for i, text in enumerate(texts):
+            for word in text.lower().split():
+                vectors[i, sum(map(ord, word.strip(".,!?"))) % self.dim] += 1.0
+        self.encoded_texts += len(texts)
+        return vectors
+
+def make_sample_pdf(path, num_pages, text="Halaman {n}. Model bahasa dilatih pada korpus teks yang sangat besar sekali."):
+    """Buat PDF sintetis dengan satu paragraf per halaman."""
+    import fitz
+    doc = fitz.open()
+    for n in range(1, num_pages + 1):
+        doc.new_page().insert_textbox(fitz.Rect(72, 72, 520, 400), text.format(n=n))
+    doc.save(path)
+    doc.close()
 
 class TestUtils(unittest.TestCase):
     """Unit test untuk berbagai fungsi utilitas Citara."""
 
+    def assertMatchesEqual(self, actual, expected):
+        """Bandingkan hasil (MatchResults atau list tuple): kolom selain skor sama persis, skor hampir sama."""
+        actual, expected = list(actual), list(expected)
+        self.assertEqual([m[:-1] for m in actual], [m[:-1] for m in expected])
+        for got, want in zip(actual, expected):
+            self.assertAlmostEqual(got[-1], want[-1])
+
     def test_translate_text_from_ID_to_EN(self):
         """Test terjemahan dari Bahasa Indonesia ke Bahasa Inggris menggunakan model lokal."""
         result = translate_text_from_ID_to_EN("Ini adalah tes.", use_local=True)
@@ -48,6 +91,776 @@ class TestUtils(unittest.TestCase):
         matches = find_sentence_matches(citation, pages_text, similarity_threshold=0.5, method="tfidf")
         self.assertTrue(len(matches) > 0)
 
+    def test_find_sentence_matches_tfidf_corpus_vs_pairwise(self):
+        """Test TF-IDF mode corpus dan pairwise menemukan unit yang sama untuk kalimat identik."""
+        citation = "Language models are trained on large text corpora."
+        pages_text = {
+            1: "Language models are trained on large text corpora. Cats like milk.",
+            2: "The weather is nice today.",
+        }
+        corpus_matches = find_sentence_matches(citation, pages_text, similarity_threshold=0.9, method="tfidf")
+        pairwise_matches = find_sentence_matches(citation, pages_text, similarity_threshold=0.9, method="tfidf", tfidf_mode="pairwise")
+        self.assertEqual([(p, u) for p, u, _ in corpus_matches], [(p, u) for p, u, _ in pairwise_matches])
+        self.assertEqual(corpus_matches[0][0], 1)
+        self.assertAlmostEqual(corpus_matches[0][2], 1.0, places=6)
+
+    def test_compute_tfidf_similarity_corpus(self):
+        """Test skor TF-IDF korpus berurutan sesuai unit dan aman untuk input kosong."""
+        scores = compute_tfidf_similarity_corpus("red apple", ["red apple", "blue sky", "green apple"])
+        self.assertEqual(len(scores), 3)
+        self.assertGreater(scores[0], scores[2])
+        self.assertGreater(scores[2], scores[1])
+        self.assertEqual(len(compute_tfidf_similarity_corpus("red apple", [])), 0)
+
+    def test_embedding_cache_reuses_source_embeddings(self):
+        """Test embedding sumber hanya di-encode sekali untuk key cache yang sama."""
+        encoder = HashingEncoder()
+        units = ["large language models", "the cat sat on the mat", "deep neural networks"]
+        with tempfile.TemporaryDirectory() as cache_dir:
+            cache = EmbeddingCache(cache_dir=cache_dir)
+            key = make_cache_key(compute_file_hash(b"%PDF-dummy"), "pdf-text", "robust_sentence_splitter", "hashing")
+            first = compute_semantic_similarity_cached("large language models", units, encoder, cache_key=key, cache=cache)
+            encoded_after_first = encoder.encoded_texts
+            second = compute_semantic_similarity_cached("large language models", units, encoder, cache_key=key, cache=cache)
+            self.assertEqual(encoder.encoded_texts - encoded_after_first, 1)
+            self.assertEqual(cache.hits, 1)
+            self.assertEqual(int(np.argmax(second)), 0)
+            np.testing.assert_allclose(first, second, atol=1e-2)
+
+    def test_embedding_cache_lru_eviction(self):
+        """Test eviksi LRU menghapus entri yang paling lama tidak diakses."""
+        with tempfile.TemporaryDirectory() as cache_dir:
+            cache = EmbeddingCache(cache_dir=cache_dir, max_size_mb=0.05, dtype=np.float32)
+            block = np.ones((40, 256), dtype=np.float32)  # ~40 KB per entri
+            cache.put("a", block)
+            os.utime(os.path.join(cache_dir, "a.npy"), (1, 1))
+            cache.put("b", block)
+            self.assertIsNone(cache.get("a"))
+            self.assertIsNotNone(cache.get("b"))
+            self.assertIsNone(cache.get("b", expected_rows=3))
+
+    def test_semantic_model_registry_loads_once(self):
+        """Test registry model memuat model sekali per proses dan dapat di-unload."""
+        with mock.patch("utils.semantic_utils._load_sentence_transformer", side_effect=lambda name, backend="torch": HashingEncoder()) as loader:
+            try:
+                first = get_semantic_model("dummy-model")
+                second = get_semantic_model("dummy-model")
+                self.assertIs(first, second)
+                self.assertEqual(loader.call_count, 1)
+                self.assertIn("load_seconds", get_semantic_model_stats()["dummy-model"])
+            finally:
+                unload_semantic_model("dummy-model")
+            self.assertNotIn("dummy-model", get_semantic_model_stats())
+            get_semantic_model("dummy-model")
+            self.assertEqual(loader.call_count, 2)
+            unload_semantic_model("dummy-model")
+
+    def test_embedding_backend_registry_and_parity(self):
+        """Test setiap backend embedding dimuat terpisah, punya key cache sendiri dan lolos cek paritas."""
+        class NoisyEncoder(HashingEncoder):
+            def encode(self, texts, **kwargs):
+                vectors = super().encode(texts, **kwargs)
+                return vectors + 0.001 * np.sin(np.arange(vectors.size, dtype=np.float32)).reshape(vectors.shape)
+
+        loaders = {"torch": HashingEncoder, "int8": NoisyEncoder}
+        with mock.patch("utils.semantic_utils._load_sentence_transformer",
+                        side_effect=lambda name, backend="torch": loaders[backend]()) as loader:
+            try:
+                self.assertIsNot(get_semantic_model("dummy-model", "torch"), get_semantic_model("dummy-model", "int8"))
+                self.assertEqual(loader.call_count, 2)
+                self.assertEqual(get_semantic_model_stats()["dummy-model@int8"]["backend"], "int8")
+                texts = ["model bahasa dilatih pada korpus", "kucing tidur di sofa", "harga saham naik tajam"]
+                report = check_backend_parity(texts, ["model bahasa korpus"], "int8", model_name="dummy-model")
+                self.assertTrue(report["ok"])
+                self.assertLess(report["max_score_diff"], 0.02)
+                self.assertEqual(report["top10_overlap"], 1.0)
+            finally:
+                unload_semantic_model("dummy-model")
+            self.assertEqual(get_semantic_model_stats(), {})
+        self.assertEqual(embedding_model_id("m", "torch"), "m")
+        self.assertEqual(embedding_model_id("m", "onnx"), "m@onnx")
+        with self.assertRaises(ValueError):
+            resolve_embedding_backend("tpu")
+
+    def test_embedding_backend_is_explicit_per_call(self):
+        """Test backend embedding dikirim per pemanggilan: model dan key cache selalu memakai backend yang sama."""
+        encoders = {"torch": HashingEncoder(), "int8": HashingEncoder()}
+        pages_text = {1: ["paragraf tentang model bahasa"], 2: ["paragraf tentang kucing"]}
+        with tempfile.TemporaryDirectory() as cache_dir, \
+                mock.patch("utils.embedding_cache._default_cache", EmbeddingCache(cache_dir=cache_dir)) as cache, \
+                mock.patch("utils.similarity_utils.get_semantic_model", side_effect=lambda model_name=None, backend=None: encoders[backend]):
+            for backend in ("int8", "torch", "int8"):
+                find_paragraph_matches("model bahasa", pages_text, 0.5, "semantic", source_key=("hash", "pdf-paragraphs"), embedding_backend=backend)
+            self.assertEqual(cache.stats()["entries"], 2)
+        # Pemeriksaan kedua dengan int8 memakai cache int8: unit tidak di-encode ulang
+        self.assertEqual(encoders["int8"].encoded_texts, 2 + 2)
+        self.assertEqual(encoders["torch"].encoded_texts, 2 + 1)
+
+    def test_embedding_model_is_explicit_per_call(self):
+        """Test model embedding dikirim per pemanggilan: embedding model lain tidak tersimpan di key cache model ini."""
+        import utils.semantic_utils as semantic_utils
+        default_model = semantic_utils.EMBEDDING_MODEL
+        encoders = {"model-a": HashingEncoder(dim=32), "model-b": HashingEncoder(dim=64)}
+        pages_text = {1: ["paragraf tentang model bahasa"], 2: ["paragraf tentang kucing"]}
+        with tempfile.TemporaryDirectory() as cache_dir, \
+                mock.patch("utils.embedding_cache._default_cache", EmbeddingCache(cache_dir=cache_dir)) as cache, \
+                mock.patch("utils.similarity_utils.get_semantic_model", side_effect=lambda model_name=None, backend=None: encoders[model_name]):
+            for model_name in ("model-a", "model-b", "model-a"):
+                find_paragraph_matches("model bahasa", pages_text, 0.5, "semantic", source_key=("hash", "pdf-paragraphs"), embedding_model=model_name)
+            self.assertEqual(cache.stats()["entries"], 2)
+            for model_name, encoder in encoders.items():
+                cached = cache.get(make_cache_key("hash", "pdf-paragraphs", "paragraph_splitter", model_name))
+                self.assertEqual(cached.shape, (2, encoder.dim))
+        self.assertEqual(encoders["model-a"].encoded_texts, 2 + 1 + 1)
+        self.assertEqual(encoders["model-b"].encoded_texts, 2 + 1)
+        self.assertEqual(semantic_utils.EMBEDDING_MODEL, default_model)
+        self.assertFalse(hasattr(semantic_utils, "set_embedding_model"))
+
+    def test_quantize_model_int8_close_to_fp32(self):
+        """Test dynamic quantization int8 mengganti Linear dan menjaga output dekat dengan fp32."""
+        import torch
+        torch.manual_seed(0)
+        model = torch.nn.Sequential(torch.nn.Linear(32, 64), torch.nn.ReLU(), torch.nn.Linear(64, 16)).eval()
+        quantized = quantize_model_int8(model)
+        self.assertNotIsInstance(quantized[0], torch.nn.Linear)
+        inputs = torch.randn(8, 32)
+        with torch.inference_mode():
+            expected, actual = model(inputs), quantized(inputs)
+        cosine = torch.nn.functional.cosine_similarity(expected, actual, dim=1)
+        self.assertGreater(float(cosine.min()), 0.99)
+
+    def test_length_bucketed_encoding_across_pages(self):
+        """Test encode dibatch per panjang token lintas halaman, urutan embedding tetap dan sitasi di-encode sekali."""
+        from utils.semantic_utils import encode_texts, plan_length_buckets
+        lengths = np.array([5, 40, 6, 38, 7, 100])
+        batches = plan_length_buckets(lengths, batch_size=2, token_budget=90)
+        self.assertEqual([b.tolist() for b in batches], [[0, 2], [4, 3], [1], [5]])
+        self.assertTrue(all(len(b) * lengths[b].max() <= 90 or len(b) == 1 for b in batches))
+
+        encoder = HashingEncoder()
+        texts = ["satu", "dua kata di sini", "tiga kata saja", "empat"]
+        stats = {}
+        encoded = encode_texts(texts, encoder, batch_size=2, stats=stats)
+        np.testing.assert_allclose(encoded, encode_texts([t for t in texts], HashingEncoder(), batch_size=64))
+        self.assertEqual(stats["texts"], 4)
+        self.assertEqual(stats["batches"], 2)
+        self.assertGreater(stats["tokens"], 0)
+
+        pages_text = {n: f"Kalimat nomor {n} tentang model bahasa." for n in range(1, 9)}
+        encoder = HashingEncoder()
+        with mock.patch.object(encoder, "encode", wraps=encoder.encode) as encode, \
+                mock.patch("utils.similarity_utils.get_semantic_model", return_value=encoder):
+            stats = {}
+            matches = find_sentence_matches("model bahasa", pages_text, 0.0, "semantic", stats=stats)
+        self.assertEqual([page for page, _, _ in matches], list(range(1, 9)))
+        # Satu encode untuk sitasi + kelompok halaman yang membesar (1, 2, 4, sisa 1), bukan satu encode per halaman
+        self.assertEqual(encode.call_count, 1 + 4)
+        self.assertEqual(stats["texts"], 9)
+        self.assertIsNotNone(stats["tokens_per_second"])
+
+    def test_ivf_index_matches_exact_search(self):
+        """Test index IVF memberi hasil sama dengan brute-force jika semua cluster diperiksa."""
+        rng = np.random.default_rng(0)
+        vectors = rng.standard_normal((600, 32)).astype(np.float32)
+        index = IVFIndex(n_lists=12).build(vectors)
+        query = rng.standard_normal(32)
+        ids, scores = index.search(query, k=5, n_probe=12)
+        exact_ids, exact_scores = exact_search(index.vectors, query, 5)
+        self.assertEqual(ids.tolist(), exact_ids.tolist())
+        np.testing.assert_allclose(scores, exact_scores, rtol=1e-5)
+        added = index.add(rng.standard_normal((10, 32)))
+        self.assertEqual(added.tolist(), list(range(600, 610)))
+        self.assertEqual(len(index), 610)
+
+    def test_unit_index_top_k_returns_match_tuples(self):
+        """Test UnitIndex mengembalikan tuple (page, unit, skor) seperti find_*_matches."""
+        encoder = HashingEncoder()
+        units = ["large language models", "the cat sat on the mat", "deep neural networks"]
+        unit_index = UnitIndex([1, 2, 3], units, encoder.encode(units), semantic_model=encoder)
+        top = unit_index.top_k("the cat sat on the mat", k=2)
+        self.assertEqual(len(top), 2)
+        self.assertEqual(top[0][:2], (2, "the cat sat on the mat"))
+        self.assertAlmostEqual(top[0][2], 1.0, places=5)
+        self.assertEqual([m[1] for m in unit_index.search_threshold("the cat sat on the mat", 0.99)], ["the cat sat on the mat"])
+
+    def test_source_library_incremental_search(self):
+        """Test pustaka multi-dokumen mengindeks per dokumen dan menandai hasil dengan dokumen dan halaman."""
+        encoder = HashingEncoder()
+        with tempfile.TemporaryDirectory() as cache_dir, \
+                mock.patch("utils.embedding_cache._default_cache", EmbeddingCache(cache_dir=cache_dir)):
+            library = SourceLibrary(unit_mode="paragraph", semantic_model=encoder)
+            library.add_document(b"doc-a", "a.pdf", pages_text={1: ["deep neural networks"], 2: ["the cat sat on the mat"]}, extraction_mode="pdf-paragraphs")
+            encoded_after_first = encoder.encoded_texts
+            library.add_document(b"doc-b", "b.docx", pages_text={1: ["large language models"]}, extraction_mode="docx-text")
+            self.assertEqual(encoder.encoded_texts - encoded_after_first, 1)
+            library.add_document(b"doc-b", "b-copy.docx", pages_text={1: ["large language models"]}, extraction_mode="docx-text")
+            self.assertEqual(len(library), 2)
+            matches = library.search("large language models", similarity_threshold=0.9)
+            self.assertEqual(matches[0][:3], ("b.docx", 1, "large language models"))
+            self.assertEqual(library.search("the cat sat on the mat", top_k=1)[0][:2], ("a.pdf", 2))
+            # Dokumen yang dikeluarkan tidak lagi dicari; dokumen lain tetap terindeks dengan benar
+            self.assertTrue(library.remove_document(compute_file_hash(b"doc-a")))
+            self.assertFalse(library.remove_document(compute_file_hash(b"doc-a")))
+            self.assertEqual((len(library), library.units), (1, ["large language models"]))
+            self.assertEqual(library.search("the cat sat on the mat", similarity_threshold=0.5), [])
+            self.assertEqual(library.search("large language models", similarity_threshold=0.9)[0][:2], ("b.docx", 1))
+            library.remove_document(compute_file_hash(b"doc-b"))
+            self.assertEqual(library.search("large language models", similarity_threshold=0.0), [])
+            library.add_document(b"doc-a", "a.pdf", pages_text={1: ["deep neural networks"]}, extraction_mode="pdf-paragraphs")
+            self.assertEqual(library.search("deep neural networks", top_k=1)[0][:2], ("a.pdf", 1))
+            with self.assertRaises(ValueError):
+                library.add_document(b"doc-c", "c.pdf", pages_text={1: ["tanpa mode ekstraksi"]})
+            # Index IVF dengan banyak list: id sisa dipadatkan dan tetap cocok dengan unit
+            rng = np.random.default_rng(0)
+            vocab = [f"kata{i}" for i in range(200)]
+            units = [" ".join(rng.choice(vocab, size=8)) for _ in range(600)]
+            library = SourceLibrary(unit_mode="paragraph", semantic_model=encoder, n_lists=16)
+            library.add_document(b"doc-x", "x.pdf", pages_text={1: units[:300]}, extraction_mode="pdf-paragraphs")
+            library.add_document(b"doc-y", "y.pdf", pages_text={1: units[300:]}, extraction_mode="pdf-paragraphs")
+            library.remove_document(compute_file_hash(b"doc-x"))
+            self.assertEqual(len(library.index), 300)
+            self.assertEqual(sorted(np.concatenate(library.index._lists).tolist()), list(range(300)))
+            for unit in units[300:310]:
+                self.assertEqual(library.search(unit, top_k=1)[0][:3], ("y.pdf", 1, unit))
+            self.assertEqual(library.search(units[0], similarity_threshold=0.99), [])
+
+    def test_source_library_search_is_exact_by_default(self):
+        """Test pencarian pustaka tanpa n_probe sama dengan brute-force meski index IVF punya banyak list."""
+        from utils.semantic_utils import encode_texts
+        encoder = HashingEncoder()
+        rng = np.random.default_rng(0)
+        vocab = [f"kata{i}" for i in range(200)]
+        units = [" ".join(rng.choice(vocab, size=8)) for _ in range(600)]
+        citation = " ".join(units[0].split()[:5])
+        with tempfile.TemporaryDirectory() as cache_dir, \
+                mock.patch("utils.embedding_cache._default_cache", EmbeddingCache(cache_dir=cache_dir)):
+            library = SourceLibrary(unit_mode="paragraph", semantic_model=encoder, n_lists=32)
+            library.add_document(b"doc", "a.pdf", pages_text={1: units}, extraction_mode="pdf-paragraphs")
+            vectors = np.asarray(encode_texts(units, encoder), dtype=np.float32)
+            query = np.asarray(encode_texts([citation], encoder), dtype=np.float32)[0]
+            scores = (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)) @ (query / np.linalg.norm(query))
+            expected = int((scores >= 0.3).sum())
+            self.assertGreater(library.index.list_count, 1)
+            self.assertEqual(len(library.search(citation, similarity_threshold=0.3)), expected)
+
+    def test_extract_source_pages_docx_bytes(self):
+        """Test ekstraksi sumber DOCX dari bytes upload menjadi pages_text."""
+        from docx import Document
+        buffer = io.BytesIO()
+        document = Document()
+        document.add_paragraph("Paragraf pertama.")
+        document.add_paragraph("Paragraf kedua.")
+        document.save(buffer)
+        pages_text, extraction_mode = extract_source_pages(buffer.getvalue(), "tesis.docx")
+        self.assertEqual(extraction_mode, "docx-blocks")
+        self.assertEqual(pages_text, {1: ["Paragraf pertama.", "Paragraf kedua."]})
+        with self.assertRaises(ValueError):
+            extract_source_pages(b"", "catatan.txt")
+
+    def test_extract_docx_chunks_sections_headings_tables(self):
+        """Test ekstraksi DOCX terstruktur: chunk terbatas per judul/section, baris tabel dan label lokasi."""
+        from docx import Document
+        from docx.enum.section import WD_SECTION
+        from utils.docx_utils import extract_docx_chunks, iter_docx_blocks
+        document = Document()
+        document.add_heading("Bab 1 Pendahuluan", 1)
+        document.add_paragraph("Model bahasa dilatih pada korpus besar.")
+        document.add_heading("1.1 Rumusan Masalah", 2)
+        document.add_paragraph("Bagaimana mengukur kemiripan sitasi?")
+        table = document.add_table(rows=2, cols=2)
+        table.cell(0, 0).text, table.cell(0, 1).text = "Metode", "Skor"
+        table.cell(1, 0).merge(table.cell(1, 1)).text = "Sentence-BERT"
+        document.add_section(WD_SECTION.NEW_PAGE)
+        document.add_heading("Bab 2 Tinjauan Pustaka", 1)
+        for i in range(4):
+            document.add_paragraph(f"Paragraf tinjauan nomor {i} dengan isi yang cukup panjang.")
+        buffer = io.BytesIO()
+        document.save(buffer)
+        blocks = list(iter_docx_blocks(io.BytesIO(buffer.getvalue())))
+        self.assertEqual([b.text for b in blocks if b.kind == "table"], ["Metode | Skor", "Sentence-BERT"])
+        self.assertEqual(blocks[3].headings, ("Bab 1 Pendahuluan", "1.1 Rumusan Masalah"))
+        self.assertEqual(blocks[-1].section, 2)
+        page_labels = {}
+        pages_text = extract_docx_chunks(io.BytesIO(buffer.getvalue()), max_chars=120, page_labels=page_labels)
+        self.assertEqual(pages_text[1], ["Bab 1 Pendahuluan", "Model bahasa dilatih pada korpus besar."])
+        self.assertEqual(pages_text[2][-2:], ["Metode | Skor", "Sentence-BERT"])
+        self.assertTrue(all(sum(map(len, blocks)) <= 120 for blocks in pages_text.values()))
+        self.assertEqual(page_labels[2], "Section 1 · Bab 1 Pendahuluan › 1.1 Rumusan Masalah")
+        self.assertEqual(page_labels[len(pages_text)], "Section 2 · Bab 2 Tinjauan Pustaka")
+        # Mode paragraf memakai blok langsung; hasil dapat dilaporkan per section/judul
+        matches = find_paragraph_matches("Bagaimana mengukur kemiripan sitasi?", pages_text, similarity_threshold=0.9, method="tfidf")
+        self.assertEqual(page_labels[matches[0][0]], "Section 1 · Bab 1 Pendahuluan › 1.1 Rumusan Masalah")
+
+    def test_check_citations_batch_semantic(self):
+        """Test batch sitasi: setiap sitasi menemukan unit sumbernya sendiri dalam satu perkalian matriks."""
+        encoder = HashingEncoder()
+        sources = [{"name": "a.pdf", "pages_text": {1: "Deep neural networks learn features.\n\nThe cat sat on the mat."}, "source_key": None}]
+        citations = ["the cat sat on the mat", {"id": "x", "text": "deep neural networks learn features"}]
+        results = list(check_citations_batch(citations, sources, unit_mode="paragraph", similarity_threshold=0.9, semantic_model=encoder))
+        self.assertEqual([r["id"] for r in results], ["1", "x"])
+        self.assertEqual(results[0]["matches"][0]["text"], "The cat sat on the mat.")
+        self.assertEqual(results[1]["matches"][0]["page"], 1)
+        self.assertEqual(len(results[1]["matches"]), 1)
+        # Unit sumber yang disiapkan sekali dipakai ulang: per pemanggilan hanya sitasi yang di-encode
+        from utils.batch_utils import prepare_sources
+        prepared = prepare_sources(sources, unit_mode="paragraph", semantic_model=encoder)
+        self.assertEqual(prepared["unit_matrix"].dtype, np.float32)
+        encoded = encoder.encoded_texts
+        with mock.patch("utils.batch_utils._collect_source_units") as collect, \
+                mock.patch("utils.semantic_utils.get_unit_embeddings") as unit_embeddings:
+            for _ in range(2):
+                reused = list(check_citations_batch(citations, sources, unit_mode="paragraph", similarity_threshold=0.9,
+                                                    semantic_model=encoder, prepared=prepared))
+                self.assertEqual(reused, results)
+        collect.assert_not_called()
+        unit_embeddings.assert_not_called()
+        self.assertEqual(encoder.encoded_texts - encoded, 2 * len(citations))
+        with self.assertRaises(ValueError):
+            list(check_citations_batch(citations, sources, method="tfidf", prepared=prepared))
+
+    def test_check_citations_batch_tfidf_matches_single_check(self):
+        """Test batch TF-IDF: skor sama dengan jalur UI dan tidak bergantung pada sitasi lain; id 0/"" dipertahankan."""
+        pages_text = {1: ["Deep neural networks learn features from data.", "The cat sat on the mat near the door."]}
+        sources = [{"name": "a.pdf", "pages_text": pages_text, "source_key": None}]
+        citation = "neural networks learn useful features"
+        ui_score = find_sentence_matches(citation, pages_text, similarity_threshold=0.1, method="tfidf")[0][2]
+        alone = list(check_citations_batch([{"id": 0, "text": citation}], sources, method="tfidf", similarity_threshold=0.1))
+        batched = list(check_citations_batch(
+            [{"id": 0, "text": citation}, {"id": "", "text": "networks networks everywhere"}], sources, method="tfidf", similarity_threshold=0.1
+        ))
+        self.assertEqual([r["id"] for r in batched], [0, ""])
+        self.assertAlmostEqual(alone[0]["matches"][0]["score"], ui_score)
+        self.assertAlmostEqual(batched[0]["matches"][0]["score"], ui_score)
+
+    def test_batch_check_cli_tfidf(self):
+        """Test CLI batch membaca sitasi JSONL dan sumber PDF, lalu menulis hasil JSONL."""
+        import fitz
+        import json
+        import batch_check
+        with tempfile.TemporaryDirectory() as tmp:
+            pdf_path = os.path.join(tmp, "sumber.pdf")
+            doc = fitz.open()
+            doc.new_page().insert_text((72, 72), "Language models are trained on large text corpora.")
+            doc.new_page().insert_text((72, 72), "The weather is nice today.")
+            doc.save(pdf_path)
+            doc.close()
+            citations_path = os.path.join(tmp, "sitasi.jsonl")
+            with open(citations_path, "w", encoding="utf-8") as f:
+                f.write(json.dumps({"id": "c1", "text": "The weather is nice today."}) + "\n")
+                f.write(json.dumps({"id": "c2", "text": "Bananas are yellow."}) + "\n")
+            self.assertEqual(len(load_citations(citations_path)), 2)
+            output_path = os.path.join(tmp, "hasil.jsonl")
+            batch_check.main(["--citations", citations_path, "--source", pdf_path, "--method", "tfidf",
+                              "--threshold", "0.9", "--output", output_path])
+            with open(output_path, encoding="utf-8") as f:
+                results = [json.loads(line) for line in f]
+        self.assertEqual([r["id"] for r in results], ["c1", "c2"])
+        self.assertEqual(results[0]["matches"][0]["page"], 2)
+        self.assertEqual(results[0]["matches"][0]["source"], "sumber.pdf")
+        self.assertEqual(results[1]["matches"], [])
+
+    def test_parallel_extraction_matches_serial(self):
+        """Test ekstraksi paralel per rentang halaman menghasilkan urutan dan isi yang sama dengan serial."""
+        with tempfile.TemporaryDirectory() as tmp:
+            pdf_path = os.path.join(tmp, "besar.pdf")
+            make_sample_pdf(pdf_path, 12)
+            serial = extract_text_by_page(pdf_path, workers=1)
+            parallel = extract_text_by_page(pdf_path, workers=3)
+            self.assertEqual(list(parallel), list(range(1, 13)))
+            self.assertEqual(serial, parallel)
+            self.assertIn("Halaman 7.", parallel[7])
+            self.assertEqual(extract_paragraphs_by_page(pdf_path, workers=1), extract_paragraphs_by_page(pdf_path, workers=3))
+
+    def test_load_pdf_enforces_limits(self):
+        """Test validasi dan ekstraksi satu kali jalan tetap menegakkan batas halaman dan ukuran."""
+        with tempfile.TemporaryDirectory() as tmp:
+            pdf_path = os.path.join(tmp, "sumber.pdf")
+            make_sample_pdf(pdf_path, 5)
+            pages_text, msg = load_pdf(pdf_path, kind="paragraphs")
+            self.assertEqual(msg, "")
+            self.assertEqual(len(pages_text), 5)
+            self.assertIsInstance(pages_text[1], list)
+            pages_text, msg = load_pdf(pdf_path, max_pages=4)
+            self.assertIsNone(pages_text)
+            self.assertIn("terlalu banyak", msg)
+            pages_text, msg = load_pdf(pdf_path, max_size_mb=0)
+            self.assertIsNone(pages_text)
+            self.assertIn("terlalu besar", msg)
+
+    def test_uploaded_pdf_shared_handle_without_temp_file(self):
+        """Test PDF upload dibuka dari memori sekali lalu dipakai bersama untuk ekstraksi dan highlight."""
+        from handlers import open_uploaded_pdf, load_and_validate_pdf
+        from utils.pdf_utils import highlight_matches_in_pdf
+        import fitz
+        with tempfile.TemporaryDirectory() as tmp:
+            pdf_path = os.path.join(tmp, "sumber.pdf")
+            make_sample_pdf(pdf_path, 3)
+            with open(pdf_path, "rb") as f:
+                uploaded = io.BytesIO(f.read())
+        with mock.patch("utils.pdf_utils.fitz.open", wraps=fitz.open) as fitz_open, \
+                mock.patch("tempfile.NamedTemporaryFile") as named_temp:
+            doc, msg = open_uploaded_pdf(uploaded)
+            self.assertEqual(msg, "")
+            pages_text, msg = load_and_validate_pdf(uploaded.getbuffer(), "Kalimat", doc=doc)
+            self.assertEqual(sorted(pages_text), [1, 2, 3])
+            outputs = [highlight_matches_in_pdf(None, [(2, "Halaman 2.", 0.9)], doc=doc) for _ in range(2)]
+            self.assertEqual(fitz_open.call_count, 1)
+            named_temp.assert_not_called()
+        for output in outputs:
+            highlighted = fitz.open(stream=output)
+            self.assertEqual([len(list(page.annots())) for page in highlighted], [0, 1, 0])
+        # Handle bersama tetap tanpa anotasi dan masih dapat diekstrak ulang
+        self.assertEqual(sum(len(list(page.annots())) for page in doc), 0)
+        self.assertEqual(load_and_validate_pdf(uploaded.getbuffer(), "Kalimat", doc=doc)[0], pages_text)
+        doc.close()
+
+    def test_highlight_matches_batched_per_page(self):
+        """Test highlight dikelompokkan per halaman dan menemukan kalimat yang terpotong line wrap."""
+        from utils.match_results import MatchResults
+        from utils.pdf_utils import highlight_matches_in_pdf
+        import fitz
+        doc = fitz.open()
+        page = doc.new_page()
+        page.insert_text((72, 72), "Metode ini mengukur kemiripan")
+        page.insert_text((72, 90), "antara sitasi dan sumber.")
+        doc.new_page().insert_text((72, 72), "Halaman kedua berisi kalimat lain.")
+        source = doc.tobytes()
+        doc.close()
+        matches = MatchResults.from_tuples([
+            (1, "Metode ini mengukur kemiripan antara sitasi dan sumber.", 0.9),
+            (1, "Metode ini mengukur kemiripan antara sitasi dan sumber.", 0.9),
+            (2, "kalimat lain", 0.8),
+            (2, "tidak ada di halaman", 0.7),
+        ])
+        for quick_save in (False, True):
+            stats = {}
+            output = highlight_matches_in_pdf(source, matches, quick_save=quick_save, stats=stats)
+            self.assertEqual(stats, {"pages": 2, "located": 2, "missed": 1})
+            highlighted = fitz.open(stream=output)
+            self.assertEqual([len(list(page.annots())) for page in highlighted], [1, 1])
+            # Satu anotasi dengan satu quad per baris untuk kalimat yang terpotong
+            first_page = highlighted[0]
+            self.assertEqual(len(first_page.first_annot.vertices), 8)
+            highlighted.close()
+        # Mode bytes tidak pernah mengembalikan None: PDF rusak melempar error ke pemanggil
+        with self.assertRaises(Exception):
+            highlight_matches_in_pdf(b"bukan file pdf", matches)
+
+    def test_job_manager_progress_cancel_and_retention(self):
+        """Test job latar belakang: progres dapat di-poll, job dapat dibatalkan, error dicatat dan hasil lama dibuang."""
+        from utils.job_queue import JobCancelled, JobManager
+        import threading
+        started, release = threading.Event(), threading.Event()
+
+        def slow_job(pages, progress=None):
+            for done in range(1, pages + 1):
+                progress(done, pages, "Memproses")
+                started.set()
+                release.wait(5)
+            return pages
+
+        def failing_job(progress=None):
+            raise ValueError("sumber rusak")
+
+        manager = JobManager(max_workers=1, executor="thread", retention_seconds=60)
+        try:
+            job_id = manager.submit(slow_job, 3)
+            started.wait(5)
+            status = manager.status(job_id)
+            self.assertEqual((status["status"], status["done"], status["total"]), ("running", 1, 3))
+            queued = manager.submit(slow_job, 2)
+            self.assertEqual(manager.status(queued)["status"], "queued")
+            self.assertTrue(manager.cancel(queued))
+            self.assertTrue(manager.cancel(job_id))
+            release.set()
+            with self.assertRaises(JobCancelled):
+                manager.result(job_id, timeout=5)
+            self.assertEqual(manager.status(job_id)["status"], "cancelled")
+            self.assertEqual(manager.status(queued)["status"], "cancelled")
+            self.assertFalse(manager.cancel(job_id))
+
+            done_id = manager.submit(slow_job, 2)
+            self.assertEqual(manager.result(done_id, timeout=5), 2)
+            self.assertEqual(manager.status(done_id)["status"], "done")
+            failed_id = manager.submit(failing_job)
+            with self.assertRaises(ValueError):
+                manager.result(failed_id, timeout=5)
+            self.assertIn("sumber rusak", manager.status(failed_id)["error"])
+
+            self.assertEqual(manager.purge(now=time.time() + 3600), 4)
+            with self.assertRaises(KeyError):
+                manager.status(done_id)
+        finally:
+            release.set()
+            manager.shutdown()
+
+    def test_run_citation_check_as_job(self):
+        """Test pemeriksaan lengkap sebagai job memberi hasil sama dengan pencocokan langsung."""
+        from utils.check_pipeline import run_citation_check
+        from utils.job_queue import JobManager
+        with tempfile.TemporaryDirectory() as tmp:
+            pdf_path = os.path.join(tmp, "sumber.pdf")
+            make_sample_pdf(pdf_path, 4)
+            with open(pdf_path, "rb") as f:
+                data = f.read()
+            expected = find_sentence_matches("Model bahasa dilatih pada korpus teks.", extract_text_by_page(pdf_path), 0.3, "tfidf")
+        options = {"mode": "Kalimat", "method": "TF-IDF", "threshold": 0.3, "profile": True}
+        manager = JobManager(max_workers=1, executor="thread")
+        try:
+            job_id = manager.submit(run_citation_check, data, "sumber.pdf", "Model bahasa dilatih pada korpus teks.", "ID", "ID", options)
+            result = manager.result(job_id, timeout=30)
+            self.assertEqual(manager.status(job_id)["done"], 4)
+        finally:
+            manager.shutdown()
+        self.assertMatchesEqual(result["matches"], expected)
+        self.assertEqual(len(result["matches"].units), len(expected))
+        self.assertEqual(result["tipe_cek"], "Kalimat")
+        self.assertIn("match", result["perf"].summary())
+        self.assertFalse(result["stopped_early"])
+
+    def test_iter_sentence_matches_yields_per_page(self):
+        """Test generator pencocokan kalimat menghasilkan batch per halaman dengan isi sama seperti versi list."""
+        citation = "This is a test sentence."
+        pages_text = {1: "Nothing relevant here.", 2: "This is a test sentence. Another sentence.", 3: "This is a test sentence."}
+        progress = []
+        batches = list(iter_sentence_matches(citation, pages_text, similarity_threshold=0.5,
+                                             progress_callback=lambda val, maxval: progress.append(val)))
+        self.assertEqual(len(batches), 3)
+        self.assertEqual(len(batches[0]), 0)
+        self.assertEqual(progress, [1, 2, 3])
+        self.assertMatchesEqual([m for batch in batches for m in batch],
+                                find_sentence_matches(citation, pages_text, similarity_threshold=0.5))
+        self.assertEqual(len(list(iter_sentence_matches(citation, pages_text, batch_pages=2))), 2)
+
+    def test_iter_crossunit_matches_can_stop_early(self):
+        """Test generator cross-unit dapat dihentikan setelah batch pertama tanpa error."""
+        pages_text = {page: "Alpha beta gamma.\n\nDelta epsilon zeta.\n\nEta theta iota." for page in range(1, 30)}
+        batches = iter_crossunit_matches("alpha beta gamma delta epsilon zeta", pages_text, similarity_threshold=0.1, window_size=2)
+        first = next(batches)
+        batches.close()
+        self.assertTrue(all(len(match) == 3 for match in first))
+
+    def test_crossunit_pooled_tfidf_matches_joined_window(self):
+        """Test window TF-IDF hasil penjumlahan baris unit setara dengan teks gabungan, untuk beberapa ukuran window."""
+        pages_text = {1: "Alpha beta gamma.\n\nDelta epsilon zeta.\n\nEta theta iota.", 2: "Kappa lambda.\n\nMu nu xi."}
+        citation = "Alpha beta gamma. Delta epsilon zeta."
+        matches = find_crossunit_matches(citation, pages_text, similarity_threshold=0.1, window_size=[2, 3])
+        best = max(matches, key=lambda m: m[2])
+        self.assertEqual(best[:2], (1, citation))
+        self.assertAlmostEqual(best[2], 1.0, places=5)
+        self.assertEqual({len(m[1].split(". ")) for m in matches if m[0] == 1}, {2, 3})
+        # Window tidak melewati batas halaman
+        self.assertFalse(any("Kappa" in m[1] and "iota" in m[1] for m in matches))
+        reencode = find_crossunit_matches(citation, pages_text, similarity_threshold=0.1, window_size=2, window_strategy="reencode")
+        self.assertIn(citation, [m[1] for m in reencode])
+        # Progres berjalan sekali 1..N halaman walau ada beberapa ukuran window
+        for strategy in ("pooled", "reencode"):
+            progress = []
+            reencode = find_crossunit_matches(citation, pages_text, 0.1, progress_callback=lambda done, total: progress.append((done, total)),
+                                              window_size=[2, 3], window_strategy=strategy)
+            self.assertEqual(progress, [(1, 2), (2, 2)])
+        self.assertEqual({len(m[1].split(". ")) for m in reencode if m[0] == 1}, {2, 3})
+
+    def test_crossunit_pooled_semantic_reuses_unit_embeddings(self):
+        """Test mode semantic pooled meng-encode tiap unit sekali dan memakai cache embedding."""
+        encoder = HashingEncoder()
+        pages_text = {1: "Alpha beta gamma.\n\nDelta epsilon zeta.\n\nEta theta iota."}
+        citation = "alpha beta gamma delta epsilon zeta"
+        with tempfile.TemporaryDirectory() as tmp_dir, \
+                mock.patch("utils.embedding_cache._default_cache", EmbeddingCache(tmp_dir)), \
+                mock.patch("utils.similarity_utils.get_semantic_model", return_value=encoder):
+            first = find_crossunit_matches(citation, pages_text, similarity_threshold=0.5, method="semantic",
+                                           window_size=[2, 3], source_key=("hash", "pdf-text"))
+            encoded = encoder.encoded_texts
+            second = find_crossunit_matches(citation, pages_text, similarity_threshold=0.5, method="semantic",
+                                            window_size=[2, 3], source_key=("hash", "pdf-text"))
+        self.assertEqual(encoded, 4)  # 3 unit + 1 sitasi, bukan per window
+        self.assertEqual(encoder.encoded_texts, encoded + 1)
+        self.assertEqual([m[:2] for m in first], [m[:2] for m in second])
+        self.assertEqual(first[0][1], "Alpha beta gamma. Delta epsilon zeta.")
+
+    def test_translation_cache_and_sentence_batching(self):
+        """Test terjemahan lokal dipecah per kalimat dalam satu batch dan hasilnya diambil dari cache saat diulang."""
+        from utils import translation_utils
+        from utils.translation_cache import TranslationCache
+        calls = []
+        fake_local = lambda texts, model_name: calls.append(list(texts)) or [t.upper() for t in texts]
+        with mock.patch("utils.translation_cache._default_cache", TranslationCache(":memory:")), \
+                mock.patch.object(translation_utils, "translate_texts_local", side_effect=fake_local):
+            first = translate_text_from_ID_to_EN("Kalimat satu. Kalimat dua!", use_local=True)
+            second = translate_text_from_ID_to_EN("Kalimat satu. Kalimat dua!", use_local=True)
+            other_direction = translate_text_from_EN_to_ID("Kalimat satu.", use_local=True)
+        self.assertEqual(first, "KALIMAT SATU. KALIMAT DUA!")
+        self.assertEqual(second, first)
+        self.assertEqual(other_direction, "KALIMAT SATU.")
+        self.assertEqual(calls, [["Kalimat satu.", "Kalimat dua!"], ["Kalimat satu."]])
+
+    def test_deepl_translator_is_reused(self):
+        """Test translator DeepL dibuat sekali dan teks yang sama tidak dikirim ulang ke API."""
+        from utils import translation_utils
+        from utils.translation_cache import TranslationCache
+        translator = mock.Mock()
+        translator.translate_text.side_effect = lambda texts, **kwargs: [mock.Mock(text=t + " (EN)") for t in texts]
+        with mock.patch("utils.translation_cache._default_cache", TranslationCache(":memory:")), \
+                mock.patch.dict(os.environ, {"DeepL_API_KEY": "test-key"}), \
+                mock.patch.dict(translation_utils._deepl_translators, clear=True), \
+                mock.patch("deepl.Translator", return_value=translator) as translator_cls:
+            results = [translate_text_from_ID_to_EN("Halo dunia.") for _ in range(3)]
+            translation_utils.translate_texts(["Halo dunia.", "Apa kabar?"], "ID", "EN")
+        self.assertEqual(results, ["Halo dunia. (EN)"] * 3)
+        translator_cls.assert_called_once_with("test-key")
+        self.assertEqual(translator.translate_text.call_count, 2)
+        self.assertEqual(translator.translate_text.call_args[0][0], ["Apa kabar?"])
+
+    def test_robust_sentence_splitter_joins_wrapped_lines(self):
+        """Test splitter modul menggabungkan baris terputus dan memisahkan judul sebagai unit sendiri."""
+        from utils.text_segmentation import robust_sentence_splitter
+        text = "PENDAHULUAN\nModel bahasa dilatih pada\nkorpus yang besar. Hasilnya baik.\n\nMetode Penelitian\nKami memakai data."
+        self.assertEqual(robust_sentence_splitter(text), [
+            "PENDAHULUAN", "Model bahasa dilatih pada korpus yang besar.", "Hasilnya baik.",
+            "Metode Penelitian", "Kami memakai data.",
+        ])
+
+    def test_segmentation_cache_reuses_split_units(self):
+        """Test dokumen yang sama tidak di-split ulang dan hasil cache aman diubah pemanggil."""
+        from utils.text_segmentation import segment_pages, clear_segmentation_cache
+        calls = []
+        def splitter(text):
+            calls.append(text)
+            return text.split(". ")
+        pages_text = {1: "Satu. Dua", 2: "Tiga"}
+        clear_segmentation_cache()
+        unit_pages, units = segment_pages(pages_text, splitter)
+        units.append("diubah")
+        self.assertEqual(segment_pages(dict(pages_text), splitter), ([1, 1, 2], ["Satu", "Dua", "Tiga"]))
+        self.assertEqual(len(calls), 2)
+        segment_pages({1: "Satu. Dua", 2: "Empat"}, splitter)
+        self.assertEqual(len(calls), 4)
+
+    def test_match_results_columnar_operations(self):
+        """Test MatchResults: threshold, urut, top-k dan gabung batch tanpa menyalin teks unit."""
+        from utils.match_results import MatchResults
+        units = ["satu", "dua", "tiga", "empat"]
+        first = MatchResults.from_scores(units, np.array([1, 1, 2, 2]), np.array([0.2, 0.9, 0.5]), 0.3)
+        second = MatchResults(units, [2], [2], [0.7], spans=[2])
+        merged = MatchResults.concat([first, second])
+        self.assertIs(merged.units, units)
+        self.assertMatchesEqual(merged, [(1, "dua", 0.9), (2, "tiga", 0.5), (2, "tiga empat", 0.7)])
+        self.assertEqual([m[1] for m in merged.sort_by_score()], ["dua", "tiga empat", "tiga"])
+        self.assertEqual([m[1] for m in merged.top_k(2)], ["dua", "tiga empat"])
+        self.assertEqual(len(merged.filter(0.6)), 2)
+        self.assertEqual([m[0] for m in merged.sort_by_page()], [1, 2, 2])
+        legacy = MatchResults.from_tuples([("b.pdf", 3, "x", 0.5), ("a.pdf", 5, "y", 0.6)])
+        self.assertEqual([m[0] for m in legacy.sort_by_page()], ["a.pdf", "b.pdf"])
+
+    def test_iter_matches_yield_columnar_batches(self):
+        """Test jalur TF-IDF korpus menghasilkan MatchResults yang merujuk list unit sumber yang sama."""
+        from utils.match_results import MatchResults
+        pages_text = {1: "Kucing tidur di atas tikar.", 2: "Anjing berlari di taman. Kucing tidur di atas tikar."}
+        batches = list(iter_sentence_matches("Kucing tidur di atas tikar.", pages_text, similarity_threshold=0.5))
+        self.assertTrue(all(isinstance(batch, MatchResults) for batch in batches))
+        self.assertIs(batches[0].units, batches[1].units)
+        self.assertEqual([m[0] for m in MatchResults.concat(batches)], [1, 2])
+
+    def test_semantic_early_stop_keeps_partial_embeddings(self):
+        """Test berhenti lebih awal menyimpan embedding yang sudah di-encode sehingga pemeriksaan berikutnya tidak mengulanginya."""
+        from utils.match_results import MatchResults
+        from utils.similarity_utils import iter_paragraph_matches
+        encoder = HashingEncoder()
+        pages_text = {n: [f"paragraf nomor {n} tentang topik {n}"] for n in range(1, 7)}
+        with tempfile.TemporaryDirectory() as cache_dir, \
+                mock.patch("utils.embedding_cache._default_cache", EmbeddingCache(cache_dir=cache_dir)), \
+                mock.patch("utils.similarity_utils.get_semantic_model", return_value=encoder), \
+                mock.patch("utils.semantic_utils.ENCODE_CHUNK_UNITS", 2):
+            batches = iter_paragraph_matches("topik 1", pages_text, 0.0, method="semantic", source_key=("hash", "pdf-paragraphs"))
+            next(batches)
+            batches.close()
+            self.assertLess(encoder.encoded_texts, 1 + len(pages_text))
+            resumed = MatchResults.concat(list(iter_paragraph_matches("topik 1", pages_text, 0.0, method="semantic", source_key=("hash", "pdf-paragraphs"))))
+            # Setiap unit di-encode tepat sekali lintas dua pemeriksaan (ditambah dua sitasi)
+            self.assertEqual(encoder.encoded_texts, len(pages_text) + 2)
+            self.assertEqual([m[0] for m in resumed], list(range(1, 7)))
+            encoded = encoder.encoded_texts
+            list(iter_paragraph_matches("topik 1", pages_text, 0.0, method="semantic", source_key=("hash", "pdf-paragraphs")))
+            self.assertEqual(encoder.encoded_texts - encoded, 1)
+
+    def test_semantic_first_batch_encodes_one_page(self):
+        """Test hasil semantic pertama hanya menunggu encode satu batch halaman, kelompok berikutnya membesar."""
+        from utils.similarity_utils import _chunk_ranges, iter_paragraph_matches
+        encoder = HashingEncoder()
+        pages_text = {n: [f"paragraf nomor {n}", f"kalimat lain {n}"] for n in range(1, 21)}
+        with mock.patch("utils.similarity_utils.get_semantic_model", return_value=encoder):
+            batches = iter_paragraph_matches("paragraf nomor 1", pages_text, 0.5, method="semantic")
+            next(batches)
+            self.assertEqual(encoder.encoded_texts, 1 + 2)
+            batches.close()
+        ranges = [(2 * i, 2 * i + 2) for i in range(20)]
+        self.assertEqual([g[-1][1] - g[0][0] for g in _chunk_ranges(ranges, 8)], [2, 4, 8, 8, 8, 8, 2])
+
+    def test_two_stage_semantic_encodes_only_candidates(self):
+        """Test mode dua tahap: prefilter TF-IDF membatasi unit yang di-encode Sentence-BERT dan melaporkan statistik."""
+        encoder = HashingEncoder()
+        filler = " ".join(f"Kalimat pengisi nomor {i} tentang topik lain." for i in range(200))
+        pages_text = {1: filler, 2: "Model bahasa besar dilatih pada korpus teks. " + filler}
+        citation = "Model bahasa besar dilatih pada korpus teks."
+        stats = {}
+        with mock.patch("utils.similarity_utils.get_semantic_model", return_value=encoder):
+            matches = find_sentence_matches(citation, pages_text, similarity_threshold=0.9, method="semantic",
+                                            rerank_top_n=5, rerank_margin=0.0, stats=stats)
+        self.assertEqual(matches[0][:2], (2, citation))
+        self.assertEqual(stats["units_total"], 401)
+        self.assertEqual(stats["lexical_examined"], 401)
+        self.assertLess(stats["semantic_examined"], 20)
+        self.assertEqual(encoder.encoded_texts, stats["semantic_encoded"] + 1)
+
+    def test_lexical_prefilter_margin_keeps_near_ties(self):
+        """Test margin pengaman recall menambahkan kandidat yang skornya nyaris sama dengan kandidat ke-N."""
+        from utils.similarity_utils import lexical_prefilter
+        units = ["kucing tidur", "kucing makan", "kucing lari", "anjing tidur", "burung terbang"]
+        top_only, scores = lexical_prefilter("kucing tidur", units, 1, margin=0.0)
+        self.assertEqual(top_only.tolist(), [0])
+        widened, _ = lexical_prefilter("kucing tidur", units, 1, margin=1.0)
+        self.assertEqual(widened.tolist(), [0, 1, 2, 3])
+
+    def test_benchmark_suite_runs_and_flags_regressions(self):
+        """Test benchmark pipeline berjalan pada dokumen sintetis kecil dan mendeteksi regresi terhadap baseline."""
+        import glob
+        import tracemalloc
+        from benchmarks.bench_pipeline import compare_to_baseline, measure, run_suite
+        tracing = []
+        measure(lambda: tracing.append(tracemalloc.is_tracing()), repeat=2)
+        self.assertEqual(tracing, [False, False, True])  # waktu diukur tanpa tracemalloc, memori di pass terpisah
+        leftover = set(glob.glob(os.path.join(tempfile.gettempdir(), "citara-bench-*")))
+        report = run_suite(pages=2, docx_paragraphs=5, repeat=1, skip_models=True)
+        self.assertEqual(set(glob.glob(os.path.join(tempfile.gettempdir(), "citara-bench-*"))), leftover)
+        self.assertIn("find_crossunit_matches[tfidf]", report["stages"])
+        self.assertTrue(all("seconds" in stage for stage in report["stages"].values()))
+        baseline = {"stages": {"extract_text_by_page": {"seconds": report["stages"]["extract_text_by_page"]["seconds"] / 10}}}
+        rows = compare_to_baseline(report, baseline, tolerance=0.2, min_delta=0.0)
+        self.assertEqual([(row["stage"], row["regression"]) for row in rows], [("extract_text_by_page", True)])
+
+    def test_profiling_records_pipeline_stages(self):
+        """Test span tahap pencocokan tercatat saat sesi profiling aktif dan dapat diekspor ke JSON/Chrome trace."""
+        import json
+        from utils.profiling import profile_session, span
+        from utils.text_segmentation import clear_segmentation_cache
+        pages_text = {1: "Kucing tidur di atas tikar. Anjing berlari di taman."}
+        self.assertIs(span("nonaktif"), span("lain"))  # tanpa sesi: span kosong bersama
+        clear_segmentation_cache()
+        with profile_session() as perf:
+            with span("check", citations=1):
+                find_sentence_matches("Kucing tidur di atas tikar.", pages_text, similarity_threshold=0.5)
+            find_sentence_matches("Kucing tidur di atas tikar.", pages_text, similarity_threshold=0.5)
+        summary = perf.summary()
+        self.assertEqual(summary["segment"]["calls"], 2)
+        self.assertEqual(summary["segment"]["units"], 4)
+        self.assertEqual(perf.cache_hit_rates()["segmentation_cache"], 0.5)
+        records = perf.to_dict()["spans"]
+        check = next(r for r in records if r["name"] == "check")
+        self.assertEqual([r["parent"] for r in records if r["name"] == "tfidf_score"], [check["id"], None])
+        trace = json.loads(perf.to_chrome_trace())
+        self.assertIn("check", [event["name"] for event in trace["traceEvents"] if event["ph"] == "X"])
+
     def test_find_paragraph_matches(self):
         """Test pencarian kemiripan paragraf menggunakan metode semantic."""
         citation = "This is a test paragraph."
@@ -79,6 +892,200 @@ class TestUtils(unittest.TestCase):
             self.assertIsInstance(section_text, dict)
             self.assertTrue(1 in section_text)
 
+    def test_minhash_lsh_finds_verbatim_copy(self):
+        """Test MinHash/LSH: perkiraan Jaccard, kandidat sublinear, salinan hampir persis dan rentang persis terpanjang."""
+        from utils.minhash_utils import MinHashIndex, MinHasher, jaccard_estimate, longest_common_span, shingles
+        rng = np.random.default_rng(0)
+        vocab = [f"kata{i}" for i in range(3000)]
+        units = [" ".join(rng.choice(vocab, size=20)) + "." for _ in range(2000)]
+        copied = units[1234].split()
+        copied[10] = "diubah"
+        citation = " ".join(copied)
+        hasher = MinHasher()
+        signatures = hasher.signatures(units[:50])
+        np.testing.assert_array_equal(signatures[7], hasher.signature(units[7]))
+        exact = len(shingles(citation) & shingles(units[1234])) / len(shingles(citation) | shingles(units[1234]))
+        self.assertAlmostEqual(float(jaccard_estimate(hasher.signature(units[1234]), hasher.signature(citation))), exact, delta=0.1)
+        stats = {}
+        ids, estimates = MinHashIndex(units).query(citation, 0.5, stats=stats)
+        self.assertEqual(list(ids), [1234])
+        self.assertLess(stats["lsh_candidates"], len(units) // 100)
+        self.assertEqual(longest_common_span("The cat sat, on the mat", "Yesterday the cat sat on the mat."), (6, (10, 32)))
+        pages_text = {1: "Kucing tidur di atas tikar. " + units[5], 2: units[1234]}
+        stats = {}
+        matches = find_sentence_matches(citation, pages_text, similarity_threshold=0.5, method="minhash", stats=stats)
+        self.assertEqual([(page, text) for page, text, _ in matches], [(2, units[1234])])
+        self.assertEqual(stats["units_total"], 3)
+
+    def test_match_html_escapes_source_text(self):
+        """Test kartu hasil meng-escape teks sumber, dengan maupun tanpa penanda salinan persis."""
+        from ui import _match_html
+        text = "Lihat <script>alert(1)</script> & model bahasa besar dilatih pada korpus <b>besar</b>."
+        card = _match_html((3, text, 0.9))
+        self.assertNotIn("<script>", card)
+        self.assertIn("&lt;script&gt;alert(1)&lt;/script&gt; &amp; model", card)
+        card = _match_html((3, text, 0.9), verbatim_of="model bahasa besar dilatih pada korpus")
+        self.assertNotIn("<script>", card)
+        self.assertNotIn("<b>besar</b>", card)
+        self.assertIn("&amp; <mark>model bahasa besar dilatih pada korpus</mark> &lt;b&gt;besar&lt;/b&gt;.", card)
+
+    def test_multilingual_mode_skips_translation(self):
+        """Test model multilingual melewati translasi dan benchmark membandingkan kedua jalur."""
+        from benchmarks.bench_multilingual import compare_pipelines
+        from utils.check_pipeline import skips_translation, translate_citation
+        from utils.semantic_utils import MULTILINGUAL_MODEL_NAME, SEMANTIC_MODEL_NAME
+        options = {"method": "Semantic", "embedding_model": MULTILINGUAL_MODEL_NAME}
+        self.assertTrue(skips_translation(options))
+        self.assertFalse(skips_translation(dict(options, two_stage=True)))
+        self.assertFalse(skips_translation(dict(options, method="TF-IDF")))
+        self.assertFalse(skips_translation(dict(options, embedding_model=SEMANTIC_MODEL_NAME)))
+        with mock.patch("utils.translation_utils.translate_text_from_ID_to_EN") as translate:
+            text, info = translate_citation("Model bahasa besar.", "ID", "EN", False, multilingual=True)
+        translate.assert_not_called()
+        self.assertEqual(text, "Model bahasa besar.")
+        self.assertIn("Tanpa translasi", info)
+        units = [f"kalimat sumber {'a' * (i + 1)} tentang data" for i in range(30)]
+        translated = []
+        report = compare_pipelines(
+            units, [units[3], units[17]], [3, 17],
+            translate=lambda texts: translated.extend(texts) or list(texts),
+            mono_model=HashingEncoder(dim=4096), multi_model=HashingEncoder(dim=4096), k=5
+        )
+        self.assertEqual(translated, [units[3], units[17]])
+        self.assertEqual(report["translate_mono"]["recall_at_1"], 1.0)
+        self.assertEqual(report["multilingual"]["recall_at_1"], 1.0)
+        self.assertEqual(report["topk_overlap"], 1.0)
+
+    def test_startup_imports_within_budget(self):
+        """Test import jalur startup main.py tidak memuat dependensi berat dan tetap dalam anggaran waktu."""
+        import json
+        import subprocess
+        import sys
+        startup_modules = [
+            "ui", "handlers", "utils.check_pipeline", "utils.job_queue", "utils.docx_utils", "utils.pdf_utils",
+            "utils.embedding_cache", "utils.semantic_utils", "utils.source_library", "utils.match_results",
+            "utils.profiling", "utils.text_segmentation", "utils.similarity_utils", "utils.translation_utils",
+        ]
+        heavy_modules = ["nltk", "sklearn", "transformers", "torch", "sentence_transformers", "deepl", "docx", "PyPDF2"]
+        code = (
+            "import json, sys, time\n"
+            "start = time.perf_counter()\n"
+            f"for name in {startup_modules!r}: __import__(name)\n"
+            "seconds = time.perf_counter() - start\n"
+            f"print(json.dumps({{'seconds': seconds, 'heavy': [m for m in {heavy_modules!r} if m in sys.modules]}}))\n"
+        )
+        result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__)))
+        report = json.loads(result.stdout.strip().splitlines()[-1])
+        self.assertEqual(report["heavy"], [])
+        self.assertLess(report["seconds"], float(os.getenv("CITARA_IMPORT_BUDGET", "2.0")))
+
+    def test_match_batcher_backpressure(self):
+        """Test micro-batcher menggabungkan item per key dan menolak item saat antrian penuh."""
+        import threading
+        from utils.match_service import MatchBatcher, ServiceBusy
+        release = threading.Event()
+        calls = []
+
+        def run_batch(key, items):
+            release.wait(5)
+            calls.append((key, list(items)))
+            return [item * 2 for item in items]
+
+        batcher = MatchBatcher(run_batch, max_batch=8, max_wait_ms=0, queue_size=2)
+        first = batcher.submit("a", 1)
+        deadline = time.time() + 5
+        while batcher.pending() and time.time() < deadline:
+            time.sleep(0.01)
+        second, third = batcher.submit("a", 2), batcher.submit("b", 3)
+        with self.assertRaises(ServiceBusy):
+            batcher.submit("a", 4)
+        release.set()
+        self.assertEqual([f.result(timeout=5) for f in (first, second, third)], [2, 4, 6])
+        self.assertEqual(calls, [("a", [1]), ("a", [2]), ("b", [3])])
+        self.assertEqual(batcher.stats()["rejected"], 1)
+
+    def test_match_service_http_endpoints(self):
+        """Test layanan HTTP: extract, match bersamaan dalam satu batch (skor TF-IDF tidak bergantung isi batch), highlight dan error klien."""
+        import base64
+        import fitz
+        import http.client
+        import json
+        import threading
+        from utils.match_service import MatchService, make_server
+        topics = ["jaringan saraf tiruan", "terjemahan mesin statistik", "pencarian informasi dokumen"]
+        with tempfile.TemporaryDirectory() as tmp:
+            pdf_path = os.path.join(tmp, "sumber.pdf")
+            doc = fitz.open()
+            for topic in topics:
+                doc.new_page().insert_text((72, 72), f"Bab ini membahas {topic} secara mendalam.")
+            doc.save(pdf_path)
+            doc.close()
+            with open(pdf_path, "rb") as f:
+                data = base64.b64encode(f.read()).decode("ascii")
+        service = MatchService(max_wait_ms=300)
+        server = make_server(service, port=0)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+
+        def post(path, payload):
+            conn = http.client.HTTPConnection(*server.server_address[:2], timeout=30)
+            conn.request("POST", path, body=json.dumps(payload))
+            response = conn.getresponse()
+            body = response.read()
+            conn.close()
+            return response.status, body
+
+        try:
+            status, body = post("/extract", {"name": "sumber.pdf", "data": data})
+            self.assertEqual(status, 200)
+            extracted = json.loads(body)
+            self.assertEqual(extracted["pages"], 3)
+            results = {}
+
+            def match(n, citation=None):
+                payload = {"citation": citation or f"Bab ini membahas {topics[n - 1]} secara mendalam.",
+                           "source_id": extracted["source_id"], "method": "tfidf", "threshold": 0.8, "top_k": 1}
+                results[n] = json.loads(post("/match", payload)[1])
+
+            threads = [threading.Thread(target=match, args=(n,)) for n in (1, 2, 3)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            self.assertEqual([results[n]["matches"][0]["page"] for n in (1, 2, 3)], [1, 2, 3])
+            self.assertGreater(max(results[n]["batch_size"] for n in (1, 2, 3)), 1)
+            # Sendirian maupun bersama sitasi lain, skor sama: vectorizer di-fit atas unit sumber saja, sekali per mode
+            match(4, f"Bab ini membahas {topics[0]} secara mendalam.")
+            self.assertEqual(results[4]["batch_size"], 1)
+            self.assertAlmostEqual(results[4]["matches"][0]["score"], results[1]["matches"][0]["score"])
+            self.assertEqual(list(service._entry(extracted["source_id"])["prepared"]), [("sentence", "tfidf")])
+            status, body = post("/highlight", {"source_id": extracted["source_id"], "matches": results[2]["matches"]})
+            self.assertEqual(status, 200)
+            self.assertTrue(body.startswith(b"%PDF"))
+            self.assertEqual(post("/match", {"citation": "x", "source_id": "tidak-ada"})[0], 404)
+            self.assertEqual(post("/match", {"citation": "x", "source_id": extracted["source_id"], "mode": "bab"})[0], 400)
+            self.assertEqual(post("/highlight", {"source_id": "tidak-ada", "matches": []})[0], 404)
+            status, body = post("/highlight", {"source_id": extracted["source_id"], "matches": [{"text": "Bab ini"}]})
+            self.assertEqual(status, 400)
+            self.assertIn("page", json.loads(body)["error"])
+            self.assertEqual(post("/match", ["bukan", "objek"])[0], 400)
+            for length in ("abc", "-1"):
+                conn = http.client.HTTPConnection(*server.server_address[:2], timeout=30)
+                conn.putrequest("POST", "/match")
+                conn.putheader("Content-Length", length)
+                conn.endheaders()
+                response = conn.getresponse()
+                self.assertEqual(response.status, 400)
+                self.assertIn("Content-Length", json.loads(response.read())["error"])
+                conn.close()
+            broken_id = service.add_source("rusak.pdf", b"bukan file pdf")
+            status, body = post("/highlight", {"source_id": broken_id, "matches": [{"page": 1, "text": "Bab ini"}]})
+            self.assertEqual(status, 500)
+            self.assertIn("Gagal membuat PDF", json.loads(body)["error"])
+        finally:
+            server.shutdown()
+            server.server_close()
+
     def test_extract_text_by_page_error(self):
         """Test error handling pada ekstraksi teks PDF yang tidak ada."""
         text = extract_text_by_page("tidak_ada.pdf")
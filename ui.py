@@ -1,10 +1,31 @@
 import streamlit as st
+import html
 import os
 
+from utils.match_results import MatchResults
+from utils.semantic_utils import (
+    EMBEDDING_BACKEND, EMBEDDING_MODEL, MULTILINGUAL_MODEL_NAME, SEMANTIC_MODEL_NAME, available_embedding_backends,
+)
+
+EMBEDDING_BACKEND_LABELS = {
+    "torch": "PyTorch (fp32)",
+    "int8": "PyTorch int8 (dynamic quantization)",
+    "onnx": "ONNX Runtime",
+}
+
+EMBEDDING_MODEL_LABELS = {
+    SEMANTIC_MODEL_NAME: "Monolingual Inggris (dengan translasi)",
+    MULTILINGUAL_MODEL_NAME: "Multilingual (tanpa translasi)",
+}
+
+RESULTS_PAGE_SIZE = 50
+
 def sidebar_settings():
     """
     Sidebar pengaturan aplikasi.
     Mengembalikan threshold, mode, method, use_local, sort_option.
+    Model dan backend embedding (metode Semantic) disimpan per sesi di
+    st.session_state["embedding_model"] dan st.session_state["embedding_backend"].
     """
     st.header("Pengaturan")
     api_key = st.text_input("DeepL API Key", type="password", value=os.getenv("DeepL_API_KEY", ""))
@@ -12,12 +33,37 @@ def sidebar_settings():
         os.environ["DeepL_API_KEY"] = api_key
     threshold = st.slider("Threshold Kemiripan", 0.0, 1.0, 0.6, 0.01)
     mode = st.radio("Mode Pemeriksaan", ["Kalimat", "Paragraf"])
+    # Mode pustaka (checkbox di bawah, key "library_mode") hanya mendukung metode Semantic
+    library_mode = st.session_state.get("library_mode", False)
     method = st.radio(
         "Metode Perbandingan",
-        ["TF-IDF", "Semantic"],
+        ["TF-IDF", "Semantic", "MinHash"],
         index=1,
-        help="TF-IDF (Term Frequency-Inverse Document Frequency) adalah metode statistik untuk menilai seberapa penting sebuah kata dalam dokumen relatif terhadap kumpulan dokumen lain.\n\nSemantic: Menggunakan model deep learning (Sentence-BERT) untuk memahami makna kalimat, cocok untuk kemiripan makna, bukan hanya kata."
+        disabled=library_mode,
+        help="TF-IDF (Term Frequency-Inverse Document Frequency) adalah metode statistik untuk menilai seberapa penting sebuah kata dalam dokumen relatif terhadap kumpulan dokumen lain.\n\nSemantic: Menggunakan model deep learning (Sentence-BERT) untuk memahami makna kalimat, cocok untuk kemiripan makna, bukan hanya kata.\n\nMinHash: Shingle kata dengan signature MinHash dan index LSH untuk mendeteksi salinan persis/hampir persis. Skor adalah perkiraan Jaccard, disertai rentang kata persis terpanjang yang sama. Sangat cepat tanpa model."
     )
+    if library_mode:
+        method = "Semantic"
+        st.caption("Mode Pustaka Sumber selalu memakai metode Semantic.")
+    if method == "Semantic":
+        models = list(dict.fromkeys([SEMANTIC_MODEL_NAME, MULTILINGUAL_MODEL_NAME, EMBEDDING_MODEL]))
+        st.selectbox(
+            "Model Semantic",
+            models,
+            index=models.index(EMBEDDING_MODEL),
+            format_func=lambda name: EMBEDDING_MODEL_LABELS.get(name, name),
+            key="embedding_model",
+            help="Model multilingual menempatkan teks Indonesia dan Inggris dalam satu ruang embedding: sitasi dibandingkan langsung dengan sumber berbahasa lain tanpa langkah translasi (lebih cepat, tanpa DeepL/MarianMT). Tidak berlaku jika prefilter TF-IDF aktif."
+        )
+        backends = available_embedding_backends()
+        st.selectbox(
+            "Backend Inferensi Semantic",
+            backends,
+            index=backends.index(EMBEDDING_BACKEND) if EMBEDDING_BACKEND in backends else 0,
+            format_func=EMBEDDING_BACKEND_LABELS.get,
+            key="embedding_backend",
+            help="Backend CPU untuk Sentence-BERT. int8 dan ONNX Runtime lebih cepat dengan selisih skor kecil terhadap PyTorch fp32 (lihat benchmark)."
+        )
     use_local = st.checkbox("Gunakan Model Lokal (offline)", value=False)
     sort_option = st.radio(
         "Urutkan Hasil Berdasarkan",
@@ -34,23 +80,222 @@ def sidebar_settings():
     st.markdown(f"<style>{header_css}</style>", unsafe_allow_html=True)
     return threshold, mode, method, use_local, sort_option
 
-def show_matches(matches, tipe_cek, method, sort_option):
-    """Tampilkan hasil pencocokan di UI."""
+def _location_label(location, page_labels):
+    """Label lokasi: section/judul (chunk DOCX) jika ada di page_labels, selain itu nomor halaman."""
+    key = tuple(location) if len(location) == 2 else location[0]
+    label = page_labels.get(key) if page_labels else None
+    return html.escape(label) if label is not None else f"Halaman {location[-1]}"
+
+def _match_html(match, page_labels=None, verbatim_of=None):
+    """
+    HTML kartu untuk satu hasil (page, teks, skor) atau (dokumen, page, teks, skor).
+    page_labels: {page: label} atau {(dokumen, page): label} untuk sumber DOCX.
+    verbatim_of: teks sitasi; jika diisi, rentang kata persis terpanjang yang sama ditandai.
+    """
+    *location, text_match, sim = match
+    if len(location) == 2:
+        location_label = f"{html.escape(str(location[0]))} &nbsp;·&nbsp; {_location_label(location, page_labels)}"
+    else:
+        location_label = _location_label(location, page_labels)
+    # Teks sumber dirender dengan unsafe_allow_html, jadi selalu di-escape; <mark> disisipkan setelahnya.
+    text_html = html.escape(text_match)
+    verbatim_label = ""
+    if verbatim_of is not None:
+        from utils.minhash_utils import longest_common_span
+        words, char_span = longest_common_span(verbatim_of, text_match)
+        if char_span is not None:
+            start, end = char_span
+            text_html = (
+                f"{html.escape(text_match[:start])}<mark>{html.escape(text_match[start:end])}</mark>"
+                f"{html.escape(text_match[end:])}"
+            )
+            verbatim_label = f" &nbsp; | &nbsp; <b>Salinan persis terpanjang:</b> {words} kata"
+    return (
+        f'<div style="background-color:#eaf3fb; border-left:5px solid #1E90FF; padding:10px; margin-bottom:10px;">'
+        f'<b>{location_label}</b> &nbsp; | &nbsp; <b>Kemiripan:</b> <span style="color:#1E90FF;">{sim:.2f}</span>{verbatim_label}<br>'
+        f'<span style="color:#222;">{text_html}</span>'
+        f'</div>'
+    )
+
+def _render_matches(matches, page_labels=None, verbatim_of=None):
+    """Render sekumpulan hasil sebagai satu blok HTML (satu elemen Streamlit, bukan satu per hasil)."""
+    st.markdown("".join(_match_html(match, page_labels, verbatim_of) for match in matches), unsafe_allow_html=True)
+
+def show_matches(matches, tipe_cek, method, sort_option, page_size=RESULTS_PAGE_SIZE, page_labels=None, citation_text=None):
+    """
+    Tampilkan hasil pencocokan di UI, dipaginasi: hanya satu halaman hasil yang dirender.
+    matches: MatchResults atau list of (page, teks, skor) / (dokumen, page, teks, skor).
+    page_labels: label lokasi per halaman/chunk (section/judul untuk sumber DOCX).
+    citation_text: sitasi yang dicocokkan; pada metode MinHash rentang kata persis terpanjang
+    ditandai (dihitung hanya untuk hasil di halaman yang ditampilkan).
+    """
     st.subheader("Hasil Pencocokan")
+    matches = MatchResults.from_tuples(matches)
+    if not matches:
+        st.info(f"Tidak ditemukan kemiripan signifikan pada {tipe_cek} dengan metode {method}.")
+        return
     if sort_option == "Tingkat Kemiripan (desc)":
-        matches = sorted(matches, key=lambda x: x[2], reverse=True)
+        matches = matches.sort_by_score()
     else:
-        matches = sorted(matches, key=lambda x: x[0])
-    if matches:
-        st.success(f"Ditemukan kemiripan pada {tipe_cek} (metode: {method}):")
-        for page, text_match, sim in matches:
-            st.markdown(
-                f"""
-                <div style="background-color:#eaf3fb; border-left:5px solid #1E90FF; padding:10px; margin-bottom:10px;">
-                <b>Halaman {page}</b> &nbsp; | &nbsp; <b>Kemiripan:</b> <span style="color:#1E90FF;">{sim:.2f}</span><br>
-                <span style="color:#222;">{text_match}</span>
-                </div>
-                """, unsafe_allow_html=True
-            )
+        matches = matches.sort_by_page()
+    st.success(f"Ditemukan {len(matches)} kemiripan pada {tipe_cek} (metode: {method}):")
+    total_pages = (len(matches) + page_size - 1) // page_size
+    result_page = 1
+    if total_pages > 1:
+        result_page = st.number_input(
+            f"Halaman hasil (1-{total_pages}, {page_size} per halaman)",
+            min_value=1, max_value=total_pages, value=1, step=1, key="match_result_page"
+        )
+    start = (int(result_page) - 1) * page_size
+    verbatim_of = citation_text if method == "MinHash" else None
+    _render_matches(matches[start:start + page_size], page_labels, verbatim_of)
+
+def show_matches_live(match_batches, top_n=10, stop_after=None, stop_score=0.9, page_labels=None):
+    """
+    Konsumsi generator hasil pencocokan (MatchResults/list per halaman atau batch) dan
+    tampilkan top-N sementara yang diperbarui setiap ada hasil baru.
+    Berhenti lebih awal jika sudah ada stop_after hasil dengan skor >= stop_score.
+    Returns: (MatchResults seluruh hasil yang terkumpul, berhenti_lebih_awal)
+    """
+    placeholder = st.empty()
+    collected = []
+    top = MatchResults.empty([])
+    total = 0
+    strong_matches = 0
+    stopped_early = False
+    try:
+        for batch in match_batches:
+            batch = MatchResults.from_tuples(batch)
+            if not batch:
+                continue
+            collected.append(batch)
+            total += len(batch)
+            strong_matches += int((batch.scores >= stop_score).sum())
+            # Top-N cukup dihitung dari top-N sebelumnya + batch baru
+            top = MatchResults.concat([top, batch.top_k(top_n)]).top_k(top_n)
+            with placeholder.container():
+                st.caption(f"Hasil sementara: {total} kecocokan ditemukan, menampilkan {top_n} teratas...")
+                _render_matches(top, page_labels)
+            if stop_after and strong_matches >= stop_after:
+                stopped_early = True
+                break
+    finally:
+        if hasattr(match_batches, "close"):
+            match_batches.close()
+    placeholder.empty()
+    return MatchResults.concat(collected), stopped_early
+
+def show_highlight_export(make_pdf, source_name, source_key=None):
+    """
+    Tombol unduh PDF sumber dengan highlight hasil pencocokan.
+    make_pdf(quick_save) -> bytes hanya dipanggil saat tombol "Buat PDF" diklik; hasilnya
+    disimpan di st.session_state["highlight_pdf"] per (source_key, quick_save), sehingga
+    rerun halaman tidak membuat ulang PDF. Entri dibuang saat pemeriksaan baru dimulai.
+    Jika pembuatan gagal, error ditampilkan dan tidak disimpan sehingga tombol dapat dicoba lagi.
+    """
+    col_mode, col_button = st.columns([1, 1])
+    quick_save = col_mode.checkbox(
+        "Simpan cepat",
+        value=True,
+        help="Simpan tanpa kompresi dan pembersihan ulang seluruh dokumen: jauh lebih cepat untuk PDF besar, ukuran file sedikit lebih besar."
+    )
+    cache_key = (source_key, quick_save)
+    cached = st.session_state.get("highlight_pdf")
+    if cached is not None and cached[0] != cache_key:
+        cached = None
+    if cached is None and col_button.button("Buat PDF dengan Highlight", use_container_width=True):
+        try:
+            with st.spinner("Membuat PDF dengan highlight..."):
+                cached = (cache_key, make_pdf(quick_save))
+        except Exception as e:
+            st.error(f"Gagal membuat PDF dengan highlight: {e}")
+        else:
+            st.session_state["highlight_pdf"] = cached
+    if cached is not None:
+        col_button.download_button(
+            "Unduh PDF dengan Highlight",
+            data=cached[1],
+            file_name=f"{os.path.splitext(source_name)[0]}-highlight.pdf",
+            mime="application/pdf",
+            on_click="ignore",
+            use_container_width=True,
+        )
+
+JOB_STATUS_LABELS = {
+    "queued": "Menunggu giliran di antrian...",
+    "running": "Memproses...",
+    "cancelling": "Membatalkan...",
+}
+
+@st.fragment(run_every=1)
+def show_job_status(job_manager):
+    """
+    Pantau job pemeriksaan aktif (st.session_state["active_job"] = (id_job, label_metode)).
+    Fragment ini di-poll tiap detik tanpa menjalankan ulang seluruh halaman; begitu job
+    selesai, hasil dipindahkan ke session (match_results, job_summary, perf_session)
+    lalu halaman di-rerun untuk menampilkannya.
+    """
+    active = st.session_state.get("active_job")
+    if active is None:
+        return
+    job_id, method_label = active
+    try:
+        status = job_manager.status(job_id)
+    except KeyError:
+        st.session_state.pop("active_job", None)
+        st.session_state["job_summary"] = {"error": "Job pemeriksaan tidak ditemukan atau sudah kedaluwarsa."}
+        st.rerun()
+    if status["status"] in JOB_STATUS_LABELS:
+        done, total = status["done"], status["total"]
+        text = status["message"] or JOB_STATUS_LABELS[status["status"]]
+        if total:
+            text = f"{text} ({done}/{total} halaman)"
+        st.progress(done / total if total else 0.0, text=text)
+        st.caption(f"Job {job_id[:8]} · {status['status']}")
+        if status["status"] != "cancelling" and st.button("Batalkan", key=f"cancel-{job_id}"):
+            job_manager.cancel(job_id)
+        return
+    st.session_state.pop("active_job", None)
+    if status["status"] == "done":
+        result = dict(job_manager.result(job_id))
+        st.session_state["match_results"] = (result.pop("matches"), result["tipe_cek"], method_label)
+        st.session_state["match_page_labels"] = result.pop("page_labels", None)
+        st.session_state["match_citation"] = result["citation_for_compare"]
+        perf = result.pop("perf")
+        if perf is not None:
+            st.session_state["perf_session"] = perf
+        st.session_state["job_summary"] = result
+    elif status["status"] == "cancelled":
+        st.session_state["job_summary"] = {"error": "Pemeriksaan dibatalkan."}
     else:
-        st.info(f"Tidak ditemukan kemiripan signifikan pada {tipe_cek} dengan metode {method}.")
+        st.session_state["job_summary"] = {"error": f"Pemeriksaan gagal: {status['error']}"}
+    st.rerun()
+
+def show_performance_panel(perf):
+    """
+    Panel performa: waktu per tahap, counter/cache hit rate, dan unduhan laporan
+    (JSON atau Chrome trace untuk chrome://tracing / Perfetto).
+    perf: utils.profiling.ProfileSession dari pemeriksaan terakhir.
+    """
+    with st.expander("Performa", expanded=True):
+        stages = perf.summary()
+        if not stages:
+            st.caption("Belum ada data performa. Jalankan pemeriksaan dengan panel performa aktif.")
+            return
+        rows = [
+            dict({"tahap": name}, **values)
+            for name, values in sorted(stages.items(), key=lambda item: item[1]["seconds"], reverse=True)
+        ]
+        for row in rows:
+            # Throughput encode untuk menyetel ukuran batch per mesin
+            if row.get("tokens") and row["seconds"]:
+                row["tokens_per_second"] = round(row["tokens"] / row["seconds"], 1)
+        st.dataframe(rows, use_container_width=True, hide_index=True)
+        hit_rates = perf.cache_hit_rates()
+        if hit_rates:
+            st.caption("Cache hit rate: " + ", ".join(
+                f"{name} {rate:.0%}" if rate is not None else f"{name} -" for name, rate in sorted(hit_rates.items())
+            ))
+        col_json, col_trace = st.columns(2)
+        col_json.download_button("Unduh JSON", perf.to_json(), file_name="citara-performa.json", mime="application/json")
+        col_trace.download_button("Unduh Chrome Trace", perf.to_chrome_trace(), file_name="citara-trace.json", mime="application/json")
@@ -0,0 +1,215 @@
+import numpy as np
+
+
+def _normalize_rows(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if vectors.ndim == 1:
+        vectors = vectors.reshape(1, -1)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def _top_k_indices(scores, k):
+    """Indeks k skor tertinggi, terurut menurun."""
+    if k >= len(scores):
+        return np.argsort(-scores, kind="stable")
+    idx = np.argpartition(-scores, k - 1)[:k]
+    return idx[np.argsort(-scores[idx], kind="stable")]
+
+
+def exact_search(vectors, query, k):
+    """Pencarian brute-force (cosine) sebagai acuan akurasi. Returns: (ids, scores)."""
+    scores = np.asarray(vectors, dtype=np.float32) @ _normalize_rows(query)[0]
+    ids = _top_k_indices(scores, min(k, len(scores)))
+    return ids, scores[ids]
+
+
+class IVFIndex:
+    """
+    Index Approximate Nearest Neighbour berbasis IVF (inverted file) murni NumPy.
+    Vektor dikelompokkan dengan spherical k-means; query hanya memeriksa n_probe
+    cluster terdekat sehingga biaya per query jauh di bawah linear scan.
+    Skor yang dikembalikan adalah cosine similarity (vektor dinormalisasi L2).
+    """
+
+    def __init__(self, n_lists=None, n_probe=None, n_iter=15, seed=0, min_train_size=256):
+        self.n_lists = n_lists
+        self.n_probe = n_probe
+        self._auto_probe = n_probe is None
+        self.n_iter = n_iter
+        self.seed = seed
+        self.min_train_size = min_train_size
+        self.centroids = None
+        self.vectors = np.zeros((0, 0), dtype=np.float32)
+        self._lists = []
+        self._trained_size = 0
+
+    def __len__(self):
+        return self.vectors.shape[0]
+
+    @property
+    def list_count(self):
+        """Jumlah list (cluster) terlatih; n_probe sebesar ini berarti pencarian exact."""
+        return len(self._lists)
+
+    def _train(self, vectors):
+        n = vectors.shape[0]
+        n_lists = self.n_lists or int(np.sqrt(n))
+        if n < self.min_train_size:
+            n_lists = 1
+        n_lists = max(1, min(n_lists, n))
+        rng = np.random.default_rng(self.seed)
+        sample = vectors
+        if n > n_lists * 256:
+            sample = vectors[rng.choice(n, n_lists * 256, replace=False)]
+        centroids = sample[rng.choice(sample.shape[0], n_lists, replace=False)].copy()
+        for _ in range(self.n_iter if n_lists > 1 else 0):
+            assign = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assign, sample)
+            empty = np.bincount(assign, minlength=n_lists) == 0
+            # Cluster kosong diisi ulang dengan titik acak agar semua list terpakai
+            sums[empty] = sample[rng.choice(sample.shape[0], int(empty.sum()))]
+            centroids = _normalize_rows(sums)
+        self.centroids = centroids
+        self._trained_size = n
+        if self.n_probe is None:
+            self.n_probe = max(1, min(n_lists, max(8, n_lists // 10)))
+        self._lists = [np.zeros(0, dtype=np.int64) for _ in range(n_lists)]
+
+    def _assign(self, vectors, chunk_size=8192):
+        assign = np.empty(vectors.shape[0], dtype=np.int64)
+        for start in range(0, vectors.shape[0], chunk_size):
+            chunk = vectors[start:start + chunk_size]
+            assign[start:start + chunk_size] = np.argmax(chunk @ self.centroids.T, axis=1)
+        return assign
+
+    def build(self, embeddings):
+        """Latih centroid dan masukkan seluruh embedding ke index."""
+        vectors = _normalize_rows(embeddings)
+        self.vectors = np.zeros((0, vectors.shape[1]), dtype=np.float32)
+        if vectors.shape[0] == 0:
+            self.centroids = None
+            self._lists = []
+            return self
+        self._train(vectors)
+        self.add(vectors)
+        return self
+
+    def add(self, embeddings):
+        """
+        Tambah embedding ke index tanpa melatih ulang centroid.
+        Returns: array id (posisi global) untuk embedding yang ditambahkan.
+        """
+        vectors = _normalize_rows(embeddings)
+        if self.centroids is None:
+            self.build(vectors)
+            return np.arange(vectors.shape[0], dtype=np.int64)
+        start = self.vectors.shape[0]
+        ids = np.arange(start, start + vectors.shape[0], dtype=np.int64)
+        self.vectors = np.concatenate([self.vectors, vectors]) if start else vectors
+        assign = self._assign(vectors)
+        for list_id in np.unique(assign):
+            self._lists[list_id] = np.concatenate([self._lists[list_id], ids[assign == list_id]])
+        return ids
+
+    def remove(self, ids):
+        """
+        Hapus embedding dengan id (posisi global) tertentu tanpa melatih ulang centroid.
+        Id sisanya dipadatkan dengan urutan tetap, sama seperti menghapus baris yang sama dari
+        daftar metadata paralel. Index yang menjadi kosong dilatih ulang saat add berikutnya.
+        """
+        ids = np.asarray(ids, dtype=np.int64)
+        if ids.size == 0:
+            return self
+        keep = np.ones(len(self), dtype=bool)
+        keep[ids] = False
+        self.vectors = self.vectors[keep]
+        if not len(self):
+            self.centroids = None
+            self._lists = []
+            self._trained_size = 0
+            if self._auto_probe:
+                self.n_probe = None
+            return self
+        new_ids = np.cumsum(keep) - 1
+        self._lists = [new_ids[members[keep[members]]] for members in self._lists]
+        return self
+
+    def needs_retrain(self, growth_factor=4):
+        """True jika index sudah tumbuh jauh melebihi data saat centroid dilatih."""
+        return self.centroids is not None and len(self) > max(self.min_train_size, self._trained_size * growth_factor)
+
+    def retrain(self):
+        """Latih ulang centroid atas seluruh vektor yang ada lalu bagi ulang isi list."""
+        vectors = self.vectors
+        if self._auto_probe:
+            self.n_probe = None
+        self._train(vectors)
+        assign = self._assign(vectors)
+        ids = np.arange(vectors.shape[0], dtype=np.int64)
+        for list_id in np.unique(assign):
+            self._lists[list_id] = ids[assign == list_id]
+        return self
+
+    def _candidates(self, query, n_probe):
+        n_probe = min(n_probe or self.n_probe, len(self._lists))
+        probe = _top_k_indices(self.centroids @ query, n_probe)
+        return np.concatenate([self._lists[list_id] for list_id in probe])
+
+    def search(self, query, k=10, n_probe=None):
+        """Cari k vektor dengan cosine tertinggi terhadap query. Returns: (ids, scores)."""
+        if len(self) == 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        query = _normalize_rows(query)[0]
+        candidates = self._candidates(query, n_probe)
+        scores = self.vectors[candidates] @ query
+        top = _top_k_indices(scores, min(k, len(scores)))
+        return candidates[top], scores[top]
+
+    def search_threshold(self, query, threshold, n_probe=None):
+        """Semua vektor (di cluster yang diperiksa) dengan cosine >= threshold, terurut menurun."""
+        if len(self) == 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        query = _normalize_rows(query)[0]
+        candidates = self._candidates(query, n_probe)
+        scores = self.vectors[candidates] @ query
+        keep = np.nonzero(scores >= threshold)[0]
+        keep = keep[np.argsort(-scores[keep], kind="stable")]
+        return candidates[keep], scores[keep]
+
+
+class UnitIndex:
+    """
+    Index ANN atas unit sumber (kalimat/paragraf) hasil ekstraksi.
+    Query mengembalikan tuple (page, unit, score) seperti fungsi find_*_matches.
+    """
+
+    def __init__(self, unit_pages, units, embeddings, semantic_model=None, n_lists=None, n_probe=None):
+        self.unit_pages = list(unit_pages)
+        self.units = list(units)
+        self.semantic_model = semantic_model
+        self.index = IVFIndex(n_lists=n_lists, n_probe=n_probe).build(embeddings)
+
+    def __len__(self):
+        return len(self.units)
+
+    def _encode_query(self, citation_text):
+        from utils.semantic_utils import encode_texts, get_semantic_model
+        if self.semantic_model is None:
+            self.semantic_model = get_semantic_model()
+        return encode_texts([citation_text], self.semantic_model)[0]
+
+    def _to_matches(self, ids, scores):
+        return [(self.unit_pages[i], self.units[i], float(score)) for i, score in zip(ids, scores)]
+
+    def top_k(self, citation_text, k=10, n_probe=None):
+        """k unit paling mirip dengan sitasi. Returns: list of (page, unit, skor)."""
+        ids, scores = self.index.search(self._encode_query(citation_text), k, n_probe=n_probe)
+        return self._to_matches(ids, scores)
+
+    def search_threshold(self, citation_text, similarity_threshold=0.6, n_probe=None):
+        """Unit dengan skor >= threshold (perkiraan ANN). Returns: list of (page, unit, skor)."""
+        ids, scores = self.index.search_threshold(self._encode_query(citation_text), similarity_threshold, n_probe=n_probe)
+        return self._to_matches(ids, scores)
@@ -0,0 +1,221 @@
+import csv
+import json
+import os
+
+import numpy as np
+
+from utils.embedding_cache import compute_file_hash, make_cache_key
+
+
+def load_citations(path):
+    """
+    Baca daftar sitasi dari file JSONL, CSV atau teks biasa (satu sitasi per baris).
+    JSONL/CSV memakai kolom "text" (wajib) dan "id" (opsional).
+    Returns: list of dict {"id": ..., "text": ...}.
+    """
+    ext = os.path.splitext(path)[1].lower()
+    citations = []
+    with open(path, "r", encoding="utf-8-sig", newline="") as f:
+        if ext in (".jsonl", ".ndjson"):
+            rows = (json.loads(line) for line in f if line.strip())
+        elif ext == ".csv":
+            rows = csv.DictReader(f)
+        else:
+            rows = ({"text": line.strip()} for line in f if line.strip())
+        for i, row in enumerate(rows):
+            text = (row.get("text") or "").strip()
+            if not text:
+                continue
+            citation_id = row.get("id")
+            citations.append({"id": str(i + 1) if citation_id is None else citation_id, "text": text})
+    return citations
+
+
+def load_sources(paths, unit_mode="sentence"):
+    """
+    Ekstrak beberapa file sumber PDF/DOCX.
+    Returns: list of dict {"name", "pages_text", "source_key", "page_labels"}.
+    """
+    from utils.source_library import extract_source_pages
+    sources = []
+    for path in paths:
+        page_labels = {}
+        pages_text, extraction_mode = extract_source_pages(path, os.path.basename(path), unit_mode, page_labels=page_labels)
+        sources.append({
+            "name": os.path.basename(path),
+            "pages_text": pages_text,
+            "source_key": (compute_file_hash(path), extraction_mode),
+            "page_labels": page_labels,
+        })
+    return sources
+
+
+def _batch_match(source, page, text, score, page_labels):
+    match = {"source": source, "page": page, "text": text, "score": float(score)}
+    label = page_labels.get((source, page))
+    if label is not None:
+        match["section"] = label
+    return match
+
+
+def _check_citations_minhash(citations, unit_sources, unit_pages, units, similarity_threshold, top_k, page_labels):
+    from utils.minhash_utils import MinHashIndex, longest_common_span
+    index = MinHashIndex(units)
+    for citation in citations:
+        ids, estimates = index.query(citation["text"], similarity_threshold)
+        order = np.argsort(-estimates, kind="stable")[:top_k]
+        matches = []
+        for i, score in zip(ids[order], estimates[order]):
+            match = _batch_match(unit_sources[i], unit_pages[i], units[i], score, page_labels)
+            match["verbatim_words"] = longest_common_span(citation["text"], units[i])[0]
+            matches.append(match)
+        yield {"id": citation["id"], "citation": citation["text"], "matches": matches}
+
+
+def _collect_source_units(sources, splitter):
+    from utils.similarity_utils import _collect_units
+    unit_sources, unit_pages, units, spans = [], [], [], []
+    for source in sources:
+        pages, source_units = _collect_units(source["pages_text"], splitter, None)
+        spans.append((source, len(units), len(units) + len(source_units)))
+        unit_sources.extend([source["name"]] * len(source_units))
+        unit_pages.extend(pages)
+        units.extend(source_units)
+    return unit_sources, unit_pages, units, spans
+
+
+def _semantic_unit_embeddings(spans, units, splitter, semantic_model, embedding_model=None, embedding_backend=None):
+    from utils.semantic_utils import embedding_model_id, get_unit_embeddings
+    blocks = []
+    for source, start, end in spans:
+        if start == end:
+            continue
+        cache_key = None
+        if source.get("source_key") is not None:
+            file_hash, extraction_mode = source["source_key"]
+            cache_key = make_cache_key(file_hash, extraction_mode, splitter.__name__, embedding_model_id(embedding_model, embedding_backend))
+        blocks.append(np.asarray(get_unit_embeddings(units[start:end], semantic_model, cache_key=cache_key), dtype=np.float32))
+    return np.concatenate(blocks) if blocks else np.zeros((0, 0), dtype=np.float32)
+
+
+def _fit_tfidf(units):
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    vectorizer = TfidfVectorizer()
+    try:
+        return vectorizer, vectorizer.fit_transform(units)
+    except ValueError:
+        # Vocabulary kosong (misal hanya tanda baca/angka satu digit)
+        return vectorizer, None
+
+
+def prepare_sources(sources, unit_mode="sentence", method="semantic", semantic_model=None,
+                    embedding_model=None, embedding_backend=None):
+    """
+    Unit sumber siap skor untuk check_citations_batch: hasil split unit dan matriks unit sesuai
+    metode (embedding float32 untuk semantic, TF-IDF yang di-fit atas unit sumber saja untuk tfidf).
+    Hasilnya dapat disimpan dan diberikan sebagai prepared ke setiap pemanggilan atas sumber,
+    unit_mode, metode dan model yang sama, sehingga sumber tidak di-split, dimuat dari cache
+    embedding atau di-fit ulang per pemanggilan.
+    Returns: dict {method, unit_sources, unit_pages, units, page_labels, unit_matrix, vectorizer};
+    unit_matrix None jika tidak ada unit (atau vocabulary TF-IDF kosong).
+    """
+    from utils.text_segmentation import get_splitter
+    splitter = get_splitter(unit_mode)
+    unit_sources, unit_pages, units, spans = _collect_source_units(sources, splitter)
+    prepared = {
+        "method": method,
+        "unit_sources": unit_sources,
+        "unit_pages": unit_pages,
+        "units": units,
+        "page_labels": {
+            (source["name"], page): label
+            for source in sources
+            for page, label in (source.get("page_labels") or {}).items()
+        },
+        "unit_matrix": None,
+        "vectorizer": None,
+    }
+    if not units:
+        return prepared
+    if method == "semantic":
+        if semantic_model is None:
+            from utils.semantic_utils import get_semantic_model
+            semantic_model = get_semantic_model(embedding_model, embedding_backend)
+        prepared["unit_matrix"] = _semantic_unit_embeddings(spans, units, splitter, semantic_model, embedding_model, embedding_backend)
+    elif method == "tfidf":
+        # IDF hanya dari unit sumber (sama seperti jalur UI), sehingga skor satu sitasi
+        # tidak bergantung pada sitasi lain di batch yang sama
+        prepared["vectorizer"], prepared["unit_matrix"] = _fit_tfidf(units)
+    return prepared
+
+
+def check_citations_batch(citations, sources, unit_mode="sentence", method="semantic", similarity_threshold=0.6,
+                          top_k=None, semantic_model=None, chunk_size=256, embedding_model=None, embedding_backend=None,
+                          prepared=None):
+    """
+    Cek banyak sitasi sekaligus terhadap satu atau beberapa sumber.
+    Unit sumber dibentuk dengan splitter yang sama seperti find_sentence_matches /
+    find_paragraph_matches; semua sitasi di-encode dalam satu panggilan batch lalu
+    diskor dengan satu perkalian matriks sitasi x unit (per chunk sitasi).
+    - citations: list of dict {"id", "text"} atau list string.
+    - sources: hasil load_sources (atau dict serupa dengan pages_text siap pakai).
+    Yields: dict {"id", "citation", "matches": [{"source", "page", "text", "score"}, ...]}
+    per sitasi, sesuai urutan input. Untuk sumber dengan page_labels (DOCX), setiap hasil
+    juga memuat "section" (label section/judul chunk).
+    method "minhash": satu index MinHash/LSH atas semua unit, tiap sitasi hanya memeriksa
+    kandidat LSH; skor = perkiraan Jaccard dan hasil memuat "verbatim_words" (jumlah kata
+    rentang persis terpanjang yang sama).
+    embedding_model/embedding_backend: model dan backend Sentence-BERT untuk encode dan key cache
+    (default EMBEDDING_MODEL/EMBEDDING_BACKEND).
+    prepared: hasil prepare_sources atas sources, unit_mode, metode dan model yang sama; jika None,
+    unit sumber disiapkan di sini.
+    """
+    citations = [
+        {"id": str(i + 1) if c.get("id") is None else c["id"], "text": c["text"]} if isinstance(c, dict) else {"id": str(i + 1), "text": c}
+        for i, c in enumerate(citations)
+    ]
+    if not citations:
+        return
+    if prepared is None:
+        prepared = prepare_sources(sources, unit_mode, method, semantic_model, embedding_model, embedding_backend)
+    elif prepared["method"] != method:
+        raise ValueError(f"prepared disiapkan untuk metode {prepared['method']}, bukan {method}.")
+    unit_sources, unit_pages, units = prepared["unit_sources"], prepared["unit_pages"], prepared["units"]
+    unit_matrix, page_labels = prepared["unit_matrix"], prepared["page_labels"]
+    texts = [c["text"] for c in citations]
+
+    if method == "minhash" and units:
+        yield from _check_citations_minhash(citations, unit_sources, unit_pages, units, similarity_threshold, top_k, page_labels)
+        return
+
+    if unit_matrix is None:
+        for citation in citations:
+            yield {"id": citation["id"], "citation": citation["text"], "matches": []}
+        return
+
+    if method == "semantic":
+        from utils.semantic_utils import encode_texts, get_semantic_model
+        if semantic_model is None:
+            semantic_model = get_semantic_model(embedding_model, embedding_backend)
+        citation_matrix = encode_texts(texts, semantic_model)
+    else:
+        citation_matrix = prepared["vectorizer"].transform(texts)
+
+    for start in range(0, len(citations), chunk_size):
+        block = citation_matrix[start:start + chunk_size] @ unit_matrix.T
+        block = block.toarray() if hasattr(block, "toarray") else np.asarray(block)
+        for offset, scores in enumerate(block):
+            citation = citations[start + offset]
+            if top_k is not None:
+                candidates = np.argsort(-scores, kind="stable")[:top_k]
+                candidates = candidates[scores[candidates] >= similarity_threshold]
+            else:
+                candidates = np.nonzero(scores >= similarity_threshold)[0]
+            yield {
+                "id": citation["id"],
+                "citation": citation["text"],
+                "matches": [
+                    _batch_match(unit_sources[i], unit_pages[i], units[i], scores[i], page_labels)
+                    for i in candidates
+                ],
+            }
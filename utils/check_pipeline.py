@@ -0,0 +1,169 @@
+import io
+import os
+
+from utils.match_results import MatchResults
+from utils.profiling import profile_session, span
+
+
+def translate_citation(citation_text, citation_lang_code, source_lang_code, use_local, multilingual=False):
+    """
+    Terjemahkan sitasi ke bahasa sumber bila perlu. Returns: (teks_untuk_pencocokan, info_translasi).
+    multilingual: pencocokan memakai model embedding multilingual, sehingga sitasi dibandingkan
+    langsung dengan sumber berbahasa lain tanpa terjemahan.
+    """
+    from utils.translation_utils import translate_text_from_EN_to_ID, translate_text_from_ID_to_EN
+    if citation_lang_code == source_lang_code:
+        return citation_text, "(Tidak perlu translasi, bahasa sama)"
+    if multilingual:
+        return citation_text, "(Tanpa translasi: model embedding multilingual membandingkan sitasi dan sumber lintas bahasa secara langsung)"
+    if citation_lang_code == "ID" and source_lang_code == "EN":
+        return translate_text_from_ID_to_EN(citation_text, use_local=use_local), "(Sitasi diterjemahkan dari Bahasa Indonesia ke Bahasa Inggris)"
+    if citation_lang_code == "EN" and source_lang_code == "ID":
+        return translate_text_from_EN_to_ID(citation_text, use_local=use_local), "(Sitasi diterjemahkan dari Bahasa Inggris ke Bahasa Indonesia)"
+    return citation_text, ""
+
+
+def skips_translation(options):
+    """
+    True jika terjemahan sitasi dapat dilewati: metode Semantic dengan model embedding
+    multilingual tanpa prefilter TF-IDF (TF-IDF dan MinHash tetap butuh bahasa yang sama).
+    """
+    from utils.semantic_utils import is_multilingual_model
+    return options["method"] == "Semantic" and not options.get("two_stage") and is_multilingual_model(options.get("embedding_model"))
+
+
+def iter_match_batches(citation_text, pages_text, options, progress_callback=None, source_key=None, stats=None):
+    """
+    Pilih generator pencocokan sesuai pengaturan sidebar.
+    options: dict dengan key mode ("Kalimat"/"Paragraf"), method ("TF-IDF"/"Semantic"/"MinHash"), threshold,
+    dan opsional crossunit, window_size (list), unit_mode ("Kalimat"/"Paragraf"),
+    two_stage, rerank_top_n, rerank_margin, embedding_model, embedding_backend.
+    Returns: (generator batch MatchResults, label tipe cek)
+    """
+    from utils.similarity_utils import iter_crossunit_matches, iter_paragraph_matches, iter_sentence_matches
+    # "TF-IDF" -> "tfidf", "Semantic" -> "semantic", "MinHash" -> "minhash"
+    method_key = options["method"].lower().replace("-", "")
+    threshold = options["threshold"]
+    embedding_model, embedding_backend = options.get("embedding_model"), options.get("embedding_backend")
+    # Mode semantic dua tahap (hanya untuk mode Kalimat/Paragraf)
+    rerank_kwargs = {}
+    if method_key == "semantic" and options.get("two_stage"):
+        rerank_kwargs = {"rerank_top_n": int(options["rerank_top_n"]), "rerank_margin": options["rerank_margin"], "stats": stats}
+    elif method_key == "minhash":
+        # Jumlah kandidat LSH dilaporkan lewat stats
+        rerank_kwargs = {"stats": stats}
+    if options["mode"] == "Paragraf":
+        batches = iter_paragraph_matches(
+            citation_text, pages_text, similarity_threshold=threshold, method=method_key,
+            progress_callback=progress_callback, source_key=source_key,
+            embedding_model=embedding_model, embedding_backend=embedding_backend, **rerank_kwargs
+        )
+        return batches, "Paragraf"
+    if options.get("crossunit"):
+        window_size = options["window_size"]
+        unit_mode = options["unit_mode"]
+        batches = iter_crossunit_matches(
+            citation_text, pages_text, similarity_threshold=threshold, method=method_key,
+            progress_callback=progress_callback, window_size=window_size,
+            unit_mode="sentence" if unit_mode == "Kalimat" else "paragraph", source_key=source_key,
+            embedding_model=embedding_model, embedding_backend=embedding_backend
+        )
+        window_label = f"{min(window_size)}" if min(window_size) == max(window_size) else f"{min(window_size)}-{max(window_size)}"
+        return batches, f"Gabungan {window_label} {unit_mode.lower()}"
+    batches = iter_sentence_matches(
+        citation_text, pages_text, similarity_threshold=threshold, method=method_key,
+        progress_callback=progress_callback, source_key=source_key,
+        embedding_model=embedding_model, embedding_backend=embedding_backend, **rerank_kwargs
+    )
+    return batches, "Kalimat"
+
+
+def extract_source(source, source_name, mode, page_labels=None):
+    """
+    Ekstrak sumber PDF/DOCX dari buffer memori. Returns: (pages_text, source_key).
+    DOCX diekstrak per chunk section/judul; page_labels (dict opsional) diisi label lokasinya.
+    Melempar ValueError dengan pesan untuk pengguna jika sumber tidak valid.
+    """
+    from utils.embedding_cache import compute_file_hash
+    with span("hash"):
+        file_hash = compute_file_hash(source)
+    file_ext = os.path.splitext(source_name)[1].lower()
+    if file_ext == ".pdf":
+        from utils.pdf_utils import load_pdf
+        kind = "paragraphs" if mode == "Paragraf" else "text"
+        with span("validate_extract", mode=mode) as stage:
+            pages_text, msg = load_pdf(source, kind=kind)
+            stage.set(pages=len(pages_text or {}))
+        if pages_text is None:
+            raise ValueError(msg)
+        if not pages_text:
+            raise ValueError("Tidak dapat mengekstrak teks dari file PDF.")
+        return pages_text, (file_hash, f"pdf-{kind}")
+    if file_ext == ".docx":
+        from utils.docx_utils import extract_docx_chunks
+        with span("docx_extract") as stage:
+            pages_text = extract_docx_chunks(io.BytesIO(bytes(source)), page_labels=page_labels)
+            stage.set(pages=len(pages_text))
+        if not pages_text:
+            raise ValueError("Tidak dapat mengekstrak teks dari file Word.")
+        return pages_text, (file_hash, "docx-blocks")
+    raise ValueError("Format file sumber tidak didukung. Hanya PDF dan Word (.docx).")
+
+
+def run_citation_check(source, source_name, citation_text, citation_lang_code, source_lang_code, options, progress=None):
+    """
+    Satu pemeriksaan sitasi lengkap (ekstraksi, terjemahan, pencocokan) tanpa Streamlit,
+    dipakai sebagai job latar belakang (utils.job_queue). Dapat berjalan di proses lain:
+    semua argumen dan hasilnya dapat di-pickle.
+    options: seperti iter_match_batches, ditambah use_local, stop_after, stop_score
+    dan profile (catat ProfileSession).
+    progress: callable progress(selesai, total, pesan) (misal JobProgress).
+    Returns: dict {matches (MatchResults ringkas), tipe_cek, citation_for_compare,
+    translation_info, stats, stopped_early, page_labels, perf}
+    """
+    report = progress or (lambda done, total, message=None: None)
+    with profile_session("pemeriksaan", enabled=options.get("profile", False)) as perf:
+        report(0, 1, "Mengekstrak dokumen sumber...")
+        page_labels = {}
+        pages_text, source_key = extract_source(source, source_name, options["mode"], page_labels=page_labels)
+        report(0, len(pages_text), "Menerjemahkan sitasi...")
+        with span("translate", local=options.get("use_local", False)):
+            citation_for_compare, translation_info = translate_citation(
+                citation_text, citation_lang_code, source_lang_code, options.get("use_local", False),
+                multilingual=skips_translation(options)
+            )
+        stats = {}
+        batches, tipe_cek = iter_match_batches(
+            citation_for_compare, pages_text, options,
+            progress_callback=lambda done, total: report(done, total, "Memproses kemiripan..."),
+            source_key=source_key, stats=stats
+        )
+        stop_after, stop_score = options.get("stop_after"), options.get("stop_score", 0.9)
+        collected = []
+        strong_matches = 0
+        stopped_early = False
+        with span("match", method=options["method"], mode=tipe_cek) as stage:
+            try:
+                for batch in batches:
+                    batch = MatchResults.from_tuples(batch)
+                    if not batch:
+                        continue
+                    collected.append(batch)
+                    strong_matches += int((batch.scores >= stop_score).sum())
+                    if stop_after and strong_matches >= stop_after:
+                        stopped_early = True
+                        break
+            finally:
+                batches.close()
+            matches = MatchResults.concat(collected).compact()
+            stage.set(matches=len(matches))
+    return {
+        "matches": matches,
+        "tipe_cek": tipe_cek,
+        "citation_for_compare": citation_for_compare,
+        "translation_info": translation_info,
+        "stats": stats,
+        "stopped_early": stopped_early,
+        "page_labels": page_labels,
+        "perf": perf,
+    }
@@ -1,19 +1,145 @@
-def extract_text_from_docx(docx_file):
-    """Ekstrak seluruh teks dari file docx sebagai satu string."""
-    from docx import Document
-    doc = Document(docx_file)
-    return "\n".join([para.text for para in doc.paragraphs if para.text.strip()])
+import os
+import re
+from collections import namedtuple
 
-def extract_paragraphs_from_docx(docx_file):
-    """Ekstrak list paragraf (string) dari file docx."""
+# Batas ukuran satu chunk pages_text untuk DOCX (karakter), setara kira-kira satu halaman PDF
+DOCX_CHUNK_CHARS = int(os.getenv("CITARA_DOCX_CHUNK_CHARS", "4000"))
+
+_HEADING_STYLE_RE = re.compile(r'^(?:heading|judul)\s*(\d+)$', re.IGNORECASE)
+
+# Satu blok isi dokumen dalam urutan baca.
+# kind: "heading", "paragraph" atau "table" (satu baris tabel, sel dipisah " | ");
+# section: nomor section Word (1-based); headings: tuple judul yang sedang aktif (level atas dulu)
+DocxBlock = namedtuple("DocxBlock", ["kind", "text", "section", "headings"])
+
+
+def _qn(tag):
+    from docx.oxml.ns import qn
+    return qn(tag)
+
+
+def _heading_level(paragraph):
+    """Level judul paragraf (1 = paling atas, Title = 0) dari style atau outline level; None jika bukan judul."""
+    style = paragraph.style
+    name = style.name if style is not None else ""
+    if name == "Title":
+        return 0
+    match = _HEADING_STYLE_RE.match(name or "")
+    if match:
+        return int(match.group(1))
+    ppr = paragraph._p.pPr
+    if ppr is not None:
+        outline = ppr.find(_qn("w:outlineLvl"))
+        if outline is not None:
+            return int(outline.get(_qn("w:val"))) + 1
+    return None
+
+
+def _table_rows(table):
+    """Teks per baris tabel; sel gabungan (merge) yang berulang di satu baris hanya diambil sekali."""
+    for row in table.rows:
+        cells = []
+        seen = set()
+        for cell in row.cells:
+            if id(cell._tc) in seen:
+                continue
+            seen.add(id(cell._tc))
+            text = " ".join(cell.text.split())
+            if text:
+                cells.append(text)
+        if cells:
+            yield " | ".join(cells)
+
+
+def iter_docx_blocks(docx_file):
+    """
+    Baca dokumen docx sekali lalu hasilkan DocxBlock untuk setiap paragraf, judul dan baris
+    tabel sesuai urutan di body, lengkap dengan nomor section dan judul yang aktif.
+    docx_file: path atau file-like (BytesIO).
+    """
     from docx import Document
+    from docx.table import Table
+    from docx.text.paragraph import Paragraph
     doc = Document(docx_file)
-    return [para.text for para in doc.paragraphs if para.text.strip()]
+    body = doc.element.body
+    p_tag, tbl_tag, sect_tag = _qn("w:p"), _qn("w:tbl"), _qn("w:sectPr")
+    section = 1
+    headings = []  # list (level, teks)
+    for child in body.iterchildren():
+        if child.tag == tbl_tag:
+            trail = tuple(text for _, text in headings)
+            for row_text in _table_rows(Table(child, doc)):
+                yield DocxBlock("table", row_text, section, trail)
+        elif child.tag == p_tag:
+            paragraph = Paragraph(child, doc)
+            text = paragraph.text.strip()
+            if text:
+                level = _heading_level(paragraph)
+                if level is not None:
+                    while headings and headings[-1][0] >= level:
+                        headings.pop()
+                    headings.append((level, text))
+                    yield DocxBlock("heading", text, section, tuple(t for _, t in headings))
+                else:
+                    yield DocxBlock("paragraph", text, section, tuple(t for _, t in headings))
+            # Paragraf dengan sectPr menandai akhir sebuah section
+            ppr = child.pPr
+            if ppr is not None and ppr.find(sect_tag) is not None:
+                section += 1
 
-def extract_text_by_section(docx_file):
+
+def _chunk_label(block):
+    label = " › ".join(block.headings)
+    return f"Section {block.section} · {label}" if label else f"Section {block.section}"
+
+
+def extract_docx_chunks(docx_file, max_chars=None, page_labels=None):
     """
-    Ekstrak teks per section (jika ingin dikembangkan, misal per halaman/section).
-    Saat ini, kembalikan dict {1: all_text} agar kompatibel dengan pages_text PDF.
+    Ekstrak docx (sekali parse) menjadi pages_text berisi chunk berukuran terbatas:
+    {nomor_chunk: [blok teks]}. Chunk baru dimulai pada judul yang mengikuti isi (judul
+    berurutan tetap satu chunk), pergantian section, atau saat chunk melebihi max_chars, sehingga batching dan progres bekerja
+    seperti pada halaman PDF. Blok list dipakai langsung sebagai paragraf oleh
+    paragraph_splitter dan dipecah per blok oleh robust_sentence_splitter.
+    page_labels: dict opsional yang diisi {nomor_chunk: "Section n · Judul › Subjudul"}
+    untuk menampilkan lokasi hasil per section/judul.
     """
-    text = extract_text_from_docx(docx_file)
-    return {1: text}
+    max_chars = max_chars or DOCX_CHUNK_CHARS
+    pages_text = {}
+    blocks, size, first, has_body = [], 0, None, False
+
+    def flush():
+        chunk_no = len(pages_text) + 1
+        pages_text[chunk_no] = blocks
+        if page_labels is not None:
+            page_labels[chunk_no] = _chunk_label(first)
+
+    for block in iter_docx_blocks(docx_file):
+        new_section = first is not None and block.section != first.section
+        if blocks and ((block.kind == "heading" and has_body) or new_section or size + len(block.text) > max_chars):
+            flush()
+            blocks, size, has_body = [], 0, False
+        if not has_body:
+            # Label chunk diambil dari blok isi pertama (judul yang aktif saat isi dimulai)
+            first = block
+        blocks.append(block.text)
+        size += len(block.text)
+        has_body = has_body or block.kind != "heading"
+    if blocks:
+        flush()
+    return pages_text
+
+
+def extract_text_from_docx(docx_file):
+    """Ekstrak seluruh teks dari file docx (paragraf, judul dan baris tabel) sebagai satu string."""
+    return "\n".join(block.text for block in iter_docx_blocks(docx_file))
+
+def extract_paragraphs_from_docx(docx_file):
+    """Ekstrak list paragraf (string) dari file docx, termasuk judul dan baris tabel."""
+    return [block.text for block in iter_docx_blocks(docx_file)]
+
+def extract_text_by_section(docx_file):
+    """Ekstrak teks per section Word: dict {nomor_section: teks}, kompatibel dengan pages_text PDF."""
+    sections = {}
+    for block in iter_docx_blocks(docx_file):
+        sections.setdefault(block.section, []).append(block.text)
+    return {section: "\n".join(texts) for section, texts in sections.items()} or {1: ""}
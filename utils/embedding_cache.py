@@ -0,0 +1,161 @@
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+
+import numpy as np
+
+from utils.profiling import count
+
+DEFAULT_CACHE_DIR = os.getenv(
+    "CITARA_EMBEDDING_CACHE_DIR",
+    os.path.join(os.path.expanduser("~"), ".cache", "citara", "embeddings"),
+)
+DEFAULT_MAX_CACHE_MB = float(os.getenv("CITARA_EMBEDDING_CACHE_MB", "512"))
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def compute_file_hash(source):
+    """
+    Hitung SHA-256 dari isi file sumber.
+    source: bytes/bytearray/memoryview atau path file (dibaca per chunk).
+    """
+    digest = hashlib.sha256()
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        digest.update(source)
+    else:
+        with open(source, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(chunk)
+    return digest.hexdigest()
+
+
+def make_cache_key(file_hash, extraction_mode, splitter, model_name):
+    """Bentuk key cache dari (hash file, mode ekstraksi, splitter, nama model)."""
+    raw = "\x1f".join(str(part) for part in (file_hash, extraction_mode, splitter, model_name))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """
+    Penyimpanan embedding persisten di disk.
+    Setiap entri disimpan sebagai satu file .npy (float16/float32) dan dibuka
+    dengan memory-map saat dibaca. Waktu akses dicatat lewat mtime file sehingga
+    eviksi LRU tetap konsisten walau cache dipakai beberapa proses sekaligus.
+    """
+
+    def __init__(self, cache_dir=None, max_size_mb=None, dtype=np.float16):
+        self.cache_dir = cache_dir or DEFAULT_CACHE_DIR
+        self.max_size_bytes = int((DEFAULT_MAX_CACHE_MB if max_size_mb is None else max_size_mb) * 1024 * 1024)
+        self.dtype = np.dtype(dtype)
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.npy")
+
+    def get(self, key, expected_rows=None):
+        """Ambil embedding (memory-mapped, read-only) atau None jika tidak ada/tidak cocok."""
+        path = self._path(key)
+        try:
+            embeddings = np.load(path, mmap_mode="r")
+        except (FileNotFoundError, ValueError, OSError):
+            self.misses += 1
+            count("embedding_cache.miss")
+            return None
+        if expected_rows is not None and embeddings.shape[0] != expected_rows:
+            logging.warning(f"Entri cache embedding {key} tidak sesuai jumlah unit, diabaikan.")
+            self.misses += 1
+            count("embedding_cache.miss")
+            return None
+        try:
+            os.utime(path, None)
+        except OSError:
+            pass
+        self.hits += 1
+        count("embedding_cache.hit")
+        return embeddings
+
+    def put(self, key, embeddings):
+        """Simpan embedding secara atomik lalu jalankan eviksi LRU jika melebihi batas ukuran."""
+        embeddings = np.ascontiguousarray(embeddings, dtype=self.dtype)
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.save(f, embeddings)
+            os.replace(tmp_path, self._path(key))
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+        self._evict()
+        return embeddings
+
+    def delete(self, key):
+        """Hapus satu entri cache jika ada."""
+        try:
+            os.unlink(self._path(key))
+        except OSError:
+            pass
+
+    def _entries(self):
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(".npy"):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+
+    def size_bytes(self):
+        """Total ukuran seluruh entri cache (byte)."""
+        return sum(size for _, size, _ in self._entries())
+
+    def _evict(self):
+        with self._lock:
+            entries = sorted(self._entries())
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in entries:
+                if total <= self.max_size_bytes:
+                    break
+                try:
+                    os.unlink(path)
+                    total -= size
+                except OSError:
+                    pass
+
+    def clear(self):
+        """Hapus semua entri cache."""
+        for _, _, path in self._entries():
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
+
+    def stats(self):
+        """Statistik sederhana: hit, miss, jumlah entri dan ukuran (MB)."""
+        entries = self._entries()
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "entries": len(entries),
+            "size_mb": sum(size for _, size, _ in entries) / (1024 * 1024),
+        }
+
+
+def get_embedding_cache():
+    """Ambil instance EmbeddingCache default (satu per proses)."""
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = EmbeddingCache()
+        return _default_cache
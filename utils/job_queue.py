@@ -0,0 +1,204 @@
+import concurrent.futures
+import logging
+import multiprocessing
+import os
+import threading
+import time
+import uuid
+
+DEFAULT_JOB_WORKERS = int(os.getenv("CITARA_JOB_WORKERS", "0")) or max(1, min(4, (os.cpu_count() or 1)))
+DEFAULT_JOB_EXECUTOR = os.getenv("CITARA_JOB_EXECUTOR", "process")
+DEFAULT_JOB_RETENTION_SECONDS = float(os.getenv("CITARA_JOB_RETENTION_SECONDS", "3600"))
+
+TERMINAL_STATUSES = ("done", "failed", "cancelled")
+
+_default_manager = None
+_default_manager_lock = threading.Lock()
+
+
+class JobCancelled(Exception):
+    """Dilempar di dalam job saat pembatalan diminta (lewat JobProgress)."""
+
+
+class JobProgress:
+    """
+    Callback progres yang diberikan ke fungsi job sebagai argumen progress.
+    Dipanggil seperti progress_callback lama: progress(selesai, total, pesan=None).
+    Setiap panggilan juga memeriksa permintaan pembatalan dan melempar JobCancelled.
+    state: dict biasa (executor thread) atau proxy dict Manager (executor proses).
+    """
+
+    def __init__(self, state):
+        self.state = state
+
+    def __call__(self, done, total, message=None):
+        update = {"done": done, "total": total}
+        if message is not None:
+            update["message"] = message
+        self.state.update(update)
+        self.check_cancelled()
+
+    @property
+    def cancelled(self):
+        return bool(self.state.get("cancel_requested"))
+
+    def check_cancelled(self):
+        if self.cancelled:
+            raise JobCancelled()
+
+
+def _run_job(fn, args, kwargs, state):
+    """Pembungkus yang dijalankan worker: tandai status running lalu panggil fn dengan progress."""
+    progress = JobProgress(state)
+    progress.check_cancelled()
+    state.update({"status": "running", "started_at": time.time()})
+    return fn(*args, progress=progress, **kwargs)
+
+
+class JobManager:
+    """
+    Antrian job latar belakang lokal untuk pemeriksaan panjang.
+    Setiap job mendapat id, status ("queued", "running", "done", "failed", "cancelled"),
+    progres yang dapat di-poll, pembatalan kooperatif dan hasil yang disimpan selama
+    retention_seconds setelah selesai sehingga UI dapat menyambung kembali ke job
+    yang sama setelah rerun. Dengan executor "process" job berjalan di process pool
+    (start method spawn, aman untuk server multi-thread) dan progres dibagikan lewat
+    multiprocessing.Manager; executor "thread" memakai thread pool tanpa proses tambahan.
+    """
+
+    def __init__(self, max_workers=None, executor=None, retention_seconds=None):
+        self.max_workers = max_workers or DEFAULT_JOB_WORKERS
+        self.executor_kind = executor or DEFAULT_JOB_EXECUTOR
+        self.retention_seconds = DEFAULT_JOB_RETENTION_SECONDS if retention_seconds is None else retention_seconds
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._manager = None
+        if self.executor_kind == "process":
+            context = multiprocessing.get_context("spawn")
+            self._manager = context.Manager()
+            self._executor = concurrent.futures.ProcessPoolExecutor(max_workers=self.max_workers, mp_context=context)
+        elif self.executor_kind == "thread":
+            self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="citara-job")
+        else:
+            raise ValueError(f"Executor job tidak dikenal: {self.executor_kind}. Pilihan: process, thread")
+
+    def submit(self, fn, *args, **kwargs):
+        """
+        Jadwalkan fn(*args, progress=JobProgress, **kwargs). Untuk executor proses, fn dan
+        argumennya harus dapat di-pickle (fungsi level modul). Returns: id job.
+        """
+        self.purge()
+        job_id = uuid.uuid4().hex
+        state = self._manager.dict() if self._manager is not None else {}
+        state.update({"status": "queued", "done": 0, "total": 0, "message": "", "cancel_requested": False})
+        job = {"id": job_id, "state": state, "submitted_at": time.time(), "finished_at": None,
+               "status": None, "result": None, "error": None}
+        with self._lock:
+            self._jobs[job_id] = job
+        job["future"] = self._executor.submit(_run_job, fn, args, kwargs, state)
+        job["future"].add_done_callback(lambda future, job=job: self._finish(job, future))
+        return job_id
+
+    def _finish(self, job, future):
+        if future.cancelled():
+            status, result, error = "cancelled", None, None
+        else:
+            error = future.exception()
+            result = future.result() if error is None else None
+            if isinstance(error, JobCancelled):
+                status, error = "cancelled", None
+            elif error is not None:
+                status = "failed"
+                logging.error(f"Job {job['id']} gagal: {error!r}")
+            else:
+                status = "done"
+        with self._lock:
+            job.update({"status": status, "result": result, "error": error, "finished_at": time.time()})
+
+    def _get(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is None:
+            raise KeyError(f"Job tidak ditemukan atau sudah kedaluwarsa: {job_id}")
+        return job
+
+    def status(self, job_id):
+        """Status job saat ini: dict {id, status, done, total, message, error, submitted_at, started_at, finished_at}."""
+        job = self._get(job_id)
+        try:
+            state = job["state"].copy()
+        except Exception:  # Manager sudah berhenti (shutdown)
+            state = {}
+        status = job["status"] or state.get("status", "queued")
+        if status == "queued" and state.get("cancel_requested"):
+            status = "cancelling"
+        return {
+            "id": job_id,
+            "status": status,
+            "done": state.get("done", 0),
+            "total": state.get("total", 0),
+            "message": state.get("message", ""),
+            "error": None if job["error"] is None else f"{type(job['error']).__name__}: {job['error']}",
+            "submitted_at": job["submitted_at"],
+            "started_at": state.get("started_at"),
+            "finished_at": job["finished_at"],
+        }
+
+    def result(self, job_id, timeout=None):
+        """Tunggu dan ambil hasil job. Melempar JobCancelled jika dibatalkan atau exception asli jika gagal."""
+        job = self._get(job_id)
+        try:
+            return job["future"].result(timeout=timeout)
+        except concurrent.futures.CancelledError:
+            raise JobCancelled() from None
+
+    def cancel(self, job_id):
+        """
+        Minta pembatalan job. Job yang masih antre langsung dibatalkan; job yang berjalan
+        berhenti pada panggilan progress berikutnya. Returns: False jika job sudah selesai.
+        """
+        job = self._get(job_id)
+        if job["status"] in TERMINAL_STATUSES:
+            return False
+        job["state"]["cancel_requested"] = True
+        job["future"].cancel()
+        return True
+
+    def jobs(self):
+        """Status semua job yang masih disimpan, urut waktu submit."""
+        with self._lock:
+            job_ids = sorted(self._jobs, key=lambda job_id: self._jobs[job_id]["submitted_at"])
+        return [self.status(job_id) for job_id in job_ids]
+
+    def purge(self, now=None):
+        """Buang job selesai yang lebih tua dari retention_seconds. Returns: jumlah job yang dibuang."""
+        now = time.time() if now is None else now
+        with self._lock:
+            expired = [
+                job_id for job_id, job in self._jobs.items()
+                if job["finished_at"] is not None and now - job["finished_at"] > self.retention_seconds
+            ]
+            for job_id in expired:
+                del self._jobs[job_id]
+        return len(expired)
+
+    def shutdown(self, wait=True, cancel_pending=False):
+        if cancel_pending:
+            with self._lock:
+                jobs = list(self._jobs.values())
+            for job in jobs:
+                if job["status"] is None:
+                    job["state"]["cancel_requested"] = True
+        self._executor.shutdown(wait=wait, cancel_futures=cancel_pending)
+        if self._manager is not None:
+            self._manager.shutdown()
+
+
+def get_job_manager():
+    """Instance JobManager bersama untuk seluruh proses server (dipakai semua sesi)."""
+    global _default_manager
+    if _default_manager is None:
+        with _default_manager_lock:
+            if _default_manager is None:
+                _default_manager = JobManager()
+    return _default_manager
@@ -0,0 +1,166 @@
+import numpy as np
+
+
+class MatchResults:
+    """
+    Penyimpan hasil pencocokan kolumnar.
+    Kolom halaman, skor dan offset unit disimpan sebagai array NumPy; teks tidak
+    disalin melainkan dirujuk lewat offset ke list unit sumber (units). Untuk
+    hasil lintas unit, spans menyimpan jumlah unit yang digabung per hasil.
+    Iterasi dan indeks integer menghasilkan tuple (page, teks, skor) atau
+    (dokumen, page, teks, skor) seperti format lama, sehingga kode lama tetap jalan.
+    """
+
+    __slots__ = ("units", "pages", "unit_ids", "scores", "spans", "docs", "doc_names")
+
+    def __init__(self, units, pages, unit_ids, scores, spans=None, docs=None, doc_names=None):
+        self.units = units
+        self.pages = np.asarray(pages)
+        self.unit_ids = np.asarray(unit_ids, dtype=np.int64)
+        self.scores = np.asarray(scores, dtype=np.float64)
+        self.spans = None if spans is None else np.asarray(spans, dtype=np.int32)
+        self.docs = None if docs is None else np.asarray(docs, dtype=np.int32)
+        self.doc_names = doc_names
+
+    @classmethod
+    def empty(cls, units=()):
+        return cls(units, np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float64))
+
+    @classmethod
+    def from_scores(cls, units, unit_pages, scores, similarity_threshold, start=0):
+        """
+        Bentuk hasil dari skor rentang unit units[start:start+len(scores)] yang >= threshold.
+        unit_pages sebaiknya array NumPy halaman per unit (dibuat sekali per sumber).
+        """
+        keep = np.nonzero(np.asarray(scores) >= similarity_threshold)[0]
+        ids = keep + start
+        return cls(units, np.asarray(unit_pages)[ids], ids, np.asarray(scores)[keep])
+
+    @classmethod
+    def from_tuples(cls, matches):
+        """Konversi list (page, teks, skor) / (dokumen, page, teks, skor) ke MatchResults."""
+        if isinstance(matches, MatchResults):
+            return matches
+        matches = list(matches)
+        if not matches:
+            return cls.empty([])
+        texts = [m[-2] for m in matches]
+        result = cls(texts, [m[-3] for m in matches], np.arange(len(matches)), [m[-1] for m in matches])
+        if len(matches[0]) == 4:
+            doc_names = list(dict.fromkeys(m[0] for m in matches))
+            position = {name: i for i, name in enumerate(doc_names)}
+            result.docs = np.asarray([position[m[0]] for m in matches], dtype=np.int32)
+            result.doc_names = doc_names
+        return result
+
+    @classmethod
+    def concat(cls, results):
+        """Gabungkan beberapa MatchResults; jika semua merujuk list unit yang sama, teks tidak disalin."""
+        results = [cls.from_tuples(r) for r in results]
+        results = [r for r in results if len(r)] or results[:1]
+        if not results:
+            return cls.empty([])
+        if len(results) == 1:
+            return results[0]
+        if any(r.units is not results[0].units for r in results):
+            # Sumber berbeda: hanya teks yang dirujuk yang disalin
+            results = [r.compact() for r in results]
+            units, offsets = [], []
+            for r in results:
+                offsets.append(len(units))
+                units.extend(r.units)
+        else:
+            units, offsets = results[0].units, [0] * len(results)
+        spans = None
+        if any(r.spans is not None for r in results):
+            spans = np.concatenate([r.spans if r.spans is not None else np.ones(len(r), dtype=np.int32) for r in results])
+        docs, doc_names = None, None
+        if any(r.docs is not None for r in results):
+            doc_names = list(dict.fromkeys(name for r in results for name in (r.doc_names or [])))
+            position = {name: i for i, name in enumerate(doc_names)}
+            docs = np.concatenate([
+                np.asarray([position[name] for name in r.doc_names], dtype=np.int32)[r.docs]
+                if r.docs is not None else np.full(len(r), -1, dtype=np.int32)
+                for r in results
+            ])
+        return cls(
+            units,
+            np.concatenate([r.pages for r in results]),
+            np.concatenate([r.unit_ids + offset for r, offset in zip(results, offsets)]),
+            np.concatenate([r.scores for r in results]),
+            spans, docs, doc_names,
+        )
+
+    def __len__(self):
+        return len(self.scores)
+
+    def __bool__(self):
+        return len(self.scores) > 0
+
+    def text(self, i):
+        """Teks hasil ke-i (gabungan beberapa unit untuk hasil lintas unit)."""
+        start = int(self.unit_ids[i])
+        span = 1 if self.spans is None else int(self.spans[i])
+        return self.units[start] if span == 1 else " ".join(self.units[start:start + span])
+
+    def _page(self, i):
+        page = self.pages[i]
+        return page.item() if hasattr(page, "item") else page
+
+    def _row(self, i):
+        row = (self._page(i), self.text(i), float(self.scores[i]))
+        if self.docs is not None:
+            return (self.doc_names[self.docs[i]],) + row
+        return row
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self._row(i)
+
+    def __getitem__(self, key):
+        if isinstance(key, (int, np.integer)):
+            return self._row(range(len(self))[key])
+        return self.take(np.arange(len(self))[key])
+
+    def take(self, indices):
+        """Ambil subset hasil berdasarkan array indeks (tanpa menyalin teks)."""
+        indices = np.asarray(indices, dtype=np.int64)
+        return MatchResults(
+            self.units, self.pages[indices], self.unit_ids[indices], self.scores[indices],
+            None if self.spans is None else self.spans[indices],
+            None if self.docs is None else self.docs[indices],
+            self.doc_names,
+        )
+
+    def compact(self):
+        """
+        Salinan yang hanya menyimpan teks hasil (bukan seluruh unit sumber), misal sebelum
+        dikirim antar proses atau disimpan lama. Hasil lintas unit disimpan sebagai teks gabungan.
+        """
+        return MatchResults([self.text(i) for i in range(len(self))], self.pages, np.arange(len(self)), self.scores,
+                            None, self.docs, self.doc_names)
+
+    def filter(self, similarity_threshold):
+        """Hasil dengan skor >= threshold."""
+        return self.take(np.nonzero(self.scores >= similarity_threshold)[0])
+
+    def sort_by_score(self):
+        """Urutkan skor menurun (stabil: urutan asli dipertahankan untuk skor sama)."""
+        return self.take(np.argsort(-self.scores, kind="stable"))
+
+    def sort_by_page(self):
+        """Urutkan berdasarkan (dokumen, halaman) menaik, stabil."""
+        if self.docs is None:
+            return self.take(np.argsort(self.pages, kind="stable"))
+        doc_rank = np.argsort(np.argsort(np.asarray(self.doc_names, dtype=object), kind="stable"))
+        return self.take(np.lexsort((self.pages, doc_rank[self.docs])))
+
+    def top_k(self, k):
+        """k hasil dengan skor tertinggi, terurut menurun."""
+        if k >= len(self):
+            return self.sort_by_score()
+        idx = np.argpartition(-self.scores, k - 1)[:k]
+        return self.take(idx[np.argsort(-self.scores[idx], kind="stable")])
+
+    def to_list(self):
+        return list(self)
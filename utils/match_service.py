@@ -0,0 +1,455 @@
+import base64
+import binascii
+import concurrent.futures
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from utils.embedding_cache import compute_file_hash
+
+# Micro-batching: request match yang datang bersamaan digabung sampai SERVICE_MAX_BATCH sitasi
+# atau SERVICE_BATCH_WAIT_MS berlalu sejak request pertama, lalu di-encode dalam satu panggilan
+SERVICE_MAX_BATCH = int(os.getenv("CITARA_SERVICE_MAX_BATCH", "32"))
+SERVICE_BATCH_WAIT_MS = float(os.getenv("CITARA_SERVICE_BATCH_WAIT_MS", "5"))
+# Backpressure: antrian match dan jumlah request aktif dibatasi; kelebihannya dijawab 503
+SERVICE_QUEUE_SIZE = int(os.getenv("CITARA_SERVICE_QUEUE_SIZE", "128"))
+SERVICE_MAX_INFLIGHT = int(os.getenv("CITARA_SERVICE_MAX_INFLIGHT", "64"))
+# Jumlah maksimum ekstraksi/terjemahan/highlight yang berjalan bersamaan
+SERVICE_MAX_CONCURRENCY = int(os.getenv("CITARA_SERVICE_MAX_CONCURRENCY", "0")) or (os.cpu_count() or 1)
+SERVICE_MAX_SOURCES = int(os.getenv("CITARA_SERVICE_MAX_SOURCES", "32"))
+SERVICE_MAX_BODY_MB = float(os.getenv("CITARA_SERVICE_MAX_BODY_MB", "32"))
+SERVICE_TIMEOUT_SECONDS = float(os.getenv("CITARA_SERVICE_TIMEOUT_SECONDS", "120"))
+
+METHOD_LABELS = {"semantic": "Semantic", "tfidf": "TF-IDF", "minhash": "MinHash"}
+UNIT_MODES = ("sentence", "paragraph")
+
+
+class ServiceBusy(Exception):
+    """Antrian penuh atau batas request aktif tercapai; klien diminta mencoba lagi (HTTP 503)."""
+
+
+class UnknownSource(Exception):
+    """source_id tidak ada (belum diunggah atau sudah tergeser LRU); klien diminta unggah ulang (HTTP 404)."""
+
+
+class MatchBatcher:
+    """
+    Penggabung request match (micro-batching) dengan satu thread worker.
+    submit() memasukkan item ke antrian berbatas; worker mengambil item pertama, menunggu
+    paling lama max_wait_ms untuk item berikutnya (maks. max_batch), mengelompokkan item
+    per key lalu memanggil run_batch(key, items) sekali per kelompok. Satu worker berarti
+    encode berjalan berurutan, sehingga CPU tidak diperebutkan banyak request sekaligus.
+    """
+
+    def __init__(self, run_batch, max_batch=None, max_wait_ms=None, queue_size=None):
+        self.run_batch = run_batch
+        self.max_batch = max_batch or SERVICE_MAX_BATCH
+        self.max_wait = (SERVICE_BATCH_WAIT_MS if max_wait_ms is None else max_wait_ms) / 1000.0
+        self._queue = queue.Queue(maxsize=queue_size or SERVICE_QUEUE_SIZE)
+        self._lock = threading.Lock()
+        self.batches = self.items = self.largest_batch = self.rejected = 0
+        self._worker = threading.Thread(target=self._loop, name="citara-match-batcher", daemon=True)
+        self._worker.start()
+
+    def submit(self, key, item):
+        """Masukkan item tanpa menunggu slot antrian. Returns: Future hasil. Melempar ServiceBusy jika penuh."""
+        future = concurrent.futures.Future()
+        try:
+            self._queue.put_nowait((key, item, future))
+        except queue.Full:
+            with self._lock:
+                self.rejected += 1
+            raise ServiceBusy("Antrian pencocokan penuh, coba lagi sebentar lagi.")
+        return future
+
+    def pending(self):
+        return self._queue.qsize()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "batches": self.batches,
+                "items": self.items,
+                "largest_batch": self.largest_batch,
+                "mean_batch": round(self.items / self.batches, 2) if self.batches else None,
+                "pending": self.pending(),
+                "rejected": self.rejected,
+            }
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            try:
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _loop(self):
+        while True:
+            batch = self._collect()
+            with self._lock:
+                self.batches += 1
+                self.items += len(batch)
+                self.largest_batch = max(self.largest_batch, len(batch))
+            groups = OrderedDict()
+            for key, item, future in batch:
+                if future.set_running_or_notify_cancel():
+                    groups.setdefault(key, []).append((item, future))
+            for key, entries in groups.items():
+                try:
+                    results = self.run_batch(key, [item for item, _ in entries])
+                    for (_, future), result in zip(entries, results):
+                        future.set_result(result)
+                except Exception as e:
+                    logging.exception("Batch pencocokan gagal")
+                    for _, future in entries:
+                        future.set_exception(e)
+
+
+def _decode_source(payload):
+    name = payload.get("name") or ""
+    try:
+        data = base64.b64decode(payload.get("data") or "", validate=True)
+    except (binascii.Error, ValueError):
+        raise ValueError("Field 'data' harus berisi file sumber dalam base64.")
+    if not name or not data:
+        raise ValueError("Sumber membutuhkan field 'name' (misal buku.pdf) dan 'data' (base64).")
+    return name, data
+
+
+def _unit_mode(payload):
+    unit_mode = payload.get("mode", "sentence")
+    if unit_mode not in UNIT_MODES:
+        raise ValueError(f"Mode tidak dikenal: {unit_mode}. Pilihan: {', '.join(UNIT_MODES)}")
+    return unit_mode
+
+
+class MatchService:
+    """
+    Layanan pencocokan headless di atas fungsi utils yang sama dengan aplikasi Streamlit.
+    Sumber diunggah sekali (extract) lalu dirujuk dengan source_id (hash file); hasil
+    ekstraksi per mode unit disimpan di memori (LRU) dan embedding unit di cache embedding.
+    Request match dikumpulkan MatchBatcher sehingga sitasi yang datang bersamaan untuk
+    sumber yang sama di-encode dalam satu panggilan dan diskor dengan satu perkalian matriks.
+    """
+
+    def __init__(self, max_batch=None, max_wait_ms=None, queue_size=None, max_concurrency=None,
+                 max_inflight=None, max_sources=None, timeout=None):
+        self.max_sources = max_sources or SERVICE_MAX_SOURCES
+        self.timeout = timeout or SERVICE_TIMEOUT_SECONDS
+        self._sources = OrderedDict()
+        self._sources_lock = threading.Lock()
+        # PyMuPDF tidak aman dipakai beberapa thread sekaligus: ekstraksi/highlight PDF berurutan
+        self._pdf_lock = threading.Lock()
+        self._compute = threading.BoundedSemaphore(max_concurrency or SERVICE_MAX_CONCURRENCY)
+        self._inflight = threading.BoundedSemaphore(max_inflight or SERVICE_MAX_INFLIGHT)
+        self.batcher = MatchBatcher(self._run_match_batch, max_batch, max_wait_ms, queue_size)
+        self.started_at = time.time()
+        self.rejected = 0
+
+    def warmup(self):
+        """Muat model semantic dan tokenizer kalimat sekali sebelum menerima request."""
+        from utils.semantic_utils import warmup_semantic_model
+        from utils.text_segmentation import ensure_punkt
+        ensure_punkt()
+        warmup_semantic_model()
+
+    # --- batas concurrency ---
+
+    def try_enter(self):
+        """Ambil slot request aktif; melempar ServiceBusy jika semua slot terpakai."""
+        if not self._inflight.acquire(blocking=False):
+            self.rejected += 1
+            raise ServiceBusy("Terlalu banyak request aktif, coba lagi sebentar lagi.")
+
+    def leave(self):
+        self._inflight.release()
+
+    def _bounded(self, fn, *args):
+        """Jalankan pekerjaan berat (ekstraksi, terjemahan, highlight) dalam batas SERVICE_MAX_CONCURRENCY."""
+        if not self._compute.acquire(timeout=self.timeout):
+            self.rejected += 1
+            raise ServiceBusy("Semua worker sibuk, coba lagi sebentar lagi.")
+        try:
+            return fn(*args)
+        finally:
+            self._compute.release()
+
+    # --- penyimpanan sumber ---
+
+    def add_source(self, name, data):
+        """Simpan file sumber di memori. Returns: source_id (hash SHA-256 isi file)."""
+        if os.path.splitext(name)[1].lower() not in (".pdf", ".docx"):
+            raise ValueError("Format file sumber tidak didukung. Hanya PDF dan Word (.docx).")
+        source_id = compute_file_hash(data)
+        with self._sources_lock:
+            entry = self._sources.get(source_id)
+            if entry is None:
+                entry = self._sources[source_id] = {"name": name, "data": data, "by_mode": {}, "prepared": {}}
+            self._sources.move_to_end(source_id)
+            while len(self._sources) > self.max_sources:
+                self._sources.popitem(last=False)
+        return source_id
+
+    def _entry(self, source_id):
+        with self._sources_lock:
+            entry = self._sources.get(source_id)
+            if entry is None:
+                raise UnknownSource(source_id)
+            self._sources.move_to_end(source_id)
+            return entry
+
+    def _extracted(self, source_id, unit_mode):
+        """Sumber dalam format load_sources (name, pages_text, source_key, page_labels), diekstrak sekali per mode."""
+        entry = self._entry(source_id)
+        source = entry["by_mode"].get(unit_mode)
+        if source is None:
+            source = self._bounded(self._extract, entry, source_id, unit_mode)
+            source = entry["by_mode"].setdefault(unit_mode, source)
+        return source
+
+    def _prepared(self, source_id, unit_mode, method):
+        """
+        Unit sumber siap skor (prepare_sources) yang tinggal di memori per (source_id, mode, metode):
+        unit di-split, embedding float32 dimuat dari cache (atau di-encode) dan TF-IDF di-fit sekali,
+        bukan setiap batch. Ikut terbuang saat sumber tergeser LRU.
+        """
+        from utils.batch_utils import prepare_sources
+        entry = self._entry(source_id)
+        prepared = entry["prepared"].get((unit_mode, method))
+        if prepared is None:
+            prepared = prepare_sources([self._extracted(source_id, unit_mode)], unit_mode, method)
+            prepared = entry["prepared"].setdefault((unit_mode, method), prepared)
+        return prepared
+
+    def _extract(self, entry, source_id, unit_mode):
+        from utils.source_library import extract_source_pages
+        page_labels = {}
+        with self._pdf_lock:
+            pages_text, extraction_mode = extract_source_pages(entry["data"], entry["name"], unit_mode, page_labels=page_labels)
+        if not pages_text:
+            raise ValueError("Tidak dapat mengekstrak teks dari file sumber.")
+        return {
+            "name": entry["name"],
+            "pages_text": pages_text,
+            "source_key": (source_id, extraction_mode),
+            "page_labels": page_labels,
+        }
+
+    def _source_id(self, payload):
+        if payload.get("source_id"):
+            return payload["source_id"]
+        return self.add_source(*_decode_source(payload))
+
+    # --- endpoint ---
+
+    def extract(self, payload):
+        """POST /extract {name, data (base64), mode} -> {source_id, name, mode, pages, page_labels}."""
+        unit_mode = _unit_mode(payload)
+        source_id = self._source_id(payload)
+        source = self._extracted(source_id, unit_mode)
+        return {
+            "source_id": source_id,
+            "name": source["name"],
+            "mode": unit_mode,
+            "pages": len(source["pages_text"]),
+            "page_labels": {str(page): label for page, label in source["page_labels"].items()},
+        }
+
+    def translate(self, payload):
+        """POST /translate {text, citation_lang, source_lang, use_local, method} -> {text, info}."""
+        text, info = self._translate(payload, payload.get("text") or "")
+        return {"text": text, "info": info}
+
+    def _translate(self, payload, text):
+        from utils.check_pipeline import skips_translation, translate_citation
+        citation_lang = payload.get("citation_lang")
+        source_lang = payload.get("source_lang") or citation_lang
+        if not text.strip():
+            raise ValueError("Teks sitasi kosong.")
+        if not citation_lang or citation_lang == source_lang:
+            return text, "(Tidak perlu translasi, bahasa sama)"
+        method = payload.get("method", "semantic")
+        multilingual = skips_translation({"method": METHOD_LABELS.get(method, method)})
+        return self._bounded(translate_citation, text, citation_lang, source_lang, bool(payload.get("use_local")), multilingual)
+
+    def match(self, payload):
+        """
+        POST /match {citation, source_id | (name, data), mode, method, threshold, top_k,
+        citation_lang, source_lang, use_local} -> {citation, citation_for_compare,
+        translation_info, matches: [{source, page, text, score, section?}], batch_size}.
+        """
+        unit_mode = _unit_mode(payload)
+        method = payload.get("method", "semantic")
+        if method not in METHOD_LABELS:
+            raise ValueError(f"Metode tidak dikenal: {method}. Pilihan: {', '.join(METHOD_LABELS)}")
+        citation = payload.get("citation") or ""
+        citation_for_compare, translation_info = self._translate(payload, citation)
+        source_id = self._source_id(payload)
+        self._extracted(source_id, unit_mode)
+        item = {
+            "text": citation_for_compare,
+            "threshold": float(payload.get("threshold", 0.6)),
+            "top_k": int(payload["top_k"]) if payload.get("top_k") else None,
+        }
+        future = self.batcher.submit((source_id, unit_mode, method), item)
+        try:
+            result = future.result(timeout=self.timeout)
+        except concurrent.futures.TimeoutError:
+            future.cancel()
+            raise TimeoutError("Pencocokan melebihi batas waktu layanan.")
+        return dict(result, citation=citation, citation_for_compare=citation_for_compare, translation_info=translation_info)
+
+    def _run_match_batch(self, key, items):
+        """
+        Satu panggilan check_citations_batch untuk semua sitasi di kelompok (source_id, mode, metode)
+        atas unit sumber yang sudah disiapkan (_prepared): per batch hanya sitasi yang di-encode.
+        Metode tfidf memakai vectorizer yang di-fit atas unit sumber, sehingga skor tidak
+        bergantung pada sitasi lain yang kebetulan masuk batch yang sama.
+        """
+        from utils.batch_utils import check_citations_batch
+        source_id, unit_mode, method = key
+        source = self._extracted(source_id, unit_mode)
+        results = check_citations_batch(
+            [{"id": str(i), "text": item["text"]} for i, item in enumerate(items)], [source],
+            unit_mode=unit_mode, method=method, similarity_threshold=min(item["threshold"] for item in items),
+            prepared=self._prepared(source_id, unit_mode, method)
+        )
+        outputs = []
+        for item, result in zip(items, results):
+            matches = sorted((m for m in result["matches"] if m["score"] >= item["threshold"]), key=lambda m: -m["score"])
+            outputs.append({"matches": matches[:item["top_k"]], "batch_size": len(items)})
+        return outputs
+
+    def highlight(self, payload):
+        """POST /highlight {source_id, matches: [{page, text, score}]} -> bytes PDF dengan highlight."""
+        from utils.pdf_utils import highlight_matches_in_pdf
+        entry = self._entry(payload.get("source_id"))
+        if not entry["name"].lower().endswith(".pdf"):
+            raise ValueError("Highlight hanya tersedia untuk sumber PDF.")
+        try:
+            matches = [(int(m["page"]), str(m["text"]), float(m.get("score", 0.0))) for m in payload.get("matches") or []]
+        except (KeyError, TypeError, ValueError, AttributeError):
+            raise ValueError("Setiap match membutuhkan field 'page' (angka), 'text' dan opsional 'score' (angka).")
+
+        def run():
+            with self._pdf_lock:
+                try:
+                    return highlight_matches_in_pdf(entry["data"], matches, quick_save=bool(payload.get("quick_save")))
+                except Exception as e:
+                    # Kegagalan membuat PDF adalah error server (500), bukan payload tidak valid (400)
+                    raise RuntimeError(f"Gagal membuat PDF dengan highlight: {e}") from e
+        return self._bounded(run)
+
+    def health(self):
+        from utils.semantic_utils import embedding_model_id
+        return {
+            "status": "ok",
+            "uptime_seconds": round(time.time() - self.started_at, 1),
+            "embedding_model": embedding_model_id(),
+            "sources": len(self._sources),
+            "rejected": self.rejected,
+            "batcher": self.batcher.stats(),
+        }
+
+
+class _ServiceHandler(BaseHTTPRequestHandler):
+    """Handler JSON: POST /extract, /translate, /match, /highlight; GET /health."""
+
+    protocol_version = "HTTP/1.1"
+    service = None
+    max_body = int(SERVICE_MAX_BODY_MB * 1024 * 1024)
+
+    def log_message(self, format, *args):
+        logging.debug("%s - %s", self.address_string(), format % args)
+
+    def _send(self, status, body, content_type="application/json", headers=None):
+        if content_type == "application/json":
+            body = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path.split("?", 1)[0] == "/health":
+            self._send(200, self.service.health())
+        else:
+            self._send(404, {"error": f"Endpoint tidak ditemukan: {self.path}"})
+
+    def do_POST(self):
+        routes = {
+            "/extract": self.service.extract,
+            "/translate": self.service.translate,
+            "/match": self.service.match,
+            "/highlight": self.service.highlight,
+        }
+        handler = routes.get(self.path.split("?", 1)[0])
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+        except ValueError:
+            length = -1
+        if handler is None or length < 0 or length > self.max_body:
+            # Body tidak dibaca: tutup koneksi agar sisa data tidak terbaca sebagai request berikutnya
+            self.close_connection = True
+            if handler is None:
+                self._send(404, {"error": f"Endpoint tidak ditemukan: {self.path}"})
+            elif length < 0:
+                self._send(400, {"error": "Header Content-Length tidak valid."})
+            else:
+                self._send(413, {"error": f"Body melebihi {SERVICE_MAX_BODY_MB:g} MB."})
+            return
+        try:
+            payload = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            payload = None
+        if not isinstance(payload, dict):
+            self._send(400, {"error": "Body harus berupa objek JSON."})
+            return
+        try:
+            self.service.try_enter()
+        except ServiceBusy as e:
+            self._send(503, {"error": str(e)}, headers={"Retry-After": "1"})
+            return
+        try:
+            result = handler(payload)
+        except ServiceBusy as e:
+            self._send(503, {"error": str(e)}, headers={"Retry-After": "1"})
+        except UnknownSource:
+            self._send(404, {"error": "source_id tidak dikenal; unggah ulang sumber lewat /extract."})
+        except KeyError as e:
+            self._send(400, {"error": f"Field wajib tidak ada: {e}"})
+        except ValueError as e:
+            self._send(400, {"error": str(e)})
+        except TimeoutError as e:
+            self._send(504, {"error": str(e)})
+        except Exception as e:
+            logging.exception("Request %s gagal", self.path)
+            self._send(500, {"error": f"{type(e).__name__}: {e}"})
+        else:
+            if isinstance(result, bytes):
+                self._send(200, result, content_type="application/pdf")
+            else:
+                self._send(200, result)
+        finally:
+            self.service.leave()
+
+
+def make_server(service, host="127.0.0.1", port=8765):
+    """Buat ThreadingHTTPServer untuk service (port 0 = pilih port bebas). Jalankan dengan serve_forever()."""
+    handler = type("CitaraServiceHandler", (_ServiceHandler,), {"service": service})
+    # Backlog listen lebih besar dari default (5) agar lonjakan koneksi tidak ditolak kernel;
+    # pembatasan beban dilakukan di aplikasi (503 + Retry-After)
+    server_class = type("CitaraServer", (ThreadingHTTPServer,), {"request_queue_size": 128, "daemon_threads": True})
+    return server_class((host, port), handler)
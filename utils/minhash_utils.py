@@ -0,0 +1,289 @@
+import difflib
+import functools
+import os
+import re
+import threading
+import zlib
+from collections import OrderedDict
+
+import numpy as np
+
+from utils.profiling import count, span
+
+# Konfigurasi shingle default, format "<word|char>:<k>" (misal "word:3" atau "char:5")
+DEFAULT_SHINGLE = os.getenv("CITARA_MINHASH_SHINGLE", "word:3")
+DEFAULT_NUM_PERM = int(os.getenv("CITARA_MINHASH_PERM", "128"))
+MINHASH_INDEX_CACHE_SIZE = 8
+
+# Hash multiply-shift: ((a*x + b) mod 2^64) >> 32, tanpa operasi modulo yang mahal
+_SHIFT = np.uint64(32)
+_TOKEN_RE = re.compile(r'\w+')
+# Jumlah shingle per blok saat menghitung signature (membatasi matriks num_perm x shingle)
+_SIGNATURE_CHUNK = 1 << 16
+
+_index_cache = OrderedDict()
+_index_cache_lock = threading.Lock()
+
+
+def parse_shingle(shingle):
+    """Parse "word:3"/"char:5" menjadi (jenis, k)."""
+    kind, _, k = (shingle or DEFAULT_SHINGLE).partition(":")
+    if kind not in ("word", "char"):
+        raise ValueError(f"Jenis shingle tidak dikenal: {kind}. Pilihan: word, char")
+    return kind, int(k or (3 if kind == "word" else 5))
+
+
+def tokenize(text):
+    """Token kata huruf kecil (tanpa tanda baca) untuk shingle dan pencarian salinan persis."""
+    return _TOKEN_RE.findall(text.lower())
+
+
+def shingles(text, shingle=None):
+    """
+    Himpunan shingle teks: k kata berurutan ("word:k") atau k karakter berurutan dari
+    teks ternormalisasi ("char:k"). Teks yang lebih pendek dari k menjadi satu shingle.
+    """
+    kind, k = parse_shingle(shingle)
+    if kind == "word":
+        tokens = tokenize(text)
+        if len(tokens) <= k:
+            return {" ".join(tokens)}
+        return {" ".join(tokens[i:i + k]) for i in range(len(tokens) - k + 1)}
+    normalized = " ".join(tokenize(text))
+    if len(normalized) <= k:
+        return {normalized}
+    return {normalized[i:i + k] for i in range(len(normalized) - k + 1)}
+
+
+def _crc32(text):
+    return zlib.crc32(text.encode("utf-8"))
+
+
+class MinHasher:
+    """
+    Signature MinHash num_perm nilai per teks dengan num_perm fungsi hash multiply-shift.
+    Signature banyak teks dihitung tervektorisasi: hash shingle semua teks digabung dalam
+    satu array lalu minimum per teks diambil dengan np.minimum.reduceat. Untuk shingle
+    kata, hash shingle dibentuk dari hash token (dihitung sekali per kata unik) dengan
+    kombinasi linier NumPy, tanpa membentuk string shingle.
+    """
+
+    def __init__(self, num_perm=None, shingle=None, seed=1):
+        self.num_perm = num_perm or DEFAULT_NUM_PERM
+        self.shingle = shingle or DEFAULT_SHINGLE
+        self.kind, self.k = parse_shingle(self.shingle)
+        rng = np.random.default_rng(seed)
+        self._a = (rng.integers(0, 1 << 63, self.num_perm, dtype=np.uint64) << np.uint64(1) | np.uint64(1)).reshape(-1, 1)
+        self._b = rng.integers(0, 1 << 63, self.num_perm, dtype=np.uint64).reshape(-1, 1)
+        self._position_weights = rng.integers(0, 1 << 63, self.k, dtype=np.uint64) << np.uint64(1) | np.uint64(1)
+        self._token_hashes = {}
+
+    def _word_shingle_hashes(self, texts):
+        """Hash shingle k kata untuk semua teks. Returns: (array uint64 hash, list jumlah shingle per teks)."""
+        token_hashes = self._token_hashes
+        ids, lengths = [], []
+        for text in texts:
+            tokens = tokenize(text)
+            for token in tokens:
+                value = token_hashes.get(token)
+                if value is None:
+                    value = token_hashes[token] = _crc32(token)
+                ids.append(value)
+            lengths.append(len(tokens))
+        k = self.k
+        hashes = np.asarray(ids, dtype=np.uint64)
+        # Kombinasi linier hash token per posisi window (overflow uint64 = hashing)
+        padded = np.concatenate([hashes, np.zeros(k, dtype=np.uint64)])
+        windows = np.zeros(len(hashes), dtype=np.uint64)
+        for j in range(k):
+            windows += padded[j:j + len(hashes)] * self._position_weights[j]
+        lengths = np.asarray(lengths, dtype=np.int64)
+        starts = np.cumsum(lengths) - lengths
+        counts = np.maximum(lengths - k + 1, 1)
+        first = np.cumsum(counts) - counts
+        positions = np.repeat(starts, counts) + np.arange(counts.sum()) - np.repeat(first, counts)
+        values = np.append(windows, np.uint64(0))[positions]
+        # Teks dengan < k kata menjadi satu shingle berisi seluruh katanya; teks tanpa kata bernilai 0
+        for i in np.nonzero(lengths < k)[0]:
+            window = hashes[starts[i]:starts[i] + lengths[i]] * self._position_weights[:lengths[i]]
+            values[first[i]] = window.sum(dtype=np.uint64)
+        return values, counts
+
+    def _char_shingle_hashes(self, texts):
+        values, counts = [], []
+        for text in texts:
+            hashed = [_crc32(s) for s in shingles(text, self.shingle)]
+            values.extend(hashed)
+            counts.append(len(hashed))
+        return np.asarray(values, dtype=np.uint64), np.asarray(counts, dtype=np.int64)
+
+    def signatures(self, texts):
+        """Signature untuk list teks. Returns: array uint32 (len(texts), num_perm)."""
+        result = np.empty((len(texts), self.num_perm), dtype=np.uint32)
+        if not len(texts):
+            return result
+        if self.kind == "word":
+            values, counts = self._word_shingle_hashes(texts)
+        else:
+            values, counts = self._char_shingle_hashes(texts)
+        offsets = np.concatenate([[0], np.cumsum(counts)])
+        # Blok teks berurutan sehingga matriks hash num_perm x shingle per blok tetap kecil
+        start = 0
+        while start < len(texts):
+            end = int(np.searchsorted(offsets, offsets[start] + _SIGNATURE_CHUNK, side="right")) - 1
+            end = min(max(end, start + 1), len(texts))
+            lo, hi = offsets[start], offsets[end]
+            permuted = (self._a * values[lo:hi] + self._b) >> _SHIFT
+            result[start:end] = np.minimum.reduceat(permuted, offsets[start:end] - lo, axis=1).T
+            start = end
+        return result
+
+    def signature(self, text):
+        return self.signatures([text])[0]
+
+
+def jaccard_estimate(signatures, query_signature):
+    """Perkiraan Jaccard: fraksi nilai signature yang sama. Returns: array float32 per baris."""
+    return np.mean(np.asarray(signatures) == query_signature, axis=-1, dtype=np.float32)
+
+
+@functools.lru_cache(maxsize=256)
+def lsh_params(threshold, num_perm):
+    """
+    Pilih (bands, rows) dengan bands*rows <= num_perm yang meminimalkan jumlah peluang
+    false positive (Jaccard < threshold) dan false negative (Jaccard >= threshold).
+    Peluang sebuah unit menjadi kandidat: 1 - (1 - s^rows)^bands.
+    """
+    threshold = min(max(float(threshold), 0.01), 0.99)
+    grid = np.linspace(0.0, 1.0, 201)
+    best, best_error = (num_perm, 1), float("inf")
+    for bands in range(1, num_perm + 1):
+        rows = num_perm // bands
+        if rows < 1:
+            break
+        prob = 1.0 - (1.0 - grid ** rows) ** bands
+        below = grid < threshold
+        error = prob[below].sum() + (1.0 - prob[~below]).sum()
+        if error < best_error:
+            best, best_error = (bands, rows), error
+    return best
+
+
+class MinHashLSH:
+    """
+    Index LSH (banding) atas signature MinHash. Setiap band di-hash menjadi satu key uint64;
+    key per band disimpan terurut sehingga lookup kandidat cukup searchsorted (O(bands log n)),
+    bukan memindai seluruh unit. Tabel band dibuat sekali per konfigurasi (bands, rows).
+    """
+
+    def __init__(self, signatures, seed=2):
+        self.signatures = np.asarray(signatures, dtype=np.uint32)
+        self.num_perm = self.signatures.shape[1] if self.signatures.ndim == 2 else 0
+        self._multipliers = np.random.default_rng(seed).integers(1, 1 << 63, self.num_perm, dtype=np.uint64) | np.uint64(1)
+        self._tables = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return self.signatures.shape[0]
+
+    def _band_keys(self, signatures, bands, rows):
+        """Key uint64 per (baris, band): jumlah nilai band dikali pengali acak (overflow = hashing)."""
+        used = signatures[..., :bands * rows].astype(np.uint64) * self._multipliers[:bands * rows]
+        return used.reshape(*signatures.shape[:-1], bands, rows).sum(axis=-1, dtype=np.uint64)
+
+    def _table(self, bands, rows):
+        with self._lock:
+            table = self._tables.get((bands, rows))
+            if table is None:
+                # Disimpan per band (bands, n) agar searchsorted bekerja pada baris yang kontigu
+                keys = np.ascontiguousarray(self._band_keys(self.signatures, bands, rows).T)
+                order = np.argsort(keys, axis=1, kind="stable")
+                table = self._tables[(bands, rows)] = (order, np.take_along_axis(keys, order, axis=1))
+        return table
+
+    def candidates(self, query_signature, threshold):
+        """Indeks unit yang berbagi minimal satu band dengan query (terurut menaik)."""
+        if not len(self):
+            return np.zeros(0, dtype=np.int64)
+        # Threshold dibulatkan ke bawah (kelipatan 0.05) agar tabel band dipakai ulang saat slider digeser
+        bands, rows = lsh_params(np.floor(threshold * 20) / 20, self.num_perm)
+        order, sorted_keys = self._table(bands, rows)
+        query_keys = self._band_keys(np.asarray(query_signature, dtype=np.uint32), bands, rows)
+        found = []
+        for band in range(bands):
+            lo = np.searchsorted(sorted_keys[band], query_keys[band], side="left")
+            hi = np.searchsorted(sorted_keys[band], query_keys[band], side="right")
+            if hi > lo:
+                found.append(order[band, lo:hi])
+        return np.unique(np.concatenate(found)) if found else np.zeros(0, dtype=np.int64)
+
+
+class MinHashIndex:
+    """
+    Index MinHash/LSH atas unit sumber untuk deteksi salinan persis/hampir persis.
+    query mengembalikan unit dengan perkiraan Jaccard >= threshold tanpa memindai semua unit:
+    kandidat diambil dari LSH lalu Jaccard diperkirakan dari signature kandidat saja.
+    """
+
+    def __init__(self, units, num_perm=None, shingle=None):
+        self.hasher = MinHasher(num_perm=num_perm, shingle=shingle)
+        with span("minhash_index", units=len(units), shingle=self.hasher.shingle):
+            self.lsh = MinHashLSH(self.hasher.signatures(units))
+
+    def __len__(self):
+        return len(self.lsh)
+
+    def query(self, text, threshold, stats=None):
+        """Returns: (indeks unit, perkiraan Jaccard) untuk unit dengan Jaccard >= threshold, urut indeks."""
+        query_signature = self.hasher.signature(text)
+        with span("minhash_query", units=len(self)) as stage:
+            candidates = self.lsh.candidates(query_signature, threshold)
+            estimates = jaccard_estimate(self.lsh.signatures[candidates], query_signature)
+            keep = estimates >= threshold
+            stage.set(candidates=len(candidates))
+        if stats is not None:
+            stats.update({"units_total": len(self), "lsh_candidates": int(len(candidates))})
+        return candidates[keep], estimates[keep]
+
+
+def get_minhash_index(units, cache_key=None, num_perm=None, shingle=None):
+    """
+    MinHashIndex untuk units; dengan cache_key (misal hash file + splitter) index disimpan
+    di memori proses (LRU) sehingga cek ulang sumber yang sama hanya menghitung signature query.
+    """
+    if cache_key is None:
+        return MinHashIndex(units, num_perm=num_perm, shingle=shingle)
+    key = (cache_key, num_perm or DEFAULT_NUM_PERM, shingle or DEFAULT_SHINGLE)
+    with _index_cache_lock:
+        index = _index_cache.get(key)
+        if index is not None:
+            _index_cache.move_to_end(key)
+    count("minhash_index.hit" if index is not None else "minhash_index.miss")
+    if index is None or len(index) != len(units):
+        index = MinHashIndex(units, num_perm=num_perm, shingle=shingle)
+        with _index_cache_lock:
+            _index_cache[key] = index
+            while len(_index_cache) > MINHASH_INDEX_CACHE_SIZE:
+                _index_cache.popitem(last=False)
+    return index
+
+
+def clear_minhash_index_cache():
+    with _index_cache_lock:
+        _index_cache.clear()
+
+
+def longest_common_span(citation_text, unit_text):
+    """
+    Rentang kata persis terpanjang yang sama antara sitasi dan unit (tanpa membedakan huruf
+    besar/kecil dan tanda baca). Returns: (jumlah_kata, (awal, akhir) offset karakter di
+    unit_text) atau (0, None) jika tidak ada kata yang sama.
+    """
+    citation_tokens = tokenize(citation_text)
+    unit_matches = list(_TOKEN_RE.finditer(unit_text))
+    unit_tokens = [match.group().lower() for match in unit_matches]
+    matcher = difflib.SequenceMatcher(None, citation_tokens, unit_tokens, autojunk=False)
+    match = matcher.find_longest_match(0, len(citation_tokens), 0, len(unit_tokens))
+    if not match.size:
+        return 0, None
+    return match.size, (unit_matches[match.b].start(), unit_matches[match.b + match.size - 1].end())
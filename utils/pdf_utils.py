@@ -1,6 +1,11 @@
-import PyPDF2
 import fitz
 import logging
+import os
+import re
+import concurrent.futures
+import multiprocessing
+
+from utils.profiling import span
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
@@ -19,25 +24,182 @@ def is_valid_pdf(filepath):
         if doc:
             doc.close()
 
-def extract_text_by_page(pdf_path):
+def _is_buffer(source):
+    return isinstance(source, (bytes, bytearray, memoryview))
+
+def open_pdf(source):
+    """
+    Buka PDF dari path file atau buffer memori (bytes/bytearray/memoryview) tanpa
+    menulis ke disk. Buffer dibaca langsung oleh fitz (zero-copy untuk memoryview).
+    """
+    if _is_buffer(source):
+        return fitz.open(stream=source, filetype="pdf")
+    return fitz.open(source)
+
+def _source_size_mb(source):
+    size = source.nbytes if isinstance(source, memoryview) else len(source) if _is_buffer(source) else os.path.getsize(source)
+    return size / (1024 * 1024)
+
+_BLOCK_SPLIT_RE = re.compile(r'(?:\n\s*\n)|(?:\n[ \t]+)')
+
+def _page_text(page):
+    """Teks mentah satu halaman."""
+    return page.get_text("text")
+
+def _page_paragraphs(page):
+    """
+    Paragraf satu halaman dari blok layout PyMuPDF.
+    1. Gunakan blok layout jika blok cukup panjang (bukan header/footer/nomor halaman).
+    2. Jika blok terlalu panjang, split dengan dua baris baru/baris kosong ATAU indentasi awal baris.
+    3. Gabungkan baris yang terputus (line wrapping) dalam satu paragraf.
+    """
+    blocks = page.get_text("blocks")
+    paras = []
+    for b in blocks:
+        block_text = b[4].strip()
+        # Filter blok yang sangat pendek (kemungkinan header/footer/nomor halaman)
+        if not block_text or len(block_text) < 20:
+            continue
+        # Jika blok sudah cukup pendek (misal < 600 karakter), anggap satu paragraf
+        if len(block_text) < 600:
+            paras.append(block_text)
+        else:
+            # Split dengan dua baris baru ATAU indentasi awal baris
+            split_paras = _BLOCK_SPLIT_RE.split(block_text)
+            for para in split_paras:
+                para = para.strip()
+                if not para:
+                    continue
+                # Gabungkan baris yang terputus (line wrapping)
+                lines = para.split('\n')
+                joined = ""
+                for line in lines:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    if joined and not joined.endswith(('.', '!', '?', ':')):
+                        joined += ' ' + line
+                    else:
+                        if joined:
+                            paras.append(joined.strip())
+                        joined = line
+                if joined:
+                    paras.append(joined.strip())
+    return [p for p in paras if p.strip()]
+
+PAGE_EXTRACTORS = {"text": _page_text, "paragraphs": _page_paragraphs}
+# Ekstraksi paralel hanya dipakai bila tiap worker mendapat cukup halaman (overhead proses)
+PARALLEL_MIN_PAGES_PER_WORKER = int(os.getenv("CITARA_PDF_MIN_PAGES_PER_WORKER", "48"))
+
+def _resolve_workers(workers, page_count):
+    if workers is None:
+        workers = int(os.getenv("CITARA_PDF_WORKERS", "0")) or (os.cpu_count() or 1)
+        workers = min(workers, page_count // PARALLEL_MIN_PAGES_PER_WORKER)
+    return max(1, min(workers, page_count))
+
+def _extract_page_range(pdf_path, start, end, kind):
+    """Worker: buka handle fitz sendiri (dari path atau bytes) dan ekstrak halaman [start, end)."""
+    extractor = PAGE_EXTRACTORS[kind]
+    doc = open_pdf(pdf_path)
+    try:
+        return [(page_num + 1, extractor(doc.load_page(page_num))) for page_num in range(start, end)]
+    finally:
+        doc.close()
+
+def extract_pages(pdf_path, kind="text", workers=None, doc=None):
+    """
+    Ekstrak semua halaman PDF dengan extractor `kind` ("text" atau "paragraphs").
+    Dokumen besar dibagi per rentang halaman ke beberapa proses (masing-masing membuka
+    handle fitz sendiri) lalu hasilnya digabung sesuai urutan halaman.
+    pdf_path: path file atau buffer memori (bytes/memoryview).
+    doc: handle fitz yang sudah terbuka (dipakai langsung untuk jalur serial).
+    Returns: dict {nomor_halaman: hasil}
+    """
+    with span("pdf_extract", kind=kind) as stage:
+        own_doc = doc is None
+        if own_doc:
+            doc = open_pdf(pdf_path)
+        try:
+            page_count = doc.page_count
+            workers = _resolve_workers(workers, page_count)
+            stage.set(pages=page_count, workers=workers)
+            if workers <= 1:
+                extractor = PAGE_EXTRACTORS[kind]
+                return {page_num + 1: extractor(doc.load_page(page_num)) for page_num in range(page_count)}
+        finally:
+            if own_doc:
+                doc.close()
+        chunk = -(-page_count // (workers * 2))
+        ranges = [(start, min(start + chunk, page_count)) for start in range(0, page_count, chunk)]
+        if isinstance(pdf_path, (bytearray, memoryview)):
+            pdf_path = bytes(pdf_path)  # memoryview tidak bisa dikirim ke proses worker
+        pages = {}
+        # Start method spawn: fork dari server multi-thread (Streamlit, serve.py) bisa deadlock
+        context = multiprocessing.get_context("spawn")
+        with concurrent.futures.ProcessPoolExecutor(max_workers=workers, mp_context=context) as executor:
+            futures = [executor.submit(_extract_page_range, pdf_path, start, end, kind) for start, end in ranges]
+            for future in futures:
+                pages.update(future.result())
+        return pages
+
+def open_pdf_checked(pdf_path, max_size_mb=20, max_pages=500):
+    """
+    Buka PDF (path atau buffer memori) sekali dan validasi ukuran serta jumlah halaman.
+    Returns: (doc, "") jika valid (pemanggil wajib menutup doc) atau (None, pesan_error).
+    """
+    file_size = _source_size_mb(pdf_path)
+    if file_size > max_size_mb:
+        return None, f"Ukuran file PDF terlalu besar ({file_size:.1f} MB). Maksimal {max_size_mb} MB."
+    try:
+        doc = open_pdf(pdf_path)
+    except Exception as e:
+        return None, f"File PDF tidak dapat dibaca atau corrupt ({e})."
+    num_pages = doc.page_count
+    if num_pages > max_pages:
+        doc.close()
+        return None, f"Jumlah halaman PDF terlalu banyak ({num_pages}). Maksimal {max_pages} halaman."
+    if num_pages == 0:
+        doc.close()
+        return None, "File PDF tidak valid atau corrupt (tidak memiliki halaman)."
+    return doc, ""
+
+def load_pdf(pdf_path, kind="text", max_size_mb=20, max_pages=500, workers=None, doc=None):
+    """
+    Validasi, hitung halaman dan ekstrak PDF dalam satu kali buka file.
+    pdf_path: path file atau buffer memori (bytes/memoryview).
+    doc: handle dari open_pdf_checked yang sudah divalidasi; dipakai tanpa membuka ulang
+    dan tidak ditutup (tetap milik pemanggil, misal untuk highlight).
+    Returns: (pages_text, "") atau (None, pesan_error) jika validasi/ekstraksi gagal.
+    """
+    own_doc = doc is None
+    if own_doc:
+        doc, msg = open_pdf_checked(pdf_path, max_size_mb=max_size_mb, max_pages=max_pages)
+        if doc is None:
+            return None, msg
+    try:
+        return extract_pages(pdf_path, kind=kind, workers=workers, doc=doc), ""
+    except Exception as e:
+        logging.error(f"Error ekstraksi PDF dengan PyMuPDF: {e}")
+        return None, f"Terjadi error saat ekstraksi PDF: {e}."
+    finally:
+        if own_doc:
+            doc.close()
+
+def extract_text_by_page(pdf_path, workers=None):
     """
     Mengekstrak teks dari setiap halaman file PDF dan mengembalikannya
     sebagai dictionary dengan nomor halaman sebagai key.
-    Menggunakan PyMuPDF (fitz) untuk ekstraksi yang lebih baik.
+    Menggunakan PyMuPDF (fitz) untuk ekstraksi yang lebih baik; PDF besar
+    diekstrak paralel per rentang halaman (lihat extract_pages).
     """
     pages_text = {}
-    doc = None
     try:
-        doc = fitz.open(pdf_path)
-        for page_num in range(len(doc)):
-            page = doc.load_page(page_num)
-            text = page.get_text("text")
-            pages_text[page_num + 1] = text
-        return pages_text
+        return extract_pages(pdf_path, kind="text", workers=workers)
     except Exception as e:
         logging.error(f"Error membaca file PDF dengan PyMuPDF: {e}")
         logging.info("Mencoba dengan PyPDF2 sebagai fallback...")
         try:
+            import PyPDF2
             with open(pdf_path, "rb") as f:
                 pdf_reader = PyPDF2.PdfReader(f)
                 for i, p_reader in enumerate(pdf_reader.pages):
@@ -47,88 +209,129 @@ def extract_text_by_page(pdf_path):
         except Exception as e2:
             logging.error(f"Error membaca file PDF dengan PyPDF2: {e2}")
             return {}
-    finally:
-        if doc:
-            doc.close()
 
-def highlight_matches_in_pdf(pdf_path, matches, output_path):
+_WORD_PUNCTUATION = ".,;:!?\"'()[]{}“”‘’«»"
+
+def _normalize_word(word):
+    return word.strip(_WORD_PUNCTUATION).lower()
+
+class _PageWords:
+    """
+    Indeks kata satu halaman dari page.get_text("words"), diekstrak sekali per halaman.
+    Segmen dicari sebagai urutan kata ternormalisasi (tanpa tanda baca tepi, huruf kecil),
+    sehingga kalimat yang terpotong line wrap/hyphen tetap ditemukan.
+    """
+
+    def __init__(self, words):
+        self.words = words
+        self.tokens = []
+        self.word_ids = []
+        self.positions = {}
+        for i, word in enumerate(words):
+            token = _normalize_word(word[4])
+            if token:
+                self.positions.setdefault(token, []).append(len(self.tokens))
+                self.tokens.append(token)
+                self.word_ids.append(i)
+
+    def locate(self, segment):
+        """Indeks kata (di words) untuk kemunculan pertama segmen, atau [] jika tidak ditemukan."""
+        target = [token for token in map(_normalize_word, segment.split()) if token]
+        if not target:
+            return []
+        n = len(target)
+        for start in self.positions.get(target[0], ()):
+            if self.tokens[start:start + n] == target:
+                return self.word_ids[start:start + n]
+        return []
+
+    def line_rects(self, word_ids):
+        """Satu Rect per baris (block, line) untuk kata-kata yang ditemukan."""
+        lines = {}
+        for i in word_ids:
+            x0, y0, x1, y1, _, block_no, line_no, _ = self.words[i]
+            box = lines.get((block_no, line_no))
+            lines[(block_no, line_no)] = (x0, y0, x1, y1) if box is None else (
+                min(box[0], x0), min(box[1], y0), max(box[2], x1), max(box[3], y1))
+        return [fitz.Rect(box) for box in lines.values()]
+
+def highlight_matches_in_pdf(pdf_path, matches, output_path=None, doc=None, quick_save=False, stats=None):
     """
     Highlight hasil pencocokan pada file PDF.
-    matches: list of (page_number, text_segment, similarity_score)
+    matches: iterable (page_number, text_segment, similarity_score) (termasuk MatchResults).
+    Hasil dikelompokkan per halaman: setiap halaman yang punya hasil dimuat dan diekstrak
+    kata-katanya sekali, lalu setiap segmen dicari lewat urutan kata (lihat _PageWords) dan
+    diberi satu anotasi highlight berisi satu quad per baris. page.search_for hanya dipakai
+    sebagai cadangan bila urutan kata tidak ditemukan.
+    quick_save: simpan tanpa garbage collection/clean/deflate ulang (jauh lebih cepat untuk
+    dokumen besar, file sedikit lebih besar).
+    pdf_path: path file atau buffer memori; doc: handle fitz yang sudah terbuka (dipakai
+    bersama validasi/ekstraksi). Pada handle bersama, anotasi dihapus lagi setelah disimpan
+    sehingga handle tetap bersih untuk pemakaian berikutnya (tanpa garbage collection
+    objek, yang akan menomori ulang xref handle).
+    stats: dict opsional yang diisi jumlah halaman, segmen ditemukan dan tidak ditemukan.
+    Returns: bytes PDF jika output_path None, selain itu None (PDF disimpan ke output_path).
+    Jika output_path None, error dicatat lalu dilempar ulang (pemanggil tidak pernah menerima
+    None sebagai isi PDF); jika output_path diberikan, error hanya dicatat seperti sebelumnya.
     """
-    doc = None
+    own_doc = doc is None
+    added = []
+    by_page = {}
+    for match in matches:
+        by_page.setdefault(match[-3], []).append(match[-2])
+    located = missed = 0
     try:
-        doc = fitz.open(pdf_path)
-        for page_num, text_segment, _ in matches:
+        if own_doc:
+            doc = open_pdf(pdf_path)
+        for page_num in sorted(by_page):
             if page_num > len(doc) or page_num < 1:
                 logging.warning(f"Nomor halaman tidak valid ({page_num}) untuk highlight. Dilewati.")
                 continue
             page = doc.load_page(page_num - 1)
-            text_instances = page.search_for(text_segment)
-            for inst in text_instances:
-                highlight = page.add_highlight_annot(inst)
-                highlight.update()
-        doc.save(output_path, garbage=4, deflate=True, clean=True)
+            page_words = _PageWords(page.get_text("words"))
+            for text_segment in dict.fromkeys(by_page[page_num]):
+                rects = page_words.line_rects(page_words.locate(text_segment)) or page.search_for(text_segment)
+                if not rects:
+                    missed += 1
+                    continue
+                located += 1
+                # Appearance stream sudah dibuat saat anotasi ditambahkan; update() tidak diperlukan
+                highlight = page.add_highlight_annot(rects)
+                added.append((page_num - 1, highlight.xref))
+        if quick_save:
+            options = {}
+        else:
+            options = {"garbage": 4, "deflate": True, "clean": True} if own_doc else {"deflate": True}
+        if stats is not None:
+            stats.update({"pages": len(by_page), "located": located, "missed": missed})
+        if output_path is None:
+            return doc.tobytes(**options)
+        doc.save(output_path, **options)
         logging.info(f"PDF dengan highlight disimpan ke: {output_path}")
     except Exception as e:
-        logging.error(f"Error saat membuat highlight di PDF {pdf_path}: {e}")
+        logging.error(f"Error saat membuat highlight di PDF: {e}")
+        if output_path is None:
+            raise
     finally:
-        if doc:
+        if own_doc and doc:
             doc.close()
+        elif added:
+            for page_index, xref in added:
+                page = doc.load_page(page_index)
+                page.delete_annot(page.load_annot(xref))
 
-def extract_paragraphs_by_page(pdf_path):
+def extract_paragraphs_by_page(pdf_path, workers=None):
     """
     Mengekstrak paragraf dari setiap halaman file PDF menggunakan PyMuPDF (fitz).
     Gabungan metode:
     1. Gunakan blok layout PyMuPDF (fitz) jika blok cukup panjang (bukan header/footer/nomor halaman).
     2. Jika blok terlalu panjang, split dengan dua baris baru/baris kosong ATAU indentasi awal baris.
     3. Gabungkan baris yang terputus (line wrapping) dalam satu paragraf.
+    PDF besar diekstrak paralel per rentang halaman (lihat extract_pages).
     Returns: dict {page_number: [paragraf, ...]}
     """
-    import re
-    paragraphs_per_page = {}
-    doc = None
     try:
-        doc = fitz.open(pdf_path)
-        for page_num in range(len(doc)):
-            page = doc.load_page(page_num)
-            blocks = page.get_text("blocks")
-            paras = []
-            for b in blocks:
-                block_text = b[4].strip()
-                # Filter blok yang sangat pendek (kemungkinan header/footer/nomor halaman)
-                if not block_text or len(block_text) < 20:
-                    continue
-                # Jika blok sudah cukup pendek (misal < 600 karakter), anggap satu paragraf
-                if len(block_text) < 600:
-                    paras.append(block_text)
-                else:
-                    # Split dengan dua baris baru ATAU indentasi awal baris
-                    split_paras = re.split(r'(?:\n\s*\n)|(?:\n[ \t]+)', block_text)
-                    for para in split_paras:
-                        para = para.strip()
-                        if not para:
-                            continue
-                        # Gabungkan baris yang terputus (line wrapping)
-                        lines = para.split('\n')
-                        joined = ""
-                        for line in lines:
-                            line = line.strip()
-                            if not line:
-                                continue
-                            if joined and not joined.endswith(('.', '!', '?', ':')):
-                                joined += ' ' + line
-                            else:
-                                if joined:
-                                    paras.append(joined.strip())
-                                joined = line
-                        if joined:
-                            paras.append(joined.strip())
-            paragraphs_per_page[page_num + 1] = [p for p in paras if p.strip()]
-        return paragraphs_per_page
+        return extract_pages(pdf_path, kind="paragraphs", workers=workers)
     except Exception as e:
         logging.error(f"Error ekstraksi paragraf PDF dengan PyMuPDF: {e}")
         return {}
-    finally:
-        if doc:
-            doc.close()
@@ -0,0 +1,218 @@
+import contextvars
+import functools
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# Sesi profiling aktif untuk konteks (request Streamlit/thread) saat ini; None = nonaktif
+_active_session = contextvars.ContextVar("citara_profile_session", default=None)
+_parent_span = contextvars.ContextVar("citara_profile_parent", default=None)
+
+
+class _NoopSpan:
+    """Span kosong yang dipakai saat profiling nonaktif (tanpa alokasi, tanpa pencatatan waktu)."""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set(self, **attrs):
+        pass
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+class _Span:
+    __slots__ = ("session", "name", "attrs", "start", "_token", "id", "parent")
+
+    def __init__(self, session, name, attrs):
+        self.session = session
+        self.name = name
+        self.attrs = attrs
+
+    def __enter__(self):
+        self.id = self.session._next_id()
+        self.parent = _parent_span.get()
+        self._token = _parent_span.set(self.id)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        duration = time.perf_counter() - self.start
+        _parent_span.reset(self._token)
+        if exc_type is not None:
+            self.attrs["error"] = exc_type.__name__
+        self.session._record(self, duration)
+        return False
+
+    def set(self, **attrs):
+        """Tambahkan atribut (jumlah unit, ukuran batch, dll.) ke span."""
+        self.attrs.update(attrs)
+
+
+class ProfileSession:
+    """
+    Kumpulan span dan counter untuk satu kali pemeriksaan.
+    Span dicatat dengan waktu mulai/durasi relatif terhadap awal sesi, id thread,
+    span induk dan atribut; counter dipakai untuk cache hit/miss dan sejenisnya.
+    """
+
+    def __init__(self, name="citara"):
+        self.name = name
+        self.origin = time.perf_counter()
+        self.spans = []
+        self.counters = {}
+        self._ids = 0
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        # Lock tidak dapat di-pickle (sesi dikirim balik dari job di proses worker)
+        state = self.__dict__.copy()
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def _next_id(self):
+        with self._lock:
+            self._ids += 1
+            return self._ids
+
+    def _record(self, span, duration):
+        record = {
+            "id": span.id,
+            "parent": span.parent,
+            "name": span.name,
+            "start": span.start - self.origin,
+            "duration": duration,
+            "thread": threading.get_ident(),
+            "attrs": span.attrs,
+        }
+        with self._lock:
+            self.spans.append(record)
+
+    def count(self, name, value=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def summary(self):
+        """Total waktu, jumlah panggilan dan atribut numerik yang dijumlahkan per nama tahap."""
+        stages = {}
+        for record in self.spans:
+            stage = stages.setdefault(record["name"], {"calls": 0, "seconds": 0.0})
+            stage["calls"] += 1
+            stage["seconds"] += record["duration"]
+            for key, value in record["attrs"].items():
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    stage[key] = stage.get(key, 0) + value
+        for stage in stages.values():
+            stage["seconds"] = round(stage["seconds"], 6)
+        return stages
+
+    def cache_hit_rates(self):
+        """Hit rate per cache dari counter "<cache>.hit" / "<cache>.miss"."""
+        rates = {}
+        for name in {key.rsplit(".", 1)[0] for key in self.counters if key.endswith((".hit", ".miss"))}:
+            hits = self.counters.get(f"{name}.hit", 0)
+            total = hits + self.counters.get(f"{name}.miss", 0)
+            rates[name] = round(hits / total, 4) if total else None
+        return rates
+
+    def to_dict(self):
+        return {
+            "name": self.name,
+            "stages": self.summary(),
+            "counters": dict(self.counters),
+            "cache_hit_rates": self.cache_hit_rates(),
+            "spans": sorted(self.spans, key=lambda r: r["start"]),
+        }
+
+    def to_json(self, indent=2):
+        return json.dumps(self.to_dict(), indent=indent, default=str)
+
+    def to_chrome_trace(self):
+        """Format Chrome trace (chrome://tracing, Perfetto): event "X" dengan waktu dalam mikrodetik."""
+        pid = os.getpid()
+        events = [
+            {
+                "name": record["name"],
+                "cat": "citara",
+                "ph": "X",
+                "ts": round(record["start"] * 1e6, 3),
+                "dur": round(record["duration"] * 1e6, 3),
+                "pid": pid,
+                "tid": record["thread"],
+                "args": {key: value if isinstance(value, (int, float, str, bool)) else str(value)
+                         for key, value in record["attrs"].items()},
+            }
+            for record in self.spans
+        ]
+        events.extend(
+            {"name": name, "ph": "C", "ts": 0, "pid": pid, "tid": 0, "args": {"value": value}}
+            for name, value in self.counters.items()
+        )
+        return json.dumps({"traceEvents": events, "displayTimeUnit": "ms"})
+
+
+def is_enabled():
+    return _active_session.get() is not None
+
+
+def span(name, **attrs):
+    """
+    Context manager pengukur satu tahap. Jika tidak ada sesi aktif, mengembalikan span
+    kosong bersama sehingga overhead hanya satu lookup ContextVar.
+    """
+    session = _active_session.get()
+    if session is None:
+        return _NOOP_SPAN
+    return _Span(session, name, attrs)
+
+
+def count(name, value=1):
+    """Tambah counter (misal "embedding_cache.hit") pada sesi aktif, jika ada."""
+    session = _active_session.get()
+    if session is not None:
+        session.count(name, value)
+
+
+def profiled(name=None):
+    """Decorator: bungkus fungsi dalam span bernama name (default: modul.fungsi)."""
+    def decorator(func):
+        span_name = name or f"{func.__module__.rsplit('.', 1)[-1]}.{func.__name__}"
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            session = _active_session.get()
+            if session is None:
+                return func(*args, **kwargs)
+            with _Span(session, span_name, {}):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+@contextmanager
+def profile_session(name="citara", enabled=True):
+    """
+    Aktifkan profiling untuk blok ini. Yields: ProfileSession (atau None jika enabled=False).
+    Span di thread lain hanya tercatat jika konteksnya disalin (contextvars.copy_context).
+    """
+    if not enabled:
+        yield None
+        return
+    session = ProfileSession(name)
+    token = _active_session.set(session)
+    try:
+        yield session
+    finally:
+        _active_session.reset(token)
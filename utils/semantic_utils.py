@@ -1,15 +1,147 @@
-import nltk
+import gc
+import logging
+import os
+import threading
+import time
+import numpy as np
 
-try:
-    nltk.data.find('tokenizers/punkt')
-except (nltk.downloader.DownloadError, LookupError):
-    print("NLTK 'punkt' tokenizer not found. Downloading...")
-    nltk.download('punkt', quiet=True)
+from utils.profiling import span
 
-def get_semantic_model():
-    """Inisialisasi model untuk representasi semantik (Sentence-BERT)."""
+SEMANTIC_MODEL_NAME = "paraphrase-MiniLM-L6-v2"
+# Model multilingual (50+ bahasa, termasuk Indonesia dan Inggris dalam satu ruang embedding):
+# sitasi dapat dibandingkan langsung dengan sumber berbahasa lain tanpa terjemahan
+MULTILINGUAL_MODEL_NAME = os.getenv("CITARA_MULTILINGUAL_MODEL", "paraphrase-multilingual-MiniLM-L12-v2")
+# Model embedding default (monolingual Inggris); pilihan per sesi/request dikirim eksplisit sebagai argumen model_name
+EMBEDDING_MODEL = os.getenv("CITARA_EMBEDDING_MODEL", SEMANTIC_MODEL_NAME)
+
+# Backend inferensi CPU: PyTorch fp32, PyTorch int8 (dynamic quantization) atau ONNX Runtime.
+# EMBEDDING_BACKEND hanya default; pilihan per sesi/request dikirim eksplisit sebagai argumen backend.
+EMBEDDING_BACKENDS = ("torch", "int8", "onnx")
+EMBEDDING_BACKEND = os.getenv("CITARA_EMBEDDING_BACKEND", "torch")
+
+# Penjadwal encode: unit dikumpulkan lintas halaman, diurutkan per panjang token lalu dibatch
+ENCODE_BATCH_SIZE = int(os.getenv("CITARA_ENCODE_BATCH_SIZE", "64"))
+ENCODE_TOKEN_BUDGET = int(os.getenv("CITARA_ENCODE_TOKEN_BUDGET", "8192"))
+ENCODE_CHUNK_UNITS = int(os.getenv("CITARA_ENCODE_CHUNK_UNITS", "512"))
+
+# Registry model per proses: setiap (model, backend) hanya dimuat sekali dan dipakai bersama semua request/thread.
+_semantic_models = {}
+_semantic_model_stats = {}
+_semantic_models_lock = threading.Lock()
+
+def resolve_embedding_backend(backend=None):
+    """Backend embedding yang dipakai: backend jika diberikan, selain itu EMBEDDING_BACKEND."""
+    backend = backend or EMBEDDING_BACKEND
+    if backend not in EMBEDDING_BACKENDS:
+        raise ValueError(f"Backend embedding tidak dikenal: {backend}. Pilihan: {', '.join(EMBEDDING_BACKENDS)}")
+    return backend
+
+def is_multilingual_model(model_name=None):
+    """True jika model membandingkan teks lintas bahasa secara langsung (tanpa terjemahan)."""
+    model_name = model_name or EMBEDDING_MODEL
+    return model_name == MULTILINGUAL_MODEL_NAME or "multilingual" in model_name.lower()
+
+def embedding_model_id(model_name=None, backend=None):
+    """
+    Identitas model untuk key cache embedding. Backend selain "torch" menghasilkan
+    embedding yang sedikit berbeda, sehingga disimpan di entri cache terpisah.
+    """
+    model_name = model_name or EMBEDDING_MODEL
+    backend = resolve_embedding_backend(backend)
+    return model_name if backend == "torch" else f"{model_name}@{backend}"
+
+def available_embedding_backends():
+    """Backend yang dapat dipakai di lingkungan ini (ONNX butuh onnxruntime dan optimum)."""
+    from importlib.util import find_spec
+    backends = ["torch", "int8"]
+    if find_spec("onnxruntime") is not None and find_spec("optimum") is not None:
+        backends.append("onnx")
+    return backends
+
+def _registry_key(model_name, backend):
+    return model_name if backend == "torch" else f"{model_name}@{backend}"
+
+def quantize_model_int8(model):
+    """Dynamic quantization int8 untuk semua lapisan Linear (bobot int8, aktivasi dikuantisasi saat inferensi)."""
+    import torch
+    return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+def _load_sentence_transformer(model_name, backend="torch"):
     from sentence_transformers import SentenceTransformer
-    return SentenceTransformer("paraphrase-MiniLM-L6-v2")
+    if backend == "onnx":
+        # Butuh optimum[onnxruntime]; model diekspor ke ONNX otomatis jika belum ada file .onnx
+        return SentenceTransformer(model_name, device="cpu", backend="onnx")
+    if backend == "int8":
+        return quantize_model_int8(SentenceTransformer(model_name, device="cpu"))
+    return SentenceTransformer(model_name)
+
+def _model_memory_mb(model):
+    """Perkiraan memori bobot model (MB) dari jumlah parameter dan buffer."""
+    try:
+        tensors = list(model.parameters()) + list(model.buffers())
+        return sum(t.numel() * t.element_size() for t in tensors) / (1024 * 1024)
+    except Exception:
+        return None
+
+def get_semantic_model(model_name=None, backend=None):
+    """
+    Ambil model representasi semantik (Sentence-BERT) dari registry; dimuat sekali per proses.
+    model_name: default EMBEDDING_MODEL; backend: "torch", "int8" atau "onnx" (default: EMBEDDING_BACKEND).
+    """
+    model_name = model_name or EMBEDDING_MODEL
+    backend = resolve_embedding_backend(backend)
+    key = _registry_key(model_name, backend)
+    model = _semantic_models.get(key)
+    if model is not None:
+        return model
+    with _semantic_models_lock:
+        model = _semantic_models.get(key)
+        if model is None:
+            start = time.perf_counter()
+            with span("model_load", model=model_name, backend=backend):
+                model = _load_sentence_transformer(model_name, backend)
+            load_seconds = time.perf_counter() - start
+            _semantic_models[key] = model
+            _semantic_model_stats[key] = {
+                "backend": backend,
+                "load_seconds": load_seconds,
+                "memory_mb": _model_memory_mb(model),
+                "loaded_at": time.time(),
+            }
+            logging.info(f"Model semantic '{model_name}' ({backend}) dimuat dalam {load_seconds:.2f} detik.")
+        return model
+
+def warmup_semantic_model(model_name=None, backend=None):
+    """Muat model lebih awal dan jalankan satu encode kecil agar request pertama tidak menanggung biaya load."""
+    model_name = model_name or EMBEDDING_MODEL
+    backend = resolve_embedding_backend(backend)
+    model = get_semantic_model(model_name, backend)
+    start = time.perf_counter()
+    model.encode(["warm-up"], show_progress_bar=False)
+    key = _registry_key(model_name, backend)
+    with _semantic_models_lock:
+        if key in _semantic_model_stats:
+            _semantic_model_stats[key]["warmup_seconds"] = time.perf_counter() - start
+    return model
+
+def unload_semantic_model(model_name=None, backend=None):
+    """Lepaskan model dari registry (semua model/backend jika model_name None)."""
+    with _semantic_models_lock:
+        if model_name is None:
+            names = list(_semantic_models)
+        elif backend is None:
+            names = [key for key in _semantic_models if key.split("@", 1)[0] == model_name]
+        else:
+            names = [_registry_key(model_name, backend)]
+        for name in names:
+            _semantic_models.pop(name, None)
+            _semantic_model_stats.pop(name, None)
+    gc.collect()
+
+def get_semantic_model_stats():
+    """Statistik registry: waktu load, waktu warm-up dan memori per model yang sedang dimuat."""
+    with _semantic_models_lock:
+        return {name: dict(stats) for name, stats in _semantic_model_stats.items()}
 
 def compute_semantic_similarity(text1, text2, semantic_model=None):
     """
@@ -29,8 +161,145 @@ def compute_semantic_similarity_batch(query, candidates, semantic_model=None):
     """
     if semantic_model is None:
         semantic_model = get_semantic_model()
-    from sentence_transformers import util
-    query_emb = semantic_model.encode([query], convert_to_tensor=True)
-    candidates_emb = semantic_model.encode(candidates, convert_to_tensor=True)
-    scores = util.pytorch_cos_sim(query_emb, candidates_emb)[0].cpu().numpy()
-    return scores
+    query_emb = encode_texts([query], semantic_model)[0]
+    return encode_texts(candidates, semantic_model) @ query_emb
+
+
+def set_encode_batching(batch_size=None, token_budget=None):
+    """Atur ukuran batch encode maksimum dan/atau anggaran token (teks x panjang terpanjang) per batch."""
+    global ENCODE_BATCH_SIZE, ENCODE_TOKEN_BUDGET
+    if batch_size is not None:
+        ENCODE_BATCH_SIZE = max(1, int(batch_size))
+    if token_budget is not None:
+        ENCODE_TOKEN_BUDGET = max(1, int(token_budget))
+
+def count_tokens(texts, semantic_model):
+    """
+    Panjang token tiap teks (termasuk token spesial, terpotong di max_seq_length model).
+    Jika model tidak punya tokenizer, dipakai perkiraan jumlah kata + 2.
+    """
+    tokenizer = getattr(semantic_model, "tokenizer", None)
+    if tokenizer is not None:
+        try:
+            max_length = getattr(semantic_model, "max_seq_length", None)
+            input_ids = tokenizer(list(texts), add_special_tokens=True, truncation=max_length is not None,
+                                  max_length=max_length)["input_ids"]
+            return np.fromiter((len(ids) for ids in input_ids), dtype=np.int64, count=len(texts))
+        except Exception:
+            pass
+    return np.fromiter((len(text.split()) + 2 for text in texts), dtype=np.int64, count=len(texts))
+
+def plan_length_buckets(lengths, batch_size=None, token_budget=None):
+    """
+    Rencana batch encode: indeks diurutkan menurut panjang token (padding minimal), lalu
+    dipotong menjadi batch berisi maksimal batch_size teks dengan (jumlah teks x panjang
+    terpanjang) <= token_budget. Teks pendek mendapat batch besar, teks panjang batch kecil.
+    Returns: list array indeks per batch.
+    """
+    batch_size = batch_size or ENCODE_BATCH_SIZE
+    token_budget = token_budget or ENCODE_TOKEN_BUDGET
+    lengths = np.asarray(lengths)
+    batches, current = [], []
+    for idx in np.argsort(lengths, kind="stable"):
+        # Urutan menaik: teks baru selalu yang terpanjang di batch
+        if current and (len(current) >= batch_size or (len(current) + 1) * lengths[idx] > token_budget):
+            batches.append(np.asarray(current))
+            current = []
+        current.append(idx)
+    if current:
+        batches.append(np.asarray(current))
+    return batches
+
+def encode_texts(texts, semantic_model=None, batch_size=None, token_budget=None, stats=None):
+    """
+    Encode list teks menjadi embedding numpy float32 yang ternormalisasi L2.
+    Teks dikelompokkan per panjang token (plan_length_buckets) dan hasilnya dikembalikan
+    ke urutan semula. stats (dict opsional) diakumulasi: texts, tokens, padded_tokens,
+    batches, seconds dan tokens_per_second.
+    """
+    texts = list(texts)
+    if not texts:
+        return np.zeros((0, 0), dtype=np.float32)
+    if semantic_model is None:
+        semantic_model = get_semantic_model()
+    lengths = count_tokens(texts, semantic_model)
+    batches = plan_length_buckets(lengths, batch_size, token_budget)
+    padded = int(sum(len(batch) * lengths[batch[-1]] for batch in batches))
+    with span("encode", texts=len(texts), chars=sum(len(t) for t in texts), tokens=int(lengths.sum()),
+              padded_tokens=padded, batches=len(batches)):
+        start = time.perf_counter()
+        embeddings = None
+        for batch in batches:
+            block = semantic_model.encode([texts[i] for i in batch], batch_size=len(batch),
+                                          convert_to_numpy=True, show_progress_bar=False)
+            block = np.asarray(block, dtype=np.float32).reshape(len(batch), -1)
+            if embeddings is None:
+                embeddings = np.empty((len(texts), block.shape[1]), dtype=np.float32)
+            embeddings[batch] = block
+        seconds = time.perf_counter() - start
+    if stats is not None:
+        for key, value in (("texts", len(texts)), ("tokens", int(lengths.sum())), ("padded_tokens", padded),
+                           ("batches", len(batches)), ("seconds", seconds)):
+            stats[key] = stats.get(key, 0) + value
+        stats["tokens_per_second"] = stats["tokens"] / stats["seconds"] if stats["seconds"] else None
+    norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return embeddings / norms
+
+def get_unit_embeddings(units, semantic_model=None, cache_key=None, cache=None):
+    """
+    Ambil embedding unit sumber. Jika cache_key diberikan, embedding dibaca dari
+    cache persisten (memory-mapped) dan hanya di-encode jika belum ada.
+    """
+    if cache_key is not None:
+        if cache is None:
+            from utils.embedding_cache import get_embedding_cache
+            cache = get_embedding_cache()
+        cached = cache.get(cache_key, expected_rows=len(units))
+        if cached is not None:
+            return cached
+    embeddings = encode_texts(units, semantic_model)
+    if cache_key is not None:
+        cache.put(cache_key, embeddings)
+    return embeddings
+
+def compute_semantic_similarity_cached(query, units, semantic_model=None, cache_key=None, cache=None):
+    """
+    Cosine similarity antara query dan seluruh unit sumber menggunakan embedding
+    unit dari cache: biaya per pemeriksaan hanya satu encode query + dot product.
+    """
+    if semantic_model is None:
+        semantic_model = get_semantic_model()
+    if not units:
+        return np.zeros(0, dtype=np.float32)
+    unit_embeddings = get_unit_embeddings(units, semantic_model, cache_key=cache_key, cache=cache)
+    query_embedding = encode_texts([query], semantic_model)[0]
+    return np.asarray(unit_embeddings, dtype=np.float32) @ query_embedding
+
+def check_backend_parity(texts, queries, backend, reference="torch", model_name=None, tolerance=0.02):
+    """
+    Bandingkan skor cosine backend dengan backend referensi (fp32) pada korpus yang sama.
+    Returns: dict berisi cosine minimum antar embedding yang sama, selisih skor
+    maksimum/rata-rata query x teks, overlap top-10 dan status ok (selisih maks <= tolerance).
+    """
+    reference_model = get_semantic_model(model_name, reference)
+    candidate_model = get_semantic_model(model_name, backend)
+    ref_texts = encode_texts(texts, reference_model)
+    cand_texts = encode_texts(texts, candidate_model)
+    ref_scores = encode_texts(queries, reference_model) @ ref_texts.T
+    cand_scores = encode_texts(queries, candidate_model) @ cand_texts.T
+    diff = np.abs(ref_scores - cand_scores)
+    k = min(10, len(texts))
+    top_ref = np.argsort(-ref_scores, axis=1)[:, :k]
+    top_cand = np.argsort(-cand_scores, axis=1)[:, :k]
+    overlap = np.mean([len(set(a) & set(b)) / k for a, b in zip(top_ref, top_cand)]) if k else 1.0
+    max_diff = float(diff.max()) if diff.size else 0.0
+    return {
+        "backend": backend,
+        "reference": reference,
+        "min_embedding_cosine": float(np.min(np.sum(ref_texts * cand_texts, axis=1))) if len(texts) else 1.0,
+        "max_score_diff": max_diff,
+        "mean_score_diff": float(diff.mean()) if diff.size else 0.0,
+        "top10_overlap": float(overlap),
+        "ok": max_diff <= tolerance,
+    }
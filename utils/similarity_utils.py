@@ -1,50 +1,349 @@
-import nltk
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
-from utils.semantic_utils import get_semantic_model, compute_semantic_similarity, compute_semantic_similarity_batch
+from utils.semantic_utils import get_semantic_model, compute_semantic_similarity, compute_semantic_similarity_batch, get_unit_embeddings, embedding_model_id
+from utils.embedding_cache import make_cache_key
+from utils.text_segmentation import robust_sentence_splitter, paragraph_splitter, get_splitter, segment_pages
+from utils.match_results import MatchResults
+from utils.profiling import span
 import concurrent.futures
 
-def _find_matches_generic(citation_text, pages_text, similarity_threshold, method, progress_callback, text_splitter_func):
+def compute_tfidf_similarity_corpus(citation_text, units, vectorizer=None):
+    """
+    Menghitung cosine similarity TF-IDF antara citation_text dan seluruh unit sekaligus.
+    Vectorizer di-fit satu kali atas unit sumber saja (IDF tidak bergantung pada sitasi,
+    sama seperti batch_check dan layanan HTTP), sitasi ditransformasi satu kali, lalu skor
+    semua unit dihitung dengan satu perkalian matriks sparse-vektor (vektor TF-IDF sudah
+    ternormalisasi L2).
+    Returns: numpy array skor dengan urutan sama seperti units.
+    """
+    import numpy as np
+    if not units:
+        return np.zeros(0, dtype=np.float64)
+    if vectorizer is None:
+        from sklearn.feature_extraction.text import TfidfVectorizer
+        vectorizer = TfidfVectorizer()
+    with span("tfidf_score", units=len(units)):
+        try:
+            unit_matrix = vectorizer.fit_transform(list(units))
+        except ValueError:
+            # Vocabulary kosong (misal hanya tanda baca/angka satu digit)
+            return np.zeros(len(units), dtype=np.float64)
+        scores = unit_matrix @ vectorizer.transform([citation_text]).T
+        return scores.toarray().ravel()
+
+def _find_matches_generic(citation_text, pages_text, similarity_threshold, method, progress_callback, text_splitter_func, tfidf_mode="corpus", source_key=None, rerank_top_n=None, rerank_margin=0.05, stats=None, embedding_model=None, embedding_backend=None):
     """
     Fungsi generik untuk mencari kemiripan antara citation_text dan setiap unit (kalimat/paragraf) pada pages_text.
+    - tfidf_mode: "corpus" (default) fit TF-IDF satu kali atas seluruh sumber,
+      "pairwise" fit ulang per pasangan (sitasi, unit) seperti perilaku lama.
+    - source_key: (hash_file, mode_ekstraksi) sumber; jika diberikan, mode semantic
+      memakai cache embedding persisten sehingga sumber yang sama tidak di-encode ulang.
+    - rerank_top_n: jika diisi (mode semantic), pakai dua tahap: prefilter TF-IDF memilih
+      top-N kandidat (+ margin) lalu hanya kandidat itu yang diskor ulang Sentence-BERT.
+    - stats: dict opsional yang diisi jumlah unit yang diperiksa tiap tahap (dua tahap),
+      statistik encode (token, batch, tokens_per_second) pada mode semantic, atau jumlah
+      kandidat LSH pada mode minhash.
+    - method "minhash": skor = perkiraan Jaccard shingle (utils.minhash_utils), untuk
+      mendeteksi salinan persis/hampir persis; kandidat diambil dari index LSH.
+    - embedding_model/embedding_backend: nama model Sentence-BERT (default EMBEDDING_MODEL) dan
+      backend ("torch"/"int8"/"onnx", default EMBEDDING_BACKEND); model yang dimuat dan key cache
+      embedding memakai pasangan yang sama.
     """
     matches = []
-    total_pages = len(pages_text)
-    semantic_model = None
+    for batch in _iter_matches_generic(citation_text, pages_text, similarity_threshold, method, progress_callback, text_splitter_func, tfidf_mode, source_key, 1, rerank_top_n, rerank_margin, stats, embedding_model=embedding_model, embedding_backend=embedding_backend):
+        matches.extend(batch)
+    return matches
+
+def _iter_matches_generic(citation_text, pages_text, similarity_threshold, method, progress_callback, text_splitter_func, tfidf_mode="corpus", source_key=None, batch_pages=1, rerank_top_n=None, rerank_margin=0.05, stats=None, embedding_model=None, embedding_backend=None):
+    """
+    Versi generator dari _find_matches_generic: yield batch hasil (MatchResults atau list (page, unit, skor)) setiap
+    batch_pages halaman selesai diproses, sesuai urutan halaman.
+    """
+    if method == "semantic" and rerank_top_n:
+        yield from _iter_matches_two_stage(citation_text, pages_text, similarity_threshold, progress_callback, text_splitter_func, source_key, rerank_top_n, rerank_margin, stats, embedding_model=embedding_model, embedding_backend=embedding_backend)
+        return
+    if method == "tfidf" and tfidf_mode == "corpus":
+        yield from _iter_matches_tfidf_corpus(citation_text, pages_text, similarity_threshold, progress_callback, text_splitter_func, batch_pages)
+        return
     if method == "semantic":
-        semantic_model = get_semantic_model()
-    vectorizer = None
-    if method == "tfidf":
-        vectorizer = TfidfVectorizer()
+        yield from _iter_matches_semantic_cached(citation_text, pages_text, similarity_threshold, progress_callback, text_splitter_func, source_key, batch_pages, stats, embedding_model=embedding_model, embedding_backend=embedding_backend)
+        return
+    if method == "minhash":
+        yield from _iter_matches_minhash(citation_text, pages_text, similarity_threshold, progress_callback, text_splitter_func, source_key, stats)
+        return
+    # Jalur TF-IDF pairwise: sklearn baru diimpor saat benar-benar dipakai
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    from sklearn.metrics.pairwise import cosine_similarity
+    total_pages = len(pages_text)
+    vectorizer = TfidfVectorizer()
+    matches = []
     for idx, (page, text) in enumerate(pages_text.items()):
-        if not text:
-            if progress_callback:
-                progress_callback(idx + 1, total_pages)
-            continue
-        text_units = text_splitter_func(text)
-        if not text_units:
-            if progress_callback:
-                progress_callback(idx + 1, total_pages)
-            continue
-        if method == "semantic":
-            scores = compute_semantic_similarity_batch(citation_text, text_units, semantic_model)
-            for unit, cos_sim in zip(text_units, scores):
-                if cos_sim >= similarity_threshold:
-                    matches.append((page, unit, float(cos_sim)))
-        else:
-            if vectorizer is None:
-                vectorizer = TfidfVectorizer()
+        text_units = text_splitter_func(text) if text else []
+        if text_units:
             for unit in text_units:
                 corpus = [citation_text, unit]
                 vectors = vectorizer.fit_transform(corpus)
                 cos_sim = cosine_similarity(vectors[0:1], vectors[1:2])[0][0]
                 if cos_sim >= similarity_threshold:
                     matches.append((page, unit, cos_sim))
+        if (idx + 1) % batch_pages == 0 or idx + 1 == total_pages:
+            if progress_callback:
+                progress_callback(idx + 1, total_pages)
+            yield matches
+            matches = []
+
+def _collect_units(pages_text, text_splitter_func, progress_callback):
+    """Split seluruh halaman sekaligus (lewat cache segmentasi). Returns: (list halaman per unit, list unit)."""
+    with span("segment", splitter=text_splitter_func.__name__, pages=len(pages_text)) as stage:
+        unit_pages, units = segment_pages(pages_text, text_splitter_func)
+        stage.set(units=len(units))
+    if progress_callback:
+        progress_callback(len(pages_text), len(pages_text))
+    return unit_pages, units
+
+def _page_batches(pages_text, unit_pages, batch_pages):
+    """
+    Kelompokkan rentang unit per batch halaman (unit hasil _collect_units berurutan per halaman).
+    Yields: (jumlah_halaman_selesai, start, end) rentang indeks unit untuk tiap batch.
+    """
+    counts = {}
+    for page in unit_pages:
+        counts[page] = counts.get(page, 0) + 1
+    start = end = 0
+    for idx, page in enumerate(pages_text):
+        end += counts.get(page, 0)
+        if (idx + 1) % batch_pages == 0 or idx + 1 == len(pages_text):
+            yield idx + 1, start, end
+            start = end
+
+def _iter_scored_batches(pages_text, unit_pages, units, scores, similarity_threshold, progress_callback, batch_pages):
+    """Yield MatchResults per batch halaman dari skor yang sudah dihitung untuk seluruh unit."""
+    import numpy as np
+    total_pages = len(pages_text)
+    page_array = np.asarray(unit_pages)
+    for done, start, end in _page_batches(pages_text, unit_pages, batch_pages):
         if progress_callback:
-            progress_callback(idx + 1, total_pages)
-    return matches
+            progress_callback(done, total_pages)
+        yield MatchResults.from_scores(units, page_array, scores[start:end], similarity_threshold, start)
+
+def _iter_matches_tfidf_corpus(citation_text, pages_text, similarity_threshold, progress_callback, text_splitter_func, batch_pages=1):
+    """
+    Jalur TF-IDF berbasis korpus: split semua halaman, fit sekali, skor semua unit sekaligus.
+    Karena IDF butuh seluruh sumber, batch pertama baru keluar setelah segmentasi dan fit
+    selesai; yield per batch halaman hanya menjaga antarmuka yang sama dengan jalur lain.
+    Yields: MatchResults (iterasi: (page, unit, skor)) per batch halaman, urutan sama seperti jalur pairwise.
+    """
+    unit_pages, units = _collect_units(pages_text, text_splitter_func, None)
+    scores = compute_tfidf_similarity_corpus(citation_text, units)
+    yield from _iter_scored_batches(pages_text, unit_pages, units, scores, similarity_threshold, progress_callback, batch_pages)
+
+def _iter_matches_minhash(citation_text, pages_text, similarity_threshold, progress_callback, text_splitter_func, source_key=None, stats=None):
+    """
+    Jalur MinHash/LSH: index signature unit dibuat sekali per sumber (disimpan di memori
+    proses jika source_key diberikan), lalu hanya kandidat LSH yang diperkirakan Jaccard-nya.
+    Yields: satu MatchResults (urutan halaman) dengan skor perkiraan Jaccard.
+    """
+    import numpy as np
+    from utils.minhash_utils import get_minhash_index
+    unit_pages, units = _collect_units(pages_text, text_splitter_func, None)
+    results = MatchResults.empty(units)
+    if units:
+        cache_key = (tuple(source_key), text_splitter_func.__name__) if source_key is not None else None
+        index = get_minhash_index(units, cache_key=cache_key)
+        ids, estimates = index.query(citation_text, similarity_threshold, stats=stats)
+        results = MatchResults(units, np.asarray(unit_pages)[ids], ids, estimates)
+    if progress_callback:
+        progress_callback(len(pages_text), len(pages_text))
+    yield results
+
+def _chunk_ranges(ranges, chunk_units):
+    """
+    Gabungkan rentang (start, end) berurutan menjadi kelompok unit untuk di-encode.
+    Kelompok pertama cukup satu rentang berisi (satu batch halaman) agar hasil pertama
+    cepat muncul; kelompok berikutnya dua kali ukuran sebelumnya sampai chunk_units.
+    """
+    group = []
+    size = 0
+    target = 1
+    for start, end in ranges:
+        group.append((start, end))
+        size += end - start
+        if size >= target:
+            yield group
+            target = min(chunk_units, 2 * size)
+            group, size = [], 0
+    if group:
+        yield group
+
+def _partial_cache_key(cache_key):
+    """Key cache untuk awalan embedding dari encode yang berhenti di tengah jalan."""
+    return f"{cache_key}-partial"
+
+def _iter_unit_embedding_batches(units, ranges, semantic_model, cache_key=None, chunk_units=None, encode_stats=None):
+    """
+    Yield embedding unit untuk tiap rentang (start, end) secara berurutan.
+    Jika cache_key ada di cache, potongan diambil dari cache. Jika belum, rentang
+    berurutan dikumpulkan lintas halaman lalu di-encode sekaligus (batch per panjang
+    token, lihat semantic_utils.encode_texts). Kelompok pertama hanya satu batch halaman
+    agar hasil pertama segera tampil, lalu membesar sampai chunk_units unit.
+    Seluruh embedding disimpan ke cache di akhir; jika generator ditutup lebih awal
+    (misal berhenti lebih awal), embedding yang sudah di-encode disimpan sebagai awalan
+    dan dipakai ulang pada pemeriksaan berikutnya.
+    """
+    import numpy as np
+    from utils.embedding_cache import get_embedding_cache
+    from utils.semantic_utils import ENCODE_CHUNK_UNITS, encode_texts
+    cache = get_embedding_cache() if cache_key is not None else None
+    cached = cache.get(cache_key, expected_rows=len(units)) if cache is not None and units else None
+    blocks = []
+    if cache is not None and cached is None and units:
+        partial = cache.get(_partial_cache_key(cache_key))
+        if partial is not None and partial.ndim == 2 and partial.shape[0] < len(units):
+            blocks.append(np.asarray(partial, dtype=np.float32))
+    resumed = len(blocks[0]) if blocks else 0
+    encoded = resumed
+    try:
+        for group in _chunk_ranges(ranges, chunk_units or ENCODE_CHUNK_UNITS):
+            group_start, group_end = group[0][0], group[-1][1]
+            if cached is not None:
+                embeddings = np.asarray(cached[group_start:group_end], dtype=np.float32)
+            elif group_end > group_start:
+                parts = []
+                if group_start < resumed:
+                    parts.append(blocks[0][group_start:min(group_end, resumed)])
+                if group_end > encoded:
+                    fresh = encode_texts(units[max(group_start, encoded):group_end], semantic_model, stats=encode_stats)
+                    blocks.append(fresh)
+                    parts.append(fresh)
+                    encoded = group_end
+                embeddings = parts[0] if len(parts) == 1 else np.concatenate(parts)
+            for start, end in group:
+                if end <= start:
+                    yield np.zeros((0, 0), dtype=np.float32)
+                else:
+                    yield embeddings[start - group_start:end - group_start]
+    finally:
+        if cache is not None and cached is None and encoded > resumed:
+            embeddings = np.concatenate(blocks)
+            if len(embeddings) == len(units):
+                cache.put(cache_key, embeddings)
+                cache.delete(_partial_cache_key(cache_key))
+            else:
+                cache.put(_partial_cache_key(cache_key), embeddings)
+
+def _iter_matches_semantic_cached(citation_text, pages_text, similarity_threshold, progress_callback, text_splitter_func, source_key=None, batch_pages=1, encode_stats=None, embedding_model=None, embedding_backend=None):
+    """
+    Jalur semantic. Sitasi di-encode tepat sekali. Jika source_key diberikan dan
+    embedding sumber sudah ada di cache, skor unit cukup dihitung dengan dot product;
+    jika belum, unit dikumpulkan lintas halaman dan di-encode per kelompok (hasil tetap
+    di-yield per batch halaman) lalu seluruh embedding disimpan ke cache.
+    encode_stats: dict opsional untuk statistik encode (token, batch, tokens_per_second).
+    """
+    import numpy as np
+    from utils.semantic_utils import encode_texts
+    unit_pages, units = _collect_units(pages_text, text_splitter_func, None)
+    page_array = np.asarray(unit_pages)
+    cache_key = None
+    if source_key is not None:
+        file_hash, extraction_mode = source_key
+        cache_key = make_cache_key(file_hash, extraction_mode, text_splitter_func.__name__, embedding_model_id(embedding_model, embedding_backend))
+    semantic_model = get_semantic_model(embedding_model, embedding_backend)
+    query_embedding = encode_texts([citation_text], semantic_model, stats=encode_stats)[0] if units else None
+    total_pages = len(pages_text)
+    batches = list(_page_batches(pages_text, unit_pages, batch_pages))
+    embedding_batches = _iter_unit_embedding_batches(units, [(start, end) for _, start, end in batches], semantic_model, cache_key, encode_stats=encode_stats)
+    try:
+        for (done, start, end), embeddings in zip(batches, embedding_batches):
+            batch = MatchResults.empty(units)
+            if end > start:
+                batch = MatchResults.from_scores(units, page_array, embeddings @ query_embedding, similarity_threshold, start)
+            if progress_callback:
+                progress_callback(done, total_pages)
+            yield batch
+        # Habiskan generator agar embedding yang baru di-encode tersimpan ke cache
+        for _ in embedding_batches:
+            pass
+    finally:
+        # Berhenti lebih awal: embedding yang sudah di-encode tetap disimpan sebagai awalan
+        embedding_batches.close()
+
+def lexical_prefilter(citation_text, units, top_n, margin=0.05):
+    """
+    Tahap leksikal: skor TF-IDF (fit sekali atas sitasi + unit) lalu pilih top-N unit.
+    margin (pengaman recall): unit lain yang skornya >= skor ke-N dikurangi margin juga
+    ikut menjadi kandidat, agar unit dengan skor nyaris sama tidak terpotong.
+    Unit tanpa kata yang sama sekali dengan sitasi (skor 0) hanya masuk lewat top-N.
+    Returns: (indeks kandidat terurut menaik, skor leksikal semua unit)
+    """
+    import numpy as np
+    scores = compute_tfidf_similarity_corpus(citation_text, units)
+    if top_n >= len(units):
+        return np.arange(len(units)), scores
+    top = np.argpartition(-scores, top_n - 1)[:top_n]
+    cutoff = scores[top].min() - margin
+    extra = np.nonzero((scores >= cutoff) & (scores > 0))[0]
+    return np.union1d(top, extra), scores
 
-def find_sentence_matches(citation_text, pages_text, similarity_threshold=0.6, method="tfidf", progress_callback=None):
+def _iter_matches_two_stage(citation_text, pages_text, similarity_threshold, progress_callback, text_splitter_func, source_key, top_n, margin, stats=None, embedding_model=None, embedding_backend=None):
+    """
+    Jalur semantic dua tahap: prefilter TF-IDF atas semua unit, lalu Sentence-BERT hanya
+    untuk kandidat. Jika embedding sumber sudah ada di cache, baris kandidat diambil dari
+    cache tanpa encode. Yields: satu MatchResults (urutan halaman).
+    """
+    import numpy as np
+    from utils.embedding_cache import get_embedding_cache
+    from utils.semantic_utils import encode_texts
+    unit_pages, units = _collect_units(pages_text, text_splitter_func, None)
+    candidates, _ = lexical_prefilter(citation_text, units, top_n, margin) if units else (np.zeros(0, dtype=np.int64), None)
+    semantic_model = get_semantic_model(embedding_model, embedding_backend)
+    cached = None
+    if source_key is not None and len(candidates):
+        file_hash, extraction_mode = source_key
+        cache_key = make_cache_key(file_hash, extraction_mode, text_splitter_func.__name__, embedding_model_id(embedding_model, embedding_backend))
+        cached = get_embedding_cache().get(cache_key, expected_rows=len(units))
+    results = MatchResults.empty(units)
+    encoded = 0
+    if len(candidates):
+        query = encode_texts([citation_text], semantic_model)[0]
+        if cached is not None:
+            embeddings = np.asarray(cached[candidates], dtype=np.float32)
+        else:
+            embeddings = encode_texts([units[i] for i in candidates], semantic_model)
+            encoded = len(candidates)
+        scores = embeddings @ query
+        keep = np.nonzero(scores >= similarity_threshold)[0]
+        results = MatchResults(units, np.asarray(unit_pages)[candidates[keep]], candidates[keep], scores[keep])
+    if stats is not None:
+        stats.update({
+            "units_total": len(units),
+            "lexical_examined": len(units),
+            "semantic_examined": int(len(candidates)),
+            "semantic_encoded": encoded,
+        })
+    if progress_callback:
+        progress_callback(len(pages_text), len(pages_text))
+    yield results
+
+def build_unit_index(pages_text, unit_mode="sentence", semantic_model=None, source_key=None, n_lists=None, n_probe=None, progress_callback=None, embedding_model=None, embedding_backend=None):
+    """
+    Bangun index ANN (utils.ann_index.UnitIndex) dari embedding semantic unit sumber.
+    Query top_k/search_threshold pada index mengembalikan (page, unit, skor) seperti find_*_matches.
+    - unit_mode: "sentence" atau "paragraph".
+    - source_key: (hash_file, mode_ekstraksi) agar embedding diambil dari cache persisten.
+    - embedding_model/embedding_backend: model dan backend Sentence-BERT untuk encode dan key cache
+      (default EMBEDDING_MODEL/EMBEDDING_BACKEND).
+    """
+    from utils.ann_index import UnitIndex
+    splitter = get_splitter(unit_mode)
+    unit_pages, units = _collect_units(pages_text, splitter, progress_callback)
+    if semantic_model is None:
+        semantic_model = get_semantic_model(embedding_model, embedding_backend)
+    cache_key = None
+    if source_key is not None:
+        file_hash, extraction_mode = source_key
+        cache_key = make_cache_key(file_hash, extraction_mode, splitter.__name__, embedding_model_id(embedding_model, embedding_backend))
+    embeddings = get_unit_embeddings(units, semantic_model, cache_key=cache_key)
+    return UnitIndex(unit_pages, units, embeddings, semantic_model=semantic_model, n_lists=n_lists, n_probe=n_probe)
+
+def find_sentence_matches(citation_text, pages_text, similarity_threshold=0.6, method="tfidf", progress_callback=None, tfidf_mode="corpus", source_key=None, rerank_top_n=None, rerank_margin=0.05, stats=None, embedding_model=None, embedding_backend=None):
     """
     Membagi teks per halaman menjadi kalimat dan menghitung cosine similarity
     antara teks sitasi (hasil terjemahan) dengan tiap kalimat PDF.
@@ -53,134 +352,190 @@ def find_sentence_matches(citation_text, pages_text, similarity_threshold=0.6, m
     2. Gunakan NLTK sent_tokenize
     3. Fallback ke regex jika NLTK gagal
     4. (Opsional) Gunakan blok layout PyMuPDF jika value sudah list (hasil blok)
+    tfidf_mode: "corpus" (default, fit sekali per sumber) atau "pairwise" (skor lama per pasangan).
+    source_key: (hash_file, mode_ekstraksi) untuk cache embedding semantic (opsional).
+    rerank_top_n/rerank_margin: mode semantic dua tahap (prefilter TF-IDF lalu rerank Sentence-BERT);
+    stats (dict) diisi jumlah unit yang diperiksa tiap tahap.
+    embedding_model/embedding_backend: model dan backend Sentence-BERT untuk encode dan key cache
+    (default EMBEDDING_MODEL/EMBEDDING_BACKEND).
     """
-    import re
-    def robust_sentence_splitter(text_content):
-        # Jika value sudah list (misal hasil blok layout), gabungkan lalu proses per blok
-        if isinstance(text_content, list):
-            sentences = []
-            for block in text_content:
-                sentences.extend(robust_sentence_splitter(block))
-            return sentences
-        # Gabungkan baris yang terputus (line wrapping)
-        lines = text_content.split('\n')
-        joined = ""
-        for line in lines:
-            line = line.strip()
-            if not line:
-                joined += "\n"
-                continue
-            # Jika baris kemungkinan judul/subjudul (huruf besar semua, atau panjang < 80 dan tidak diakhiri tanda baca)
-            if (len(line) < 80 and not re.search(r'[.!?…:;\"”\']$', line) and
-                (line.isupper() or line.istitle() or re.match(r'^[A-Z][A-Z\s\-0-9]+$', line))):
-                if joined:
-                    joined += "\n"
-                joined += line + "\n"  # Pisahkan judul/subjudul sebagai paragraf/kalimat sendiri
-                continue
-            if joined and not re.search(r'[.!?…:;\"”\']$', joined.strip()):
-                joined += ' ' + line
-            else:
-                joined += '\n' + line
-        # Tokenisasi kalimat per paragraf
-        sentences = []
-        for para in joined.split('\n'):
-            para = para.strip()
-            if para:
-                # Jika kemungkinan judul/subjudul, masukkan langsung
-                if (len(para) < 80 and not re.search(r'[.!?…:;\"”\']$', para) and
-                    (para.isupper() or para.istitle() or re.match(r'^[A-Z][A-Z\s\-0-9]+$', para))):
-                    sentences.append(para)
-                else:
-                    try:
-                        sentences.extend(nltk.tokenize.sent_tokenize(para))
-                    except Exception:
-                        # Fallback ke regex jika NLTK gagal
-                        sentences.extend([s.strip() for s in re.split(r'(?<=[.!?])\s+', para) if s.strip()])
-        return [s.strip() for s in sentences if s.strip()]
-    return _find_matches_generic(citation_text, pages_text, similarity_threshold, method, progress_callback, robust_sentence_splitter)
+    return _find_matches_generic(citation_text, pages_text, similarity_threshold, method, progress_callback, robust_sentence_splitter, tfidf_mode, source_key, rerank_top_n, rerank_margin, stats, embedding_model=embedding_model, embedding_backend=embedding_backend)
 
-def find_paragraph_matches(citation_text, pages_text, similarity_threshold=0.6, method="tfidf", progress_callback=None):
+def find_paragraph_matches(citation_text, pages_text, similarity_threshold=0.6, method="tfidf", progress_callback=None, tfidf_mode="corpus", source_key=None, rerank_top_n=None, rerank_margin=0.05, stats=None, embedding_model=None, embedding_backend=None):
     """
     Mencari kemiripan paragraf. Jika value sudah list (hasil extract_paragraphs_by_page), gunakan langsung,
     jika string, split dengan dua baris baru/baris kosong.
+    tfidf_mode: "corpus" (default, fit sekali per sumber) atau "pairwise" (skor lama per pasangan).
+    source_key: (hash_file, mode_ekstraksi) untuk cache embedding semantic (opsional).
+    rerank_top_n/rerank_margin/stats/embedding_model/embedding_backend: lihat find_sentence_matches.
+    """
+    return _find_matches_generic(citation_text, pages_text, similarity_threshold, method, progress_callback, paragraph_splitter, tfidf_mode, source_key, rerank_top_n, rerank_margin, stats, embedding_model=embedding_model, embedding_backend=embedding_backend)
+
+def iter_sentence_matches(citation_text, pages_text, similarity_threshold=0.6, method="tfidf", progress_callback=None, tfidf_mode="corpus", source_key=None, batch_pages=1, rerank_top_n=None, rerank_margin=0.05, stats=None, embedding_model=None, embedding_backend=None):
+    """
+    Versi generator dari find_sentence_matches: yield batch (page, kalimat, skor)
+    setiap batch_pages halaman selesai diproses sehingga hasil bisa ditampilkan bertahap.
     """
-    def paragraph_splitter(text_content):
-        import re
-        if isinstance(text_content, list):
-            return [p.strip() for p in text_content if p.strip()]
-        return [p.strip() for p in re.split(r'\n\s*\n', text_content) if p.strip()]
-    return _find_matches_generic(citation_text, pages_text, similarity_threshold, method, progress_callback, paragraph_splitter)
+    return _iter_matches_generic(citation_text, pages_text, similarity_threshold, method, progress_callback, robust_sentence_splitter, tfidf_mode, source_key, batch_pages, rerank_top_n, rerank_margin, stats, embedding_model=embedding_model, embedding_backend=embedding_backend)
 
-def find_crossunit_matches(citation_text, pages_text, similarity_threshold=0.6, method="tfidf", progress_callback=None, window_size=3, unit_mode="paragraph"):
+def iter_paragraph_matches(citation_text, pages_text, similarity_threshold=0.6, method="tfidf", progress_callback=None, tfidf_mode="corpus", source_key=None, batch_pages=1, rerank_top_n=None, rerank_margin=0.05, stats=None, embedding_model=None, embedding_backend=None):
+    """
+    Versi generator dari find_paragraph_matches: yield batch (page, paragraf, skor)
+    setiap batch_pages halaman selesai diproses.
+    """
+    return _iter_matches_generic(citation_text, pages_text, similarity_threshold, method, progress_callback, paragraph_splitter, tfidf_mode, source_key, batch_pages, rerank_top_n, rerank_margin, stats, embedding_model=embedding_model, embedding_backend=embedding_backend)
+
+def find_crossunit_matches(citation_text, pages_text, similarity_threshold=0.6, method="tfidf", progress_callback=None, window_size=3, unit_mode="paragraph", window_strategy="pooled", source_key=None, embedding_model=None, embedding_backend=None):
     """
     Mencari kemiripan sitasi dengan gabungan beberapa unit (paragraf/kalimat) secara sliding window.
-    - window_size: jumlah unit yang digabungkan per window.
+    - window_size: jumlah unit yang digabungkan per window (int atau list beberapa ukuran).
     - unit_mode: "paragraph" atau "sentence".
+    - window_strategy: "pooled" (default, vektor unit dihitung sekali) atau "reencode" (per string window).
     Returns: list of (page, gabungan_unit, skor)
     """
-    import re
-    from itertools import chain
     matches = []
+    for page_results in iter_crossunit_matches(citation_text, pages_text, similarity_threshold, method, progress_callback, window_size, unit_mode, window_strategy, source_key, embedding_model=embedding_model, embedding_backend=embedding_backend):
+        matches.extend(page_results)
+    return matches
+
+def iter_crossunit_matches(citation_text, pages_text, similarity_threshold=0.6, method="tfidf", progress_callback=None, window_size=3, unit_mode="paragraph", window_strategy="pooled", source_key=None, batch_pages=1, embedding_model=None, embedding_backend=None):
+    """
+    Versi generator dari find_crossunit_matches: yield batch (page, gabungan_unit, skor)
+    begitu halaman selesai diproses.
+    - window_size: int atau list beberapa ukuran window (diproses dalam satu pass).
+    - window_strategy: "pooled" (default) setiap unit di-embed/divektorisasi sekali dan
+      representasi window dihitung dari vektor unit; "reencode" menggabungkan string
+      tiap window lalu meng-encode/fit ulang (perilaku lama, untuk perbandingan).
+    - source_key: (hash_file, mode_ekstraksi) untuk cache embedding semantic (mode pooled).
+    Metode "minhash" selalu memakai jalur reencode (shingle window tidak dapat dijumlahkan dari unit).
+    """
+    window_sizes = sorted({window_size} if isinstance(window_size, int) else set(window_size))
+    if window_strategy == "reencode" or method == "minhash":
+        yield from _iter_crossunit_reencode(citation_text, pages_text, similarity_threshold, method, progress_callback, window_sizes, unit_mode, embedding_model=embedding_model, embedding_backend=embedding_backend)
+        return
+    yield from _iter_crossunit_pooled(citation_text, pages_text, similarity_threshold, method, progress_callback, window_sizes, unit_mode, source_key, batch_pages, embedding_model=embedding_model, embedding_backend=embedding_backend)
+
+def _window_positions(page_spans, window_sizes):
+    """Posisi awal dan ukuran semua window (tidak melewati batas halaman) untuk rentang unit per halaman."""
+    import numpy as np
+    starts, sizes = [], []
+    for _, start, end in page_spans:
+        for size in window_sizes:
+            if end - start >= size:
+                positions = np.arange(start, end - size + 1)
+                starts.append(positions)
+                sizes.append(np.full(len(positions), size))
+    if not starts:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    return np.concatenate(starts), np.concatenate(sizes)
+
+def _iter_crossunit_pooled(citation_text, pages_text, similarity_threshold, method, progress_callback, window_sizes, unit_mode, source_key=None, batch_pages=1, embedding_model=None, embedding_backend=None):
+    """
+    Mesin cross-unit tervektorisasi. Setiap unit diproses sekali:
+    - semantic: embedding window = rata-rata embedding unit (lewat prefix sum/cumsum), dinormalisasi.
+    - tfidf: vektor window = jumlah baris TF-IDF (tanpa normalisasi) unit penyusunnya, IDF di-fit
+      sekali atas seluruh sumber; setara dengan TF-IDF dari teks gabungan.
+    Yields: MatchResults (iterasi: (page, gabungan_unit, skor)) per batch halaman, urutan halaman.
+    """
+    import numpy as np
+    from scipy import sparse
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    splitter = get_splitter(unit_mode)
+    unit_pages, units = _collect_units(pages_text, splitter, None)
+    total_pages = len(pages_text)
+    page_spans = list(_page_batches(pages_text, unit_pages, 1))
+    batches = [page_spans[i:i + batch_pages] for i in range(0, len(page_spans), batch_pages)]
+    ranges = [(batch[0][1], batch[-1][2]) for batch in batches]
+
+    if method == "semantic":
+        from utils.semantic_utils import encode_texts
+        semantic_model = get_semantic_model(embedding_model, embedding_backend)
+        cache_key = None
+        if source_key is not None:
+            file_hash, extraction_mode = source_key
+            cache_key = make_cache_key(file_hash, extraction_mode, splitter.__name__, embedding_model_id(embedding_model, embedding_backend))
+        query = encode_texts([citation_text], semantic_model)[0] if units else None
+        vector_batches = _iter_unit_embedding_batches(units, ranges, semantic_model, cache_key)
+
+        def score_windows(vectors, offset, starts, sizes):
+            prefix = np.vstack([np.zeros((1, vectors.shape[1]), dtype=np.float32), np.cumsum(vectors, axis=0, dtype=np.float32)])
+            local = starts - offset
+            pooled = prefix[local + sizes] - prefix[local]
+            norms = np.linalg.norm(pooled, axis=1)
+            norms[norms == 0] = 1.0
+            return (pooled @ query) / norms
+    else:
+        matrix = None
+        if units:
+            try:
+                matrix = TfidfVectorizer(norm=None).fit_transform([citation_text] + units).tocsr()
+            except ValueError:
+                matrix = None
+        query = matrix[0] if matrix is not None else None
+        query_norm = np.sqrt(query.multiply(query).sum()) if query is not None else 0.0
+        vector_batches = (matrix[1 + start:1 + end] if matrix is not None else None for start, end in ranges)
+
+        def score_windows(vectors, offset, starts, sizes):
+            if vectors is None or query_norm == 0:
+                return np.zeros(len(starts))
+            # Matriks penjumlah window: baris ke-w berisi 1 pada unit-unit penyusun window w
+            rows = np.repeat(np.arange(len(starts)), sizes)
+            cols = np.concatenate([np.arange(s, s + n) for s, n in zip(starts - offset, sizes)])
+            summer = sparse.csr_matrix((np.ones(len(cols)), (rows, cols)), shape=(len(starts), vectors.shape[0]))
+            pooled = summer @ vectors
+            norms = np.sqrt(np.asarray(pooled.multiply(pooled).sum(axis=1)).ravel())
+            norms[norms == 0] = 1.0
+            return (pooled @ query.T).toarray().ravel() / (norms * query_norm)
+
+    page_array = np.asarray(unit_pages)
+    try:
+        for batch, (start, end), vectors in zip(batches, ranges, vector_batches):
+            results = MatchResults.empty(units)
+            starts, sizes = _window_positions(batch, window_sizes)
+            if len(starts):
+                scores = score_windows(vectors, start, starts, sizes)
+                keep = np.nonzero(scores >= similarity_threshold)[0]
+                results = MatchResults(units, page_array[starts[keep]], starts[keep], scores[keep], spans=sizes[keep])
+            if progress_callback:
+                # Elemen pertama span dari _page_batches = jumlah halaman selesai
+                progress_callback(batch[-1][0], total_pages)
+            yield results
+        for _ in vector_batches:
+            pass
+    finally:
+        vector_batches.close()
+
+def _iter_crossunit_reencode(citation_text, pages_text, similarity_threshold, method, progress_callback, window_sizes, unit_mode, embedding_model=None, embedding_backend=None):
+    """
+    Jalur cross-unit lama: string tiap window digabung lalu di-encode (semantic) atau
+    di-fit TF-IDF ulang per window. Semua ukuran window diproses dalam satu pass per
+    halaman sehingga progres berjalan sekali dari 1 sampai jumlah halaman.
+    Yield hasil per halaman (urutan penyelesaian).
+    """
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    from sklearn.metrics.pairwise import cosine_similarity
     total_pages = len(pages_text)
     semantic_model = None
     if method == "semantic":
-        semantic_model = get_semantic_model()
-    vectorizer = None
-    if method == "tfidf":
-        vectorizer = TfidfVectorizer()
+        semantic_model = get_semantic_model(embedding_model, embedding_backend)
+    hasher = query_signature = None
+    if method == "minhash":
+        from utils.minhash_utils import MinHasher, jaccard_estimate
+        hasher = MinHasher()
+        query_signature = hasher.signature(citation_text)
+    splitter = get_splitter(unit_mode)
 
     def process_page(args):
         idx, page, text = args
-        # Pilih splitter sesuai mode
-        if unit_mode == "sentence":
-            def splitter(txt):
-                def robust_sentence_splitter(text_content):
-                    if isinstance(text_content, list):
-                        sentences = []
-                        for block in text_content:
-                            sentences.extend(robust_sentence_splitter(block))
-                        return sentences
-                    lines = text_content.split('\n')
-                    joined = ""
-                    for line in lines:
-                        line = line.strip()
-                        if not line:
-                            joined += "\n"
-                            continue
-                        if (len(line) < 80 and not re.search(r'[.!?…:;\"”\']$', line) and
-                            (line.isupper() or line.istitle() or re.match(r'^[A-Z][A-Z\s\-0-9]+$', line))):
-                            if joined:
-                                joined += "\n"
-                            joined += line + "\n"
-                            continue
-                        if joined and not re.search(r'[.!?…:;\"”\']$', joined.strip()):
-                            joined += ' ' + line
-                        else:
-                            joined += '\n' + line
-                    sentences = []
-                    for para in joined.split('\n'):
-                        para = para.strip()
-                        if para:
-                            if (len(para) < 80 and not re.search(r'[.!?…:;\"”\']$', para) and
-                                (para.isupper() or para.istitle() or re.match(r'^[A-Z][A-Z\s\-0-9]+$', para))):
-                                sentences.append(para)
-                            else:
-                                try:
-                                    sentences.extend(nltk.tokenize.sent_tokenize(para))
-                                except Exception:
-                                    sentences.extend([s.strip() for s in re.split(r'(?<=[.!?])\s+', para) if s.strip()])
-                    return [s.strip() for s in sentences if s.strip()]
-                return robust_sentence_splitter(txt)
-        else:
-            def splitter(txt):
-                if isinstance(txt, list):
-                    return [p.strip() for p in txt if p.strip()]
-                return [p.strip() for p in re.split(r'\n\s*\n', txt) if p.strip()]
-        units = splitter(text)
-        if not units or len(units) < window_size:
+        units = splitter(text) if text else []
+        # Sliding window untuk setiap ukuran
+        window_texts = [
+            " ".join(units[i:i+window_size])
+            for window_size in window_sizes
+            for i in range(len(units) - window_size + 1)
+        ]
+        if not window_texts:
             return []
-        # Sliding window
-        window_texts = [" ".join(units[i:i+window_size]) for i in range(len(units) - window_size + 1)]
         results = []
         if method == "semantic":
             # Batch processing
@@ -188,26 +543,31 @@ def find_crossunit_matches(citation_text, pages_text, similarity_threshold=0.6,
             for window_text, score in zip(window_texts, scores):
                 if score >= similarity_threshold:
                     results.append((page, window_text, float(score)))
+        elif method == "minhash":
+            scores = jaccard_estimate(hasher.signatures(window_texts), query_signature)
+            for window_text, score in zip(window_texts, scores):
+                if score >= similarity_threshold:
+                    results.append((page, window_text, float(score)))
         else:
             for window_text in window_texts:
-                if vectorizer is None:
-                    local_vectorizer = TfidfVectorizer()
-                else:
-                    local_vectorizer = vectorizer
+                # Vectorizer baru per window: halaman diproses paralel, fit pada objek bersama tidak thread-safe
                 corpus = [citation_text, window_text]
-                vectors = local_vectorizer.fit_transform(corpus)
+                vectors = TfidfVectorizer().fit_transform(corpus)
                 cos_sim = cosine_similarity(vectors[0:1], vectors[1:2])[0][0]
                 if cos_sim >= similarity_threshold:
                     results.append((page, window_text, cos_sim))
         return results
 
-    # Parallel processing per halaman
-    with concurrent.futures.ThreadPoolExecutor() as executor:
+    # Parallel processing per halaman; hasil di-yield begitu halaman selesai
+    executor = concurrent.futures.ThreadPoolExecutor()
+    try:
         args_list = [(idx, page, text) for idx, (page, text) in enumerate(pages_text.items())]
         future_to_idx = {executor.submit(process_page, args): args[0] for args in args_list}
         for i, future in enumerate(concurrent.futures.as_completed(future_to_idx)):
             page_results = future.result()
-            matches.extend(page_results)
             if progress_callback:
                 progress_callback(i + 1, total_pages)
-    return matches
+            yield page_results
+    finally:
+        # Jika konsumen berhenti lebih awal, batalkan halaman yang belum diproses
+        executor.shutdown(wait=False, cancel_futures=True)
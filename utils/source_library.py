@@ -0,0 +1,166 @@
+import io
+import logging
+import os
+import threading
+
+import numpy as np
+
+from utils.ann_index import IVFIndex
+from utils.embedding_cache import compute_file_hash, make_cache_key
+
+# Pustaka sampai ukuran ini dicari secara exact (brute-force) bila n_probe tidak diatur:
+# probing IVF bersifat aproksimasi dan dapat melewatkan unit di atas threshold
+LIBRARY_EXACT_MAX_UNITS = int(os.getenv("CITARA_LIBRARY_EXACT_MAX_UNITS", "200000"))
+
+
+def extract_source_pages(source, name, unit_mode="sentence", page_labels=None):
+    """
+    Ekstrak teks sumber PDF/DOCX menjadi pages_text sesuai unit_mode.
+    source: path file atau buffer memori (bytes/memoryview). Returns: (pages_text, extraction_mode).
+    DOCX diekstrak per chunk section/judul; page_labels (dict opsional) diisi label lokasi per chunk.
+    """
+    ext = os.path.splitext(name)[1].lower()
+    if ext == ".pdf":
+        from utils.pdf_utils import load_pdf
+        # bytes dibuka langsung dari memori oleh fitz, tanpa file sementara
+        kind = "paragraphs" if unit_mode == "paragraph" else "text"
+        pages_text, msg = load_pdf(source, kind=kind)
+        if pages_text is None:
+            raise ValueError(msg)
+        return pages_text, f"pdf-{kind}"
+    if ext == ".docx":
+        from utils.docx_utils import extract_docx_chunks
+        docx_file = io.BytesIO(bytes(source)) if isinstance(source, (bytes, bytearray, memoryview)) else source
+        return extract_docx_chunks(docx_file, page_labels=page_labels), "docx-blocks"
+    raise ValueError(f"Format file sumber tidak didukung: {name}. Hanya PDF dan Word (.docx).")
+
+
+class SourceLibrary:
+    """
+    Pustaka multi-dokumen sumber dengan index semantic inkremental.
+    Setiap dokumen diekstrak, di-split, di-embed (lewat cache embedding) dan
+    ditambahkan ke satu index IVF bersama; menambah dokumen hanya mengindeks
+    dokumen tersebut dan remove_document mengeluarkan unitnya dari index.
+    Query mengembalikan (dokumen, halaman, unit, skor).
+    embedding_model/embedding_backend: model dan backend Sentence-BERT untuk encode dan key cache
+    (default EMBEDDING_MODEL/EMBEDDING_BACKEND).
+    """
+
+    def __init__(self, unit_mode="sentence", semantic_model=None, n_lists=None, n_probe=None, embedding_model=None, embedding_backend=None):
+        self.unit_mode = unit_mode
+        self.semantic_model = semantic_model
+        self.embedding_model = embedding_model
+        self.embedding_backend = embedding_backend
+        self.n_probe = n_probe
+        self.index = IVFIndex(n_lists=n_lists, n_probe=n_probe)
+        self.documents = {}
+        self.unit_docs = []
+        self.unit_pages = []
+        self.units = []
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.documents)
+
+    def __contains__(self, file_hash):
+        return file_hash in self.documents
+
+    def _get_model(self):
+        from utils.semantic_utils import get_semantic_model
+        if self.semantic_model is None:
+            self.semantic_model = get_semantic_model(self.embedding_model, self.embedding_backend)
+        return self.semantic_model
+
+    def _splitter(self):
+        from utils.text_segmentation import get_splitter
+        return get_splitter(self.unit_mode)
+
+    def add_document(self, source, name, pages_text=None, extraction_mode=None, file_hash=None):
+        """
+        Tambahkan satu dokumen ke pustaka (no-op jika isi file sudah ada).
+        source: path atau bytes; pages_text dapat diberikan jika sudah diekstrak, bersama
+        extraction_mode (wajib, bagian dari key cache embedding).
+        Returns: hash file yang menjadi id dokumen.
+        """
+        from utils.semantic_utils import embedding_model_id, get_unit_embeddings
+        from utils.similarity_utils import _collect_units
+        if pages_text is not None and extraction_mode is None:
+            raise ValueError("extraction_mode wajib diisi jika pages_text diberikan (bagian dari key cache embedding).")
+        if file_hash is None:
+            file_hash = compute_file_hash(source)
+        if file_hash in self.documents:
+            return file_hash
+        page_labels = {}
+        if pages_text is None:
+            pages_text, extraction_mode = extract_source_pages(source, name, self.unit_mode, page_labels=page_labels)
+        splitter = self._splitter()
+        unit_pages, units = _collect_units(pages_text, splitter, None)
+        cache_key = make_cache_key(file_hash, extraction_mode, splitter.__name__, embedding_model_id(self.embedding_model, self.embedding_backend))
+        embeddings = get_unit_embeddings(units, self._get_model(), cache_key=cache_key) if units else None
+        with self._lock:
+            if file_hash in self.documents:
+                return file_hash
+            if embeddings is not None and len(units):
+                self.index.add(np.asarray(embeddings, dtype=np.float32))
+                if self.index.needs_retrain():
+                    self.index.retrain()
+            self.unit_docs.extend([file_hash] * len(units))
+            self.unit_pages.extend(unit_pages)
+            self.units.extend(units)
+            self.documents[file_hash] = {"name": name, "pages": len(pages_text), "units": len(units), "page_labels": page_labels}
+        logging.info(f"Dokumen '{name}' ditambahkan ke pustaka ({len(units)} unit).")
+        return file_hash
+
+    def remove_document(self, file_hash):
+        """
+        Keluarkan dokumen dari pustaka: unit dan embedding-nya dihapus dari index sehingga tidak
+        lagi muncul di hasil search. Returns: True jika dokumen ada dan dihapus.
+        """
+        with self._lock:
+            document = self.documents.pop(file_hash, None)
+            if document is None:
+                return False
+            removed = [i for i, doc in enumerate(self.unit_docs) if doc == file_hash]
+            self.index.remove(removed)
+            removed = set(removed)
+            self.unit_docs = [doc for i, doc in enumerate(self.unit_docs) if i not in removed]
+            self.unit_pages = [page for i, page in enumerate(self.unit_pages) if i not in removed]
+            self.units = [unit for i, unit in enumerate(self.units) if i not in removed]
+        logging.info(f"Dokumen '{document['name']}' dikeluarkan dari pustaka ({len(removed)} unit).")
+        return True
+
+    def page_labels(self):
+        """Label lokasi (section/judul DOCX) per (nama_dokumen, halaman) untuk tampilan hasil."""
+        with self._lock:
+            return {
+                (document["name"], page): label
+                for document in self.documents.values()
+                for page, label in document["page_labels"].items()
+            }
+
+    def search(self, citation_text, similarity_threshold=0.6, top_k=None, n_probe=None):
+        """
+        Cek sitasi terhadap seluruh pustaka dalam satu query.
+        Tanpa n_probe (argumen atau konstruktor), pustaka hingga LIBRARY_EXACT_MAX_UNITS unit
+        diperiksa semua (hasil sama dengan pencarian brute-force); di atas itu atau dengan
+        n_probe eksplisit dipakai probing IVF yang lebih cepat tetapi aproksimatif.
+        Returns: list of (nama_dokumen, halaman, unit, skor) terurut skor menurun.
+        """
+        from utils.semantic_utils import encode_texts
+        if not self.units:
+            return []
+        query = encode_texts([citation_text], self._get_model())[0]
+        with self._lock:
+            if n_probe is None and self.n_probe is None and len(self.units) <= LIBRARY_EXACT_MAX_UNITS:
+                # Probe semua list = pencarian exact atas seluruh vektor
+                n_probe = self.index.list_count
+            if top_k is None:
+                ids, scores = self.index.search_threshold(query, similarity_threshold, n_probe=n_probe)
+            else:
+                ids, scores = self.index.search(query, top_k, n_probe=n_probe)
+                keep = scores >= similarity_threshold
+                ids, scores = ids[keep], scores[keep]
+            return [
+                (self.documents[self.unit_docs[i]]["name"], self.unit_pages[i], self.units[i], float(score))
+                for i, score in zip(ids, scores)
+            ]
@@ -0,0 +1,176 @@
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+
+from utils.profiling import count
+
+# Pola regex dikompilasi sekali di level modul
+_TERMINAL_CHARS = frozenset('.!?…:;"”\'')
+_HEADING_RE = re.compile(r'^[A-Z][A-Z\s\-0-9]+$')
+_PARAGRAPH_SPLIT_RE = re.compile(r'\n\s*\n')
+_FALLBACK_SENTENCE_RE = re.compile(r'(?<=[.!?])\s+')
+
+SEGMENTATION_CACHE_SIZE = 32
+
+_sentence_tokenizer = None
+_sentence_tokenizer_lock = threading.Lock()
+_segmentation_cache = OrderedDict()
+_segmentation_cache_lock = threading.Lock()
+
+
+def _regex_sentence_tokenize(text):
+    return [s.strip() for s in _FALLBACK_SENTENCE_RE.split(text) if s.strip()]
+
+
+def get_sentence_tokenizer():
+    """
+    Tokenizer kalimat punkt yang dimuat sekali lalu dipakai ulang.
+    Jika data punkt tidak tersedia, fallback ke pemisah regex (diputuskan sekali,
+    bukan lewat exception di setiap paragraf).
+    """
+    global _sentence_tokenizer
+    if _sentence_tokenizer is None:
+        with _sentence_tokenizer_lock:
+            if _sentence_tokenizer is None:
+                import nltk
+                try:
+                    try:
+                        from nltk.tokenize import PunktTokenizer
+                        _sentence_tokenizer = PunktTokenizer("english").tokenize
+                    except ImportError:
+                        # NLTK < 3.8.2 memakai pickle punkt
+                        _sentence_tokenizer = nltk.data.load("tokenizers/punkt/english.pickle").tokenize
+                except LookupError:
+                    _sentence_tokenizer = _regex_sentence_tokenize
+    return _sentence_tokenizer
+
+
+def ensure_punkt(download=True):
+    """
+    Langkah warm-up eksplisit (bukan saat import modul): pastikan data punkt NLTK tersedia,
+    unduh bila belum ada dan download=True, lalu muat ulang tokenizer kalimat.
+    Returns: True jika tokenizer punkt dipakai, False jika fallback regex.
+    """
+    global _sentence_tokenizer
+    import nltk
+    try:
+        from nltk.tokenize import PunktTokenizer  # noqa: F401
+        resource, path = "punkt_tab", "tokenizers/punkt_tab/english/"
+    except ImportError:
+        resource, path = "punkt", "tokenizers/punkt"
+    try:
+        nltk.data.find(path)
+    except LookupError:
+        if download:
+            try:
+                nltk.download(resource, quiet=True)
+            except Exception:
+                pass
+    with _sentence_tokenizer_lock:
+        _sentence_tokenizer = None
+    return get_sentence_tokenizer() is not _regex_sentence_tokenize
+
+
+def _is_heading(line):
+    """Baris kemungkinan judul/subjudul: pendek, tanpa tanda baca akhir, huruf besar/title case."""
+    return (len(line) < 80 and line[-1] not in _TERMINAL_CHARS and
+            (line.isupper() or line.istitle() or _HEADING_RE.match(line) is not None))
+
+
+def robust_sentence_splitter(text_content):
+    """Split teks (atau list blok) menjadi kalimat dengan menggabungkan line wrapping dan memisahkan judul."""
+    # Jika value sudah list (misal hasil blok layout), proses per blok
+    if isinstance(text_content, list):
+        sentences = []
+        for block in text_content:
+            sentences.extend(robust_sentence_splitter(block))
+        return sentences
+    # Gabungkan baris yang terputus (line wrapping); potongan dikumpulkan di list lalu di-join sekali
+    parts = []
+    last_char = ""  # karakter non-spasi terakhir dari teks yang sudah digabung
+    for line in text_content.split('\n'):
+        line = line.strip()
+        if not line:
+            parts.append("\n")
+            continue
+        if _is_heading(line):
+            if parts:
+                parts.append("\n")
+            parts.append(line + "\n")  # Pisahkan judul/subjudul sebagai paragraf/kalimat sendiri
+        elif parts and last_char not in _TERMINAL_CHARS:
+            parts.append(' ' + line)
+        else:
+            parts.append('\n' + line)
+        last_char = line[-1]
+    # Tokenisasi kalimat per paragraf
+    tokenize = get_sentence_tokenizer()
+    sentences = []
+    for para in "".join(parts).split('\n'):
+        para = para.strip()
+        if not para:
+            continue
+        if _is_heading(para):
+            sentences.append(para)
+        else:
+            try:
+                sentences.extend(tokenize(para))
+            except Exception:
+                sentences.extend(_regex_sentence_tokenize(para))
+    return [s.strip() for s in sentences if s.strip()]
+
+
+def paragraph_splitter(text_content):
+    """Split teks menjadi paragraf; list (hasil extract_paragraphs_by_page) dipakai langsung."""
+    if isinstance(text_content, list):
+        return [p.strip() for p in text_content if p.strip()]
+    return [p.strip() for p in _PARAGRAPH_SPLIT_RE.split(text_content) if p.strip()]
+
+
+def get_splitter(unit_mode):
+    """Splitter untuk unit_mode "sentence" atau "paragraph"."""
+    return paragraph_splitter if unit_mode == "paragraph" else robust_sentence_splitter
+
+
+def _pages_fingerprint(pages_text):
+    digest = hashlib.sha1()
+    for page, text in pages_text.items():
+        digest.update(f"\x1d{page}\x1d".encode("utf-8"))
+        for block in (text if isinstance(text, list) else [text or ""]):
+            digest.update(block.encode("utf-8", "surrogatepass"))
+            digest.update(b"\x1e")
+    return digest.hexdigest()
+
+
+def segment_pages(pages_text, text_splitter_func):
+    """
+    Split seluruh halaman menjadi unit dengan cache per dokumen.
+    Key cache: (sidik jari isi pages_text, splitter). Hashing teks jauh lebih murah
+    daripada memecahnya, sehingga berpindah mode kalimat/paragraf/lintas unit pada
+    unggahan yang sama tidak memecah ulang teks.
+    Returns: (list halaman per unit, list unit) - salinan baru yang boleh diubah.
+    """
+    key = (_pages_fingerprint(pages_text), text_splitter_func)
+    with _segmentation_cache_lock:
+        cached = _segmentation_cache.get(key)
+        if cached is not None:
+            _segmentation_cache.move_to_end(key)
+    count("segmentation_cache.hit" if cached is not None else "segmentation_cache.miss")
+    if cached is None:
+        unit_pages, units = [], []
+        for page, text in pages_text.items():
+            if text:
+                page_units = text_splitter_func(text)
+                unit_pages.extend([page] * len(page_units))
+                units.extend(page_units)
+        cached = (tuple(unit_pages), tuple(units))
+        with _segmentation_cache_lock:
+            _segmentation_cache[key] = cached
+            while len(_segmentation_cache) > SEGMENTATION_CACHE_SIZE:
+                _segmentation_cache.popitem(last=False)
+    return list(cached[0]), list(cached[1])
+
+
+def clear_segmentation_cache():
+    with _segmentation_cache_lock:
+        _segmentation_cache.clear()
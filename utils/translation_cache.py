@@ -0,0 +1,96 @@
+import hashlib
+import os
+import sqlite3
+import threading
+
+from utils.profiling import count
+
+DEFAULT_CACHE_PATH = os.getenv(
+    "CITARA_TRANSLATION_CACHE_PATH",
+    os.path.join(os.path.expanduser("~"), ".cache", "citara", "translations.sqlite3"),
+)
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def make_translation_key(text, direction, backend):
+    """Bentuk key cache terjemahan dari (hash teks, arah terjemahan, backend)."""
+    text_hash = hashlib.sha256(text.encode("utf-8")).hexdigest()
+    return text_hash, direction, backend
+
+
+class TranslationCache:
+    """
+    Cache hasil terjemahan persisten (SQLite) dengan key (hash teks, arah, backend).
+    Hasil juga disimpan di memori sehingga cek ulang sitasi yang sama dalam satu
+    proses tidak perlu menyentuh disk. Aman dipakai beberapa thread/proses.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or DEFAULT_CACHE_PATH
+        self.hits = 0
+        self.misses = 0
+        self._memory = {}
+        self._lock = threading.Lock()
+        if self.path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+        with self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS translations ("
+                "text_hash TEXT, direction TEXT, backend TEXT, result TEXT, "
+                "PRIMARY KEY (text_hash, direction, backend))"
+            )
+
+    def get_many(self, texts, direction, backend):
+        """Ambil terjemahan untuk list teks. Returns: dict {teks: hasil} hanya untuk yang ada di cache."""
+        found = {}
+        with self._lock:
+            for text in dict.fromkeys(texts):
+                key = make_translation_key(text, direction, backend)
+                result = self._memory.get(key)
+                if result is None:
+                    row = self._conn.execute(
+                        "SELECT result FROM translations WHERE text_hash=? AND direction=? AND backend=?", key
+                    ).fetchone()
+                    if row is not None:
+                        result = self._memory[key] = row[0]
+                if result is None:
+                    self.misses += 1
+                    count("translation_cache.miss")
+                else:
+                    self.hits += 1
+                    count("translation_cache.hit")
+                    found[text] = result
+        return found
+
+    def put_many(self, translations, direction, backend):
+        """Simpan dict {teks: hasil terjemahan}."""
+        rows = [make_translation_key(text, direction, backend) + (result,) for text, result in translations.items()]
+        with self._lock:
+            for row in rows:
+                self._memory[row[:3]] = row[3]
+            with self._conn:
+                self._conn.executemany("INSERT OR REPLACE INTO translations VALUES (?, ?, ?, ?)", rows)
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            with self._conn:
+                self._conn.execute("DELETE FROM translations")
+
+    def stats(self):
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM translations").fetchone()[0]
+        return {"entries": entries, "hits": self.hits, "misses": self.misses}
+
+
+def get_translation_cache():
+    """Instance TranslationCache bersama untuk seluruh aplikasi."""
+    global _default_cache
+    if _default_cache is None:
+        with _default_cache_lock:
+            if _default_cache is None:
+                _default_cache = TranslationCache()
+    return _default_cache
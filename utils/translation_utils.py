@@ -1,11 +1,23 @@
 import os
+import re
+import threading
 import dotenv
-import deepl
-from transformers import MarianMTModel, MarianTokenizer
+
+from utils.profiling import span
+from utils.translation_cache import get_translation_cache
 
 dotenv.load_dotenv()
 
 _local_models_cache = {}
+_deepl_translators = {}
+_deepl_lock = threading.Lock()
+
+# Jumlah thread CPU untuk model lokal (0 = biarkan default torch)
+TRANSLATION_THREADS = int(os.getenv("CITARA_TRANSLATION_THREADS", "0"))
+TRANSLATION_BATCH_SIZE = 16
+
+# Pemisah kalimat ringan untuk terjemahan per kalimat (tanpa bergantung pada punkt)
+_SENTENCE_SPLIT_RE = re.compile(r'(?<=[.!?…])\s+')
 
 
 def get_deepl_api_key():
@@ -17,8 +29,16 @@ def get_deepl_api_key():
 
 
 def get_deepl_translator():
-    """Inisialisasi translator dari library DeepL."""
-    return deepl.Translator(get_deepl_api_key())
+    """Ambil translator DeepL (dibuat sekali per API key lalu dipakai ulang)."""
+    key = get_deepl_api_key()
+    translator = _deepl_translators.get(key)
+    if translator is None:
+        import deepl
+        with _deepl_lock:
+            translator = _deepl_translators.get(key)
+            if translator is None:
+                translator = _deepl_translators[key] = deepl.Translator(key)
+    return translator
 
 
 def get_local_translation_model(model_name: str):
@@ -26,55 +46,122 @@ def get_local_translation_model(model_name: str):
     if model_name in _local_models_cache:
         return _local_models_cache[model_name]
 
+    # transformers (~beberapa detik) hanya diimpor saat model lokal benar-benar dipakai
+    from transformers import MarianMTModel, MarianTokenizer
     tokenizer = MarianTokenizer.from_pretrained(model_name)
     model = MarianMTModel.from_pretrained(model_name)
     _local_models_cache[model_name] = (tokenizer, model)
     return tokenizer, model
 
 
-def translate_text_local(text: str, model_name: str):
-    """Terjemahkan teks menggunakan model lokal MarianMT yang ditentukan."""
+def split_translation_sentences(text: str):
+    """Pecah teks menjadi kalimat agar tidak melebihi panjang maksimum model Marian."""
+    sentences = [s.strip() for s in _SENTENCE_SPLIT_RE.split(text.strip())]
+    return [s for s in sentences if s] or [text]
+
+
+def set_translation_threads(num_threads: int):
+    """Atur jumlah thread CPU yang dipakai model terjemahan lokal (0 = default torch)."""
+    global TRANSLATION_THREADS
+    TRANSLATION_THREADS = int(num_threads)
+
+
+def translate_texts_local(texts, model_name: str, batch_size: int = TRANSLATION_BATCH_SIZE):
+    """
+    Terjemahkan list teks/kalimat dengan model lokal MarianMT dalam batch ber-padding.
+    Dijalankan di bawah torch.inference_mode(); jumlah thread mengikuti TRANSLATION_THREADS.
+    """
+    import torch
     tokenizer, model = get_local_translation_model(model_name)
-    batch = tokenizer([text], return_tensors="pt", padding=True)
-    gen = model.generate(**batch)
-    return tokenizer.decode(gen[0], skip_special_tokens=True)
+    if TRANSLATION_THREADS > 0 and torch.get_num_threads() != TRANSLATION_THREADS:
+        torch.set_num_threads(TRANSLATION_THREADS)
+    results = []
+    with torch.inference_mode():
+        for start in range(0, len(texts), batch_size):
+            batch = tokenizer(list(texts[start:start + batch_size]), return_tensors="pt", padding=True, truncation=True)
+            gen = model.generate(**batch)
+            results.extend(tokenizer.batch_decode(gen, skip_special_tokens=True))
+    return results
+
+
+def translate_text_local(text: str, model_name: str):
+    """Terjemahkan teks menggunakan model lokal MarianMT (per kalimat, satu batch)."""
+    return " ".join(translate_texts_local(split_translation_sentences(text), model_name))
+
+
+def _translate_cached(texts, direction, backend, translate_batch, use_cache=True):
+    """
+    Terjemahkan list teks lewat cache: hanya teks yang belum ada di cache yang
+    diterjemahkan (dalam satu panggilan translate_batch), lalu hasilnya disimpan.
+    """
+    cache = get_translation_cache() if use_cache else None
+    found = cache.get_many(texts, direction, backend) if cache is not None else {}
+    missing = [t for t in dict.fromkeys(texts) if t not in found]
+    if missing:
+        with span("translate_backend", backend=backend, texts=len(missing)):
+            translated = dict(zip(missing, translate_batch(missing)))
+        if cache is not None:
+            cache.put_many(translated, direction, backend)
+        found.update(translated)
+    return [found[t] for t in texts]
 
 
 LOCAL_MODEL_ID_EN = "Helsinki-NLP/opus-mt-id-en"
 LOCAL_MODEL_EN_ID = "Helsinki-NLP/opus-mt-en-id"
+LOCAL_MODELS = {("ID", "EN"): LOCAL_MODEL_ID_EN, ("EN", "ID"): LOCAL_MODEL_EN_ID}
 
 
-def translate_text_from_ID_to_EN(text: str, use_local: bool = False):
+def translate_texts(texts, source_lang: str, target_lang: str, use_local: bool = False, use_cache: bool = True):
+    """
+    Terjemahkan banyak teks sekaligus (ID<->EN).
+    - Model lokal: semua teks dipecah per kalimat dan kalimat yang belum ada di cache
+      diterjemahkan dalam batch ber-padding, lalu disusun kembali per teks.
+    - DeepL: teks yang belum ada di cache dikirim dalam satu request.
+    Returns: list hasil terjemahan sesuai urutan input.
+    """
+    direction = f"{source_lang}-{target_lang}"
+    if use_local:
+        local_model = LOCAL_MODELS[(source_lang, target_lang)]
+        sentences = [split_translation_sentences(text) for text in texts]
+        flat = [sentence for group in sentences for sentence in group]
+        translated = iter(_translate_cached(flat, direction, local_model, lambda batch: translate_texts_local(batch, local_model), use_cache))
+        return [" ".join(next(translated) for _ in group) for group in sentences]
+    deepl_target = "EN-US" if target_lang == "EN" else target_lang
+    translate_batch = lambda batch: [
+        r.text for r in get_deepl_translator().translate_text(batch, source_lang=source_lang, target_lang=deepl_target)
+    ]
+    return _translate_cached(list(texts), direction, "deepl", translate_batch, use_cache)
+
+
+def translate_text_from_ID_to_EN(text: str, use_local: bool = False, use_cache: bool = True):
     """
     Menerjemahkan teks dari Bahasa Indonesia ke Bahasa Inggris (EN-US)
-    menggunakan DeepL API atau model lokal.
+    menggunakan DeepL API atau model lokal. Hasil disimpan di cache terjemahan
+    (key: hash teks, arah, backend) kecuali use_cache=False.
     """
     if use_local:
         try:
-            return translate_text_local(text, LOCAL_MODEL_ID_EN)
+            return translate_texts([text], "ID", "EN", use_local=True, use_cache=use_cache)[0]
         except Exception as e:
             raise RuntimeError(f"Terjadi error pada model lokal (ID->EN '{LOCAL_MODEL_ID_EN}'): {e}")
     try:
-        translator = get_deepl_translator()
-        result = translator.translate_text(text, source_lang="ID", target_lang="EN-US")
-        return result.text
+        return translate_texts([text], "ID", "EN", use_cache=use_cache)[0]
     except Exception as e:
         raise RuntimeError(f"Terjadi error pada DeepL API: {e}")
 
 
-def translate_text_from_EN_to_ID(text: str, use_local: bool = False):
+def translate_text_from_EN_to_ID(text: str, use_local: bool = False, use_cache: bool = True):
     """
     Menerjemahkan teks dari Bahasa Inggris ke Bahasa Indonesia
-    menggunakan DeepL API atau model lokal.
+    menggunakan DeepL API atau model lokal. Hasil disimpan di cache terjemahan
+    (key: hash teks, arah, backend) kecuali use_cache=False.
     """
     if use_local:
         try:
-            return translate_text_local(text, LOCAL_MODEL_EN_ID)
+            return translate_texts([text], "EN", "ID", use_local=True, use_cache=use_cache)[0]
         except Exception as e:
             raise RuntimeError(f"Terjadi error pada model lokal (EN->ID '{LOCAL_MODEL_EN_ID}'): {e}")
     try:
-        translator = get_deepl_translator()
-        result = translator.translate_text(text, source_lang="EN", target_lang="ID")
-        return result.text
+        return translate_texts([text], "EN", "ID", use_cache=use_cache)[0]
     except Exception as e:
         raise RuntimeError(f"Terjadi error pada DeepL API: {e}")